@@ -1,4 +1,6 @@
 from .navigation_system import Navigation_System
 from .imu_emulator import IMU_emulator, IMU_reader
+from .trajectory import IMU_trajectory
 from .state import State
+from .state_history import StateHistory
 from .constants import *
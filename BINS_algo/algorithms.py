@@ -0,0 +1,163 @@
+'''
+Алгоритмы шагов [5] и [7] для цикла из N = samples приращений (каждое - rate_decrease тактов).
+
+velocity ([5], приращение скорости в связанных осях за цикл):
+    rk4      - Рунге-Кутта 4 порядка по приращениям (эталон, считается ядрами kernels.py)
+    analytic - замкнутое решение той же линейной задачи за шаг: y + φ1(-h1 W)(da - W y), W = [dw x]
+               (совпадает с rk4 с точностью округления, три векторных произведения вместо четырёх)
+    sculling - υ + 1/2 α x υ + Σ k_i (α_i x υ_N + υ_i x α_N) в осях начала цикла,
+               три векторных произведения на цикл вместо 4N у rk4
+coning ([7], вектор конечного поворота):
+    pairs    - двухвыборочная поправка 2/3 (α_a x α_b) по половинам цикла (эталон, N чётное)
+    table    - N-выборочная поправка (Σ k_i α_i) x α_N
+
+α_i, υ_i - приращения угла и скорости на i-м приращении цикла, α, υ - их суммы за цикл.
+Коэффициенты k_i общие для конинга и скаллинга и выводятся точно (в дробях) подбором под
+классическое коническое движение: ряд Тейлора поправки по углу λ одного приращения совпадает
+с точным (Nλ - sin Nλ) / 2 до λ^(2N-1) включительно. N = 2: 2/3; N = 3: 9/20, 27/20;
+N = 4: 54/105, 92/105, 214/105 (коэффициенты Игнаньи).
+'''
+from fractions import Fraction
+from functools import lru_cache
+from math import factorial
+import numpy as np
+
+from .small_increments import SmallIncrements
+from .kernels import ReferenceKernels
+from . import math_functions as MathFunc
+
+
+@lru_cache
+def coning_coefficients(samples: int) -> tuple[Fraction, ...]:
+    '''Коэффициенты k_1 .. k_(N-1) N-выборочной поправки Σ k_i α_i x α_N'''
+    assert samples >= 2, 'at least two samples per cycle are required'
+    # Уравнения при λ^(2p+1), p = 1 .. N-1; неизвестные - k_i при α_i x α_N, i = 1 .. N-1
+    rows = []
+    for p in range(1, samples):
+        row = []
+        for i in range(1, samples):
+            m = samples - i
+            # 4 sin^2(λ/2) sin(mλ) = Σ 2 (-1)^(n+1) λ^2n / (2n)! * Σ (-1)^j (mλ)^(2j+1) / (2j+1)!
+            row.append(sum(
+                Fraction(2 * (-1) ** (n + 1), factorial(2 * n)) * Fraction((-1) ** (p - n) * m ** (2 * (p - n) + 1), factorial(2 * (p - n) + 1))
+                for n in range(1, p + 1)
+            ))
+        # (Nλ - sin Nλ) / 2
+        row.append(Fraction((-1) ** (p + 1) * samples ** (2 * p + 1), 2 * factorial(2 * p + 1)))
+        rows.append(row)
+
+    # Метод Гаусса в дробях
+    size = samples - 1
+    for column in range(size):
+        pivot = next(row for row in range(column, size) if rows[row][column] != 0)
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for row in range(size):
+            if row != column and rows[row][column] != 0:
+                factor = rows[row][column] / rows[column][column]
+                rows[row] = [a - factor * b for a, b in zip(rows[row], rows[column])]
+    return tuple(rows[i][size] / rows[i][i] for i in range(size))
+
+
+@lru_cache
+def _coefficients(samples: int, dtype: np.dtype) -> np.ndarray:
+    '''Коэффициенты k_i в точности dtype (числитель и знаменатель делятся уже в dtype)'''
+    dtype = np.dtype(dtype).type
+    return np.array([dtype(k.numerator) / dtype(k.denominator) for k in coning_coefficients(samples)], dtype)
+
+
+def _cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    '''Векторное произведение по последней оси без накладных расходов np.cross'''
+    out = np.empty(np.broadcast_shapes(a.shape, b.shape), np.result_type(a, b))
+    out[..., 0] = a[..., 1] * b[..., 2] - a[..., 2] * b[..., 1]
+    out[..., 1] = a[..., 2] * b[..., 0] - a[..., 0] * b[..., 2]
+    out[..., 2] = a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+    return out
+
+
+def analytic_velocity(da: np.ndarray, dw: np.ndarray, h1: int | float | np.longdouble) -> np.ndarray:
+    '''[5] y <- y + φ1(-h1 W)(da - W y) по приращениям цикла: da, dw (..., N, 3) -> (..., 3)'''
+    y = np.zeros(da.shape[:-2] + (3,), da.dtype)
+    for i in range(da.shape[-2]):
+        x = h1 * dw[..., i, :]
+        theta2 = (x * x).sum(axis=-1, keepdims=True)
+        f = da[..., i, :] - _cross(dw[..., i, :], y)
+        xf = _cross(x, f)
+        # φ1(-X) = I - (1 - cos θ)/θ^2 X + (θ - sin θ)/θ^3 X^2, θ = h1 |dw| << 1 - ряды до θ^2
+        y = y + f - (1 / 2 - theta2 / 24) * xf + (1 / 6 - theta2 / 120) * _cross(x, xf)
+    return y
+
+
+def sculling_velocity(da: np.ndarray, dw: np.ndarray) -> np.ndarray:
+    '''[5] υ + 1/2 α x υ + N-выборочная поправка на скаллинг: da, dw (..., N, 3) -> (..., 3)'''
+    k = _coefficients(da.shape[-2], da.dtype)
+    alpha, upsilon = dw.sum(axis=-2), da.sum(axis=-2)
+    return (
+        upsilon + _cross(alpha, upsilon) / 2
+        + _cross(k @ dw[..., :-1, :], da[..., -1, :]) + _cross(k @ da[..., :-1, :], dw[..., -1, :])
+    )
+
+
+def table_euler_vector(dw: np.ndarray) -> np.ndarray:
+    '''[7] α + (Σ k_i α_i) x α_N: dw (..., N, 3) -> (..., 3)'''
+    k = _coefficients(dw.shape[-2], dw.dtype)
+    return dw.sum(axis=-2) + _cross(k @ dw[..., :-1, :], dw[..., -1, :])
+
+
+VELOCITY = ('rk4', 'analytic', 'sculling')
+CONING = ('pairs', 'table')
+
+
+class CycleAlgorithm:
+    '''
+    Шаги [5] и [7] для цикла из samples приращений по выбранным алгоритмам.
+    Эталонные rk4 и pairs в потактовом режиме считаются ядрами (reference / closed_form / numba).
+    '''
+    kernels: ReferenceKernels
+    samples: int
+    velocity: str
+    coning: str
+
+    def __init__(self, kernels: ReferenceKernels, samples: int = 4, velocity: str = 'rk4', coning: str = 'pairs'):
+        assert velocity in VELOCITY, f'unknown velocity algorithm: {velocity}, expected one of {VELOCITY}'
+        assert coning in CONING, f'unknown coning algorithm: {coning}, expected one of {CONING}'
+        assert samples >= 2, 'at least two samples per cycle are required'
+        assert coning != 'pairs' or samples % 2 == 0, 'pairs coning requires an even number of samples'
+        self.kernels = kernels
+        self.samples = samples
+        self.velocity = velocity
+        self.coning = coning
+        coning_coefficients(samples)
+
+    def _pack(self, increments: list[SmallIncrements]) -> np.ndarray:
+        return np.array([incr.data[1:] for incr in increments], self.kernels.precision.dtype)
+
+    def acceleration(self, increments: list[SmallIncrements], h1: int | float | np.longdouble) -> np.ndarray:
+        '''[5] по списку приращений цикла'''
+        if self.velocity == 'rk4':
+            return self.kernels.acceleration(increments, h1)
+        packed = self._pack(increments)
+        return self.acceleration_batch(packed[:, :3], packed[:, 3:], h1)
+
+    def euler_vector(self, increments: list[SmallIncrements]) -> np.ndarray:
+        '''[7] по списку приращений цикла'''
+        if self.coning == 'pairs':
+            return self.kernels.euler_vector(increments)
+        return self.euler_vector_batch(self._pack(increments)[:, 3:])
+
+    def acceleration_batch(self, da: np.ndarray, dw: np.ndarray, h1: int | float | np.longdouble) -> np.ndarray:
+        '''[5] для массивов приращений (..., N, 3)'''
+        match self.velocity:
+            case 'rk4':
+                return MathFunc.calculateAxelerationBatch(da, dw, h1)
+            case 'analytic':
+                return analytic_velocity(da, dw, h1)
+            case 'sculling':
+                return sculling_velocity(da, dw)
+
+    def euler_vector_batch(self, dw: np.ndarray) -> np.ndarray:
+        '''[7] для массивов приращений (..., N, 3)'''
+        match self.coning:
+            case 'pairs':
+                return MathFunc.calculateEulerRotationVectorProjectionBatch(dw)
+            case 'table':
+                return table_euler_vector(dw)
@@ -0,0 +1,573 @@
+'''
+Анализ результатов прогонов без повторного чтения полного CSV.
+
+Результат прогона (CSV save_states / CSVSink, .npy NpySink, StateHistory или массив (N, 9), в том
+числе эталон IMU_trajectory.truth) один раз загружается в колоночное хранилище - каталог:
+    meta.json            - столбцы, число строк, коэффициент прореживания, равномерность шага по t
+    <column>.f64         - столбцы StateHistory.COLUMNS полного разрешения (float64, читаются через memmap)
+    level-<k>.npy        - уровень k пирамиды прореживания (n_k, столбцы, 3): min, max, mean по блокам
+                           из factor^k строк (последний блок может быть неполным)
+Углы heading, pitch, roll хранятся развёрнутыми (np.unwrap), чтобы min/max/mean блоков не ломались на ±π.
+
+Запрос диапазона времени (Run.slice) возвращает строки полного разрешения, если их не больше max_points,
+иначе - min/max/mean блоков самого подробного уровня, укладывающегося в max_points. Индекс времени -
+арифметический при равномерном шаге, иначе двоичный поиск по memmap столбца t; чтение - только
+попавших в диапазон блоков, поэтому запросы по многочасовым прогонам занимают миллисекунды.
+
+Ошибки (drift, error_statistics, compare_runs) считаются по уровням пирамиды без чтения полного
+разрешения: границы ошибки блока - (min прогона - max эталона, max прогона - min эталона) по блокам
+эталона, перекрывающим время блока прогона, средняя - разность средних (эталон усредняется на интервале
+блока прогона по интегралу от средних своих блоков; при совпадающей сетке времени, например
+truth(step=4 * rate_decrease), это среднее по тем же строкам). С exact=True ошибки
+считаются по строкам полного разрешения: эталон берётся в тех же моментах своей сетки или линейно
+интерполируется на время строк прогона. Без эталона ошибки отсчитываются от начального состояния
+(неподвижная БИНС). Амплитуды колебаний с периодами Шулера (84.4 min) и суток (скорость вращения
+Земли) оцениваются МНК по модели a + b t + Σ (c sin ωt + d cos ωt); составляющая оценивается, если
+прогон не короче половины её периода (иначе - nan).
+
+Запуск из командной строки:
+    python -m BINS_algo.analysis ingest result.csv store_dir
+    python -m BINS_algo.analysis summary store_dir [--reference truth_dir]
+'''
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+from .state_history import StateHistory
+from .constants import RADIUS_EARTH, GRAVITY_AXELERATION, U_EARTH_ROTATION_RATE
+
+
+META_FILE = 'meta.json'
+COLUMNS = StateHistory.COLUMNS
+ANGLES = ('heading', 'pitch', 'roll')
+ARCSEC = np.rad2deg(1) * 3_600
+SCHULER_RATE = float(np.sqrt(GRAVITY_AXELERATION / RADIUS_EARTH))
+EARTH_RATE = float(U_EARTH_ROTATION_RATE)
+
+
+def _chunks(source, chunk_size: int):
+    '''Блоки (n, 9) float64 из CSV, .npy, StateHistory или массива'''
+    if isinstance(source, StateHistory):
+        source = source.as_array()
+    if isinstance(source, str) and os.path.splitext(source)[1].lower() != '.npy':
+        with pd.read_csv(source, chunksize=chunk_size) as reader:
+            for frame in reader:
+                yield frame[list(COLUMNS)].to_numpy(np.float64)
+        return
+    records = np.load(source, mmap_mode='r') if isinstance(source, str) else source
+    assert records.ndim == 2 and records.shape[1] == len(COLUMNS), f'(N, {len(COLUMNS)}) states expected'
+    for start in range(0, len(records), chunk_size):
+        yield np.array(records[start:start + chunk_size], np.float64)
+
+
+def _counts(rows: int, size: int) -> np.ndarray:
+    '''Число строк в блоках по size строк'''
+    counts = np.full(-(-rows // size), size, np.float64)
+    if len(counts):
+        counts[-1] = rows - size * (len(counts) - 1)
+    return counts
+
+
+def ingest(source, directory: str, factor: int = 16, chunk_size: int = 1 << 20) -> 'Run':
+    '''Загрузка результатов прогона в хранилище directory (перезаписывается) и построение пирамид'''
+    assert factor >= 2, 'decimation factor must be at least 2'
+    chunk_size = max(chunk_size // factor, 1) * factor
+    os.makedirs(directory, exist_ok=True)
+
+    # Столбцы полного разрешения и первый уровень пирамиды за один проход
+    files = {name: open(os.path.join(directory, f'{name}.f64'), 'wb') for name in COLUMNS}
+    angles = [COLUMNS.index(name) for name in ANGLES]
+    count, previous, blocks, pending = 0, None, [], np.empty((0, len(COLUMNS)))
+    try:
+        for chunk in _chunks(source, chunk_size):
+            if not len(chunk):
+                continue
+            # Развёртка углов продолжается от последней строки предыдущего блока
+            if previous is None:
+                chunk[:, angles] = np.unwrap(chunk[:, angles], axis=0)
+            else:
+                chunk[:, angles] = np.unwrap(np.concatenate((previous[None], chunk[:, angles])), axis=0)[1:]
+            previous = chunk[-1, angles]
+            for index, name in enumerate(COLUMNS):
+                chunk[:, index].tofile(files[name])
+            count += len(chunk)
+            records = np.concatenate((pending, chunk)) if len(pending) else chunk
+            full = len(records) // factor * factor
+            if full:
+                blocks.append(_reduce(records[:full], factor))
+            pending = records[full:]
+    finally:
+        for fp in files.values():
+            fp.close()
+    if len(pending):
+        blocks.append(_reduce(pending, factor))
+
+    # Равномерность шага по времени (индекс времени без поиска)
+    t = np.memmap(os.path.join(directory, 't.f64'), np.float64, 'r', shape=(count,)) if count else np.empty(0)
+    step = float(t[-1] - t[0]) / (count - 1) if count > 1 else 0.0
+    uniform = count > 1 and step > 0 and all(
+        np.abs(t[start:start + chunk_size] - (t[0] + step * np.arange(start, min(start + chunk_size, count)))).max() <= 1e-6 * step
+        for start in range(0, count, chunk_size)
+    )
+
+    # Уровни пирамиды, пока в уровне больше factor блоков
+    for name in os.listdir(directory):
+        if name.startswith('level-'):
+            os.remove(os.path.join(directory, name))
+    level, rows = np.concatenate(blocks) if blocks else np.empty((0, len(COLUMNS), 3)), count
+    levels = 0
+    while len(level):
+        levels += 1
+        np.save(os.path.join(directory, f'level-{levels}.npy'), level)
+        if len(level) <= factor:
+            break
+        level = _merge(level, _counts(rows, factor ** levels), factor)
+
+    with open(os.path.join(directory, META_FILE), 'w') as fp:
+        json.dump({
+            'columns': list(COLUMNS),
+            'count': count,
+            'factor': factor,
+            'levels': levels,
+            'uniform': bool(uniform),
+            't0': float(t[0]) if count else None,
+            'step': step,
+        }, fp, indent=2)
+    return Run(directory)
+
+
+def _reduce(records: np.ndarray, factor: int) -> np.ndarray:
+    '''Блоки по factor строк (n, C) -> (ceil(n / factor), C, 3): min, max, mean'''
+    starts = np.arange(0, len(records), factor)
+    counts = _counts(len(records), factor)[:, None]
+    return np.stack((
+        np.minimum.reduceat(records, starts),
+        np.maximum.reduceat(records, starts),
+        np.add.reduceat(records, starts) / counts,
+    ), axis=-1)
+
+
+def _merge(level: np.ndarray, counts: np.ndarray, factor: int) -> np.ndarray:
+    '''Следующий уровень пирамиды из factor блоков текущего с весами counts (число строк в блоках)'''
+    starts = np.arange(0, len(level), factor)
+    weights = np.add.reduceat(counts, starts)[:, None]
+    return np.stack((
+        np.minimum.reduceat(level[..., 0], starts),
+        np.maximum.reduceat(level[..., 1], starts),
+        np.add.reduceat(level[..., 2] * counts[:, None], starts) / weights,
+    ), axis=-1)
+
+
+def _interval_means(envelopes: np.ndarray, step: float, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    '''
+    Средние столбцов (n, столбцы) на интервалах [starts, stops] по интегралу от средних блоков envelopes
+    (блок - от первой до последней строки с половиной шага step по краям; интервал, совпадающий с блоком, -
+    его среднее, иначе - линейная интерполяция интеграла). Интервал у края сужается симметрично вокруг
+    центра, за краями - nan
+    '''
+    edges = np.append(envelopes[:, 0, 0] - step / 2, envelopes[-1, 0, 1] + step / 2)
+    # Интеграл отклонений от первого блока: без потери точности на вычитании больших значений
+    deviations = envelopes[..., 2] - envelopes[0, :, 2]
+    integral = np.concatenate((np.zeros((1, envelopes.shape[1])), np.cumsum(deviations * np.diff(edges)[:, None], axis=0)))
+    centers = (starts + stops) / 2
+    half = np.minimum((stops - starts) / 2, np.minimum(centers - edges[0], edges[-1] - centers))
+    starts, stops = centers - half, centers + half
+    block = np.clip(np.searchsorted(edges, starts - 1e-9 * step), 0, len(envelopes) - 1)
+    same = (np.abs(edges[block] - starts) <= 1e-9 * step) & (np.abs(edges[block + 1] - stops) <= 1e-9 * step)
+    means = np.empty((len(centers), envelopes.shape[1]))
+    for column in range(envelopes.shape[1]):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            average = (np.interp(stops, edges, integral[:, column]) - np.interp(starts, edges, integral[:, column])) / (stops - starts)
+        point = np.interp(centers, envelopes[:, 0, 2], envelopes[:, column, 2], left=np.nan, right=np.nan)
+        means[:, column] = np.where(same, envelopes[block, column, 2], np.where(half > 0, average + envelopes[0, column, 2], point))
+    return means
+
+
+class Run:
+    '''Прогон в колоночном хранилище (см. ingest)'''
+    directory: str
+    count: int
+    factor: int
+    levels: int
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, META_FILE)) as fp:
+            meta = json.load(fp)
+        assert tuple(meta['columns']) == COLUMNS, f'unexpected columns in {directory}'
+        self.directory = directory
+        self.count = meta['count']
+        self.factor = meta['factor']
+        self.levels = meta['levels']
+        self._uniform, self._t0, self._step = meta['uniform'], meta['t0'], meta['step']
+        self._columns: dict[str, np.ndarray] = {}
+        self._levels: dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def column(self, name: str) -> np.ndarray:
+        '''Столбец полного разрешения (memmap)'''
+        if name not in self._columns:
+            assert name in COLUMNS, f'unknown column: {name}'
+            path = os.path.join(self.directory, f'{name}.f64')
+            self._columns[name] = np.memmap(path, np.float64, 'r', shape=(self.count,)) if self.count else np.empty(0)
+        return self._columns[name]
+
+    def level(self, level: int) -> np.ndarray:
+        '''Уровень пирамиды (n, столбцы, 3): min, max, mean блоков из factor^level строк'''
+        if level not in self._levels:
+            assert 1 <= level <= self.levels, f'no pyramid level {level}'
+            self._levels[level] = np.load(os.path.join(self.directory, f'level-{level}.npy'), mmap_mode='r')
+        return self._levels[level]
+
+    def index(self, t: float) -> int:
+        '''Номер первой строки с временем не меньше t'''
+        if self._uniform:
+            return int(np.clip(np.ceil((t - self._t0) / self._step - 1e-6), 0, self.count))
+        return int(np.searchsorted(self.column('t'), t))
+
+    def span(self, start: float | None = None, stop: float | None = None) -> tuple[int, int]:
+        '''Строки [i0, i1) с временем в [start, stop]'''
+        i0 = 0 if start is None else self.index(start)
+        if stop is None:
+            i1 = self.count
+        elif self._uniform:
+            i1 = int(np.clip(np.floor((stop - self._t0) / self._step + 1e-6) + 1, 0, self.count))
+        else:
+            i1 = int(np.searchsorted(self.column('t'), stop, side='right'))
+        return i0, max(i0, i1)
+
+    def choose_level(self, rows: int, max_points: int) -> int:
+        '''Самый подробный уровень (0 - полное разрешение), на котором rows строк дают не больше max_points точек'''
+        level = 0
+        while level < self.levels and -(-rows // self.factor ** level) > max_points:
+            level += 1
+        return level
+
+    def at(self, t: float) -> dict[str, float]:
+        '''Состояние в ближайшей строке не раньше t'''
+        index = min(self.index(t), self.count - 1)
+        return {name: float(self.column(name)[index]) for name in COLUMNS}
+
+    def slice(
+        self,
+        start: float | None = None,
+        stop: float | None = None,
+        columns: tuple[str, ...] | list[str] | None = None,
+        max_points: int = 2_000,
+    ) -> pd.DataFrame:
+        '''
+        Диапазон времени [start, stop] не более чем в max_points точках: строки полного разрешения
+        или блоки уровня пирамиды (t - среднее время блока, <column> - среднее, <column>_min, <column>_max)
+        '''
+        columns = [name for name in (columns or COLUMNS) if name != 't']
+        i0, i1 = self.span(start, stop)
+        level = self.choose_level(i1 - i0, max_points)
+        if level == 0:
+            return pd.DataFrame({name: np.asarray(self.column(name)[i0:i1]) for name in ('t', *columns)})
+
+        size = self.factor ** level
+        blocks = np.asarray(self.level(level)[i0 // size:-(-i1 // size)])
+        frame = {'t': blocks[:, 0, 2]}
+        for name in columns:
+            index = COLUMNS.index(name)
+            frame[name] = blocks[:, index, 2]
+            frame[f'{name}_min'] = blocks[:, index, 0]
+            frame[f'{name}_max'] = blocks[:, index, 1]
+        return pd.DataFrame(frame)
+
+    def blocks(self, start: float | None = None, stop: float | None = None, max_points: int = 4_096) -> pd.DataFrame:
+        '''
+        Средние всех столбцов по блокам (или строки) диапазона, не более max_points, и интервалы
+        времени блоков [start, stop] (от первой до последней строки блока с половиной шага по краям)
+        '''
+        i0, i1 = self.span(start, stop)
+        level = self.choose_level(i1 - i0, max_points)
+        if level == 0:
+            frame = pd.DataFrame({name: np.asarray(self.column(name)[i0:i1]) for name in COLUMNS})
+            first, last = frame['t'].to_numpy(), frame['t'].to_numpy()
+        else:
+            size = self.factor ** level
+            blocks = np.asarray(self.level(level)[i0 // size:-(-i1 // size)])
+            frame = pd.DataFrame(blocks[..., 2], columns=list(COLUMNS))
+            first, last = blocks[:, 0, 0], blocks[:, 0, 1]
+        frame['start'] = first - self._step / 2
+        frame['stop'] = last + self._step / 2
+        return frame
+
+    def average(self, starts: np.ndarray, stops: np.ndarray, max_points: int = 4_096) -> pd.DataFrame:
+        '''Средние всех столбцов на интервалах [starts, stops] по интегралу от средних блоков (см. _interval_means)'''
+        starts, stops = np.asarray(starts, np.float64), np.asarray(stops, np.float64)
+        i0, i1 = self.span(starts.min(initial=np.inf), stops.max(initial=-np.inf))
+        level = self.choose_level(i1 - i0, max_points)
+        size = self.factor ** level
+        envelopes = self.envelopes(level, i0 // size, -(-i1 // size))
+        return pd.DataFrame(_interval_means(envelopes, self._step, starts, stops), columns=list(COLUMNS))
+
+    def envelopes(self, level: int, j0: int, j1: int) -> np.ndarray:
+        '''Блоки [j0, j1) уровня level (n, столбцы, 3): min, max, mean; на уровне 0 - строки (min = max = mean)'''
+        if level:
+            return np.asarray(self.level(level)[j0:j1])
+        rows = np.column_stack([self.column(name)[j0:j1] for name in COLUMNS])
+        return np.repeat(rows[..., None], 3, axis=-1)
+
+    def bracket(self, starts: np.ndarray, stops: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Строки r0, r1 (включительно), между которыми лежат интервалы времени [starts, stops]:
+        последняя строка не позже start и первая не раньше stop (-1 и count, если таких нет)
+        '''
+        if self._uniform:
+            r0 = np.floor((starts - self._t0) / self._step + 1e-6)
+            r1 = np.ceil((stops - self._t0) / self._step - 1e-6)
+            return np.clip(r0, -1, self.count).astype(np.int64), np.clip(r1, -1, self.count).astype(np.int64)
+        t = self.column('t')
+        return np.searchsorted(t, starts, side='right') - 1, np.searchsorted(t, stops)
+
+ERRORS = (
+    'north_m', 'east_m', 'position_m',
+    'velocity_east_m_s', 'velocity_north_m_s', 'velocity_m_s',
+    *(f'{angle}_arcsec' for angle in ANGLES),
+)
+
+
+def _errors(values: dict, base: dict) -> dict[str, np.ndarray]:
+    '''Ошибки состояний values относительно base: координаты [m], скорость [m/sec], углы [arcsec]'''
+    errors = {}
+    errors['north_m'] = (values['latitude'] - base['latitude']) * float(RADIUS_EARTH)
+    errors['east_m'] = (values['longitude'] - base['longitude']) * float(RADIUS_EARTH) * np.cos(base['latitude'])
+    errors['position_m'] = np.hypot(errors['north_m'], errors['east_m'])
+    errors['velocity_east_m_s'] = values['velocity_x_ref'] - base['velocity_x_ref']
+    errors['velocity_north_m_s'] = values['velocity_y_ref'] - base['velocity_y_ref']
+    errors['velocity_m_s'] = np.hypot(errors['velocity_east_m_s'], errors['velocity_north_m_s'])
+    for angle in ANGLES:
+        errors[f'{angle}_arcsec'] = np.angle(np.exp(1j * (values[angle] - base[angle]))) * ARCSEC
+    return errors
+
+
+def _grid(run: Run, reference: Run) -> tuple[int, int] | None:
+    '''(offset, ratio), если строка i прогона совпадает по времени со строкой offset + ratio * i эталона, иначе None'''
+    if not (run._uniform and reference._uniform):
+        return None
+    offset = round((run._t0 - reference._t0) / reference._step)
+    ratio = round(run._step / reference._step)
+    last = offset + ratio * (run.count - 1)
+    if offset < 0 or ratio < 1 or last >= reference.count:
+        return None
+    tolerance = 1e-6 * reference._step
+    t, times = run.column('t'), reference.column('t')
+    if abs(t[0] - times[offset]) > tolerance or abs(t[-1] - times[last]) > tolerance:
+        return None
+    return offset, ratio
+
+
+def _row_errors(run: Run, reference: Run | None, grid: tuple[int, int] | None, i0: int, i1: int) -> np.ndarray:
+    '''
+    Время и ошибки ERRORS строк [i0, i1) прогона (n, 1 + len(ERRORS)): эталон берётся в тех же строках
+    его сетки (grid) или интерполируется на время строк прогона (nan вне интервала эталона)
+    '''
+    values = {name: np.asarray(run.column(name)[i0:i1]) for name in COLUMNS}
+    if reference is None:
+        base = {name: run.column(name)[0] for name in COLUMNS}
+    elif grid is not None:
+        offset, ratio = grid
+        rows = slice(offset + ratio * i0, offset + ratio * (i1 - 1) + 1, ratio)
+        base = {name: np.asarray(reference.column(name)[rows]) for name in COLUMNS}
+    else:
+        t = values['t']
+        j0, j1 = reference.span(t[0], t[-1])
+        j0, j1 = max(j0 - 1, 0), min(j1 + 1, reference.count)
+        times = reference.column('t')[j0:j1]
+        base = {name: np.interp(t, times, reference.column(name)[j0:j1], left=np.nan, right=np.nan) for name in COLUMNS}
+    return np.column_stack((values['t'], *_errors(values, base).values()))
+
+
+def _envelope_errors(blocks: np.ndarray, base: np.ndarray) -> dict[str, np.ndarray]:
+    '''
+    Ошибки блоков (n, столбцы, 3) относительно блоков base той же формы: (n, 3) min, max, mean на ошибку.
+    Границы составляющих - (min - max base, max - min base), модулей position_m, velocity_m_s - по границам
+    составляющих; для углов, чей размах уходит за ±π, - [-π, π]
+    '''
+    low, high, mean = blocks[..., 0] - base[..., 1], blocks[..., 1] - base[..., 0], blocks[..., 2] - base[..., 2]
+    latitude = base[:, COLUMNS.index('latitude'), 2]
+    errors = {}
+    for name, column, scale in (
+        ('north_m', 'latitude', float(RADIUS_EARTH)),
+        ('east_m', 'longitude', float(RADIUS_EARTH) * np.cos(latitude)),
+        ('velocity_east_m_s', 'velocity_x_ref', 1.0),
+        ('velocity_north_m_s', 'velocity_y_ref', 1.0),
+    ):
+        index = COLUMNS.index(column)
+        errors[name] = np.column_stack((low[:, index] * scale, high[:, index] * scale, mean[:, index] * scale))
+    for modulus, components in (('position_m', ('north_m', 'east_m')), ('velocity_m_s', ('velocity_east_m_s', 'velocity_north_m_s'))):
+        errors[modulus] = np.column_stack((
+            np.hypot(*(np.maximum(np.maximum(errors[name][:, 0], -errors[name][:, 1]), 0) for name in components)),
+            np.hypot(*(np.abs(errors[name][:, :2]).max(axis=1) for name in components)),
+            np.hypot(*(errors[name][:, 2] for name in components)),
+        ))
+    for angle in ANGLES:
+        index = COLUMNS.index(angle)
+        wrapped = (low[:, index] < -np.pi) | (high[:, index] > np.pi)
+        errors[f'{angle}_arcsec'] = np.column_stack((
+            np.where(wrapped, -np.pi, low[:, index]),
+            np.where(wrapped, np.pi, high[:, index]),
+            np.angle(np.exp(1j * mean[:, index])),
+        )) * ARCSEC
+    return {name: errors[name] for name in ERRORS}
+
+
+def _reference_envelopes(reference: Run, blocks: np.ndarray, step: float) -> np.ndarray:
+    '''
+    Блоки эталона (n, столбцы, 3) для блоков прогона blocks с шагом строк step: min/max по блокам эталона,
+    перекрывающим время блока прогона (вместе с соседними строками для интерполяции), средние - по интегралу
+    эталона на интервале блока прогона (_interval_means); nan, если эталон не покрывает блок
+    '''
+    base = np.full(blocks.shape, np.nan)
+    r0, r1 = reference.bracket(blocks[:, 0, 0], blocks[:, 0, 1])
+    covered = (r0 >= 0) & (r1 < reference.count)
+    if not covered.any():
+        return base
+    r0, r1 = r0[covered], r1[covered]
+    # Самый грубый уровень эталона, в котором на интервале не меньше блоков, чем у прогона
+    rows, blocks_count = int(r1.max() - r0.min()) + 1, int(covered.sum())
+    level = reference.choose_level(rows, blocks_count)
+    if level and -(-rows // reference.factor ** level) < blocks_count:
+        level -= 1
+    size = reference.factor ** level
+    b0, b1 = r0 // size, r1 // size
+    # С соседним блоком по краям - для интервалов усреднения, выходящих за перекрывающиеся блоки
+    first = max(int(b0.min()) - 1, 0)
+    envelopes = reference.envelopes(level, first, int(b1.max()) + 2)
+    index = np.minimum(b0[:, None] + np.arange(int((b1 - b0).max()) + 1), b1[:, None]) - first
+    base[covered, :, 0] = envelopes[index, :, 0].min(axis=1)
+    base[covered, :, 1] = envelopes[index, :, 1].max(axis=1)
+    starts, stops = blocks[covered, 0, 0] - step / 2, blocks[covered, 0, 1] + step / 2
+    base[covered, :, 2] = _interval_means(envelopes, reference._step, starts, stops)
+    return base
+
+
+def drift(
+    run: Run,
+    reference: Run | None = None,
+    start: float | None = None,
+    stop: float | None = None,
+    max_points: int = 4_096,
+    exact: bool = False,
+    chunk_size: int = 1 << 16,
+) -> pd.DataFrame:
+    '''
+    Ошибки прогона относительно reference (эталон или другой прогон) или, без reference, относительно
+    начального состояния по строкам или блокам уровня choose_level: <error> - средняя ошибка блока,
+    <error>_min, <error>_max - её границы в блоке; координаты [m], скорость [m/sec], углы [arcsec].
+    По умолчанию - по уровням пирамиды (границы - оценка), exact=True - по строкам полного разрешения
+    '''
+    assert reference is None or len(reference), 'empty reference run'
+    i0, i1 = run.span(start, stop)
+    level = run.choose_level(i1 - i0, max_points)
+    size = run.factor ** level
+    if exact:
+        # Ошибки по строкам полного разрешения (частями, кратными блоку), затем min/max/mean по блокам
+        grid = None if reference is None else _grid(run, reference)
+        i0, i1 = i0 // size * size, min(-(-i1 // size) * size, run.count)
+        chunk_size = max(chunk_size // size, 1) * size
+        parts = [_reduce(_row_errors(run, reference, grid, a, min(a + chunk_size, i1)), size) for a in range(i0, i1, chunk_size)]
+        blocks = np.concatenate(parts) if parts else np.empty((0, 1 + len(ERRORS), 3))
+        errors = {name: blocks[:, 1 + index, :] for index, name in enumerate(ERRORS)}
+    else:
+        blocks = run.envelopes(level, i0 // size, -(-i1 // size))
+        if reference is None:
+            base = np.broadcast_to(run.envelopes(0, 0, 1), blocks.shape)
+        else:
+            base = _reference_envelopes(reference, blocks, run._step)
+        errors = _envelope_errors(blocks, base)
+
+    frame = {'t': blocks[:, 0, 2]}
+    for name, values in errors.items():
+        frame[name] = values[:, 2]
+        frame[f'{name}_min'] = values[:, 0]
+        frame[f'{name}_max'] = values[:, 1]
+    return pd.DataFrame(frame)
+
+
+def oscillations(t: np.ndarray, values: np.ndarray) -> dict[str, float]:
+    '''Амплитуды составляющих с частотами Шулера и вращения Земли на фоне линейного тренда (МНК)'''
+    t = np.asarray(t, np.float64)
+    t = t - t[0] if len(t) else t
+    duration = float(t[-1]) if len(t) else 0.0
+    # Составляющие, период которых не больше двух длительностей прогона (иначе неотличимы от тренда)
+    rates = {name: rate for name, rate in (('schuler', SCHULER_RATE), ('earth_rate', EARTH_RATE)) if rate * duration >= np.pi}
+    amplitudes = dict.fromkeys(('schuler', 'earth_rate'), float('nan'))
+    if not rates or len(t) < 2 + 2 * len(rates) + 1:
+        return amplitudes
+    design = np.column_stack([np.ones_like(t), t / duration] + [f(rate * t) for rate in rates.values() for f in (np.sin, np.cos)])
+    coefficients = np.linalg.lstsq(design, np.asarray(values, np.float64), rcond=None)[0]
+    for index, name in enumerate(rates):
+        amplitudes[name] = float(np.hypot(*coefficients[2 + 2 * index:4 + 2 * index]))
+    return amplitudes
+
+
+def error_statistics(
+    run: Run,
+    reference: Run | None = None,
+    max_points: int = 4_096,
+    exact: bool = False,
+) -> dict[str, float]:
+    '''
+    Сводка ошибок: максимальные (по границам блоков drift), конечные (в последней строке), СКО средних
+    блоков, амплитуды колебаний Шулера и суточных; блоки вне интервала эталона пропускаются
+    '''
+    errors = drift(run, reference, max_points=max_points, exact=exact)
+    finite = np.isfinite(errors[list(ERRORS)].to_numpy()).all(axis=1)
+    errors = errors[finite]
+    summary = {'states': len(run), 'duration_sec': float(errors['t'].iloc[-1] - errors['t'].iloc[0]) if len(errors) else 0.0}
+    if len(run):
+        grid = None if reference is None else _grid(run, reference)
+        final = dict(zip(ERRORS, _row_errors(run, reference, grid, len(run) - 1, len(run))[0, 1:]))
+    for name in ERRORS:
+        values = errors[name].to_numpy()
+        bound = np.maximum(np.abs(errors[f'{name}_min'].to_numpy()), np.abs(errors[f'{name}_max'].to_numpy()))
+        summary[f'max_{name}'] = float(bound.max()) if len(values) else float('nan')
+        summary[f'final_{name}'] = float(final[name]) if len(run) else float('nan')
+        summary[f'rms_{name}'] = float(np.sqrt(np.mean(values ** 2))) if len(values) else float('nan')
+    for name in ('north_m', 'east_m', 'velocity_north_m_s', 'velocity_east_m_s', 'heading_arcsec'):
+        for component, amplitude in oscillations(errors['t'], errors[name]).items():
+            summary[f'{component}_{name}'] = amplitude
+    return summary
+
+
+def compare_runs(
+    runs: dict[str, Run],
+    reference: Run | None = None,
+    max_points: int = 4_096,
+    exact: bool = False,
+) -> pd.DataFrame:
+    '''Сводки error_statistics нескольких прогонов относительно общего эталона (строка на прогон)'''
+    return pd.DataFrame({name: error_statistics(run, reference, max_points, exact) for name, run in runs.items()}).T
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Анализ результатов прогонов по колоночному хранилищу')
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('ingest', help='Загрузка CSV / .npy в хранилище')
+    load.add_argument('source', help='Результаты прогона (CSV save_states, .npy NpySink)')
+    load.add_argument('directory', help='Каталог хранилища')
+    load.add_argument('--factor', type=int, default=16, help='Коэффициент прореживания между уровнями')
+    summary = commands.add_parser('summary', help='Сводка ошибок прогона')
+    summary.add_argument('directory', nargs='+', help='Хранилища прогонов')
+    summary.add_argument('--reference', default=None, help='Хранилище эталона (по умолчанию - начальное состояние)')
+    summary.add_argument('--max-points', type=int, default=4_096)
+    summary.add_argument('--exact', action='store_true', help='Ошибки по строкам полного разрешения')
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        run = ingest(args.source, args.directory, factor=args.factor)
+        print(f'{len(run)} states, {run.levels} pyramid levels')
+        return
+    reference = Run(args.reference) if args.reference else None
+    table = compare_runs({directory: Run(directory) for directory in args.directory}, reference, args.max_points, args.exact)
+    print(table.T.to_string(float_format=lambda value: f'{value:.6g}'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+'''
+Контрольные точки навигации для возобновления длинных прогонов.
+
+Контрольная точка - несжатый .npz с полным состоянием интегратора после tick тактов источника:
+    config     - параметры, от которых зависит результат (проверяются при возобновлении)
+    tick       - число обработанных тактов, источник при возобновлении читается с этого такта
+    scalars    - скалярные величины prevState (StateHistory.COLUMNS)
+    C_body_to_ref - матрица МНК (3, 3) из шага [14] (используется в [6] следующего цикла)
+    attitude   - рекуррентные C_inertial_to_body, C_inertial_to_ref (2, 3, 3) или,
+                 при attitude='quaternion', q_inertial_to_body, q_inertial_to_ref (2, 4)
+    increment  - незавершённое приращение (7,): t, dax, day, daz, dwx, dwy, dwz (пустое на границе приращения)
+    increments - завершённые приращения текущего цикла (k, 7)
+    normalization_cycles - счётчик циклов нормирования (шаг [14])
+    sinks      - (число строк, позиция в файле) приёмников состояний (n, 2) после сброса (см. sinks.py)
+Значения хранятся в точности вычислений, longdouble пишется в .npz без потерь.
+Файл пишется во временный рядом и подменяется атомарно (os.replace), поэтому прерывание
+во время записи оставляет предыдущую контрольную точку целой.
+'''
+import os
+import json
+from dataclasses import dataclass, field
+import numpy as np
+
+from .state import State, QuaternionState
+from .state_history import StateHistory
+from .small_increments import SmallIncrements
+
+
+@dataclass
+class Checkpoint:
+    tick: int
+    state: State
+    increment: SmallIncrements | None
+    increments: list[SmallIncrements]
+    normalization_cycles: int
+    config: dict
+    sinks: list[tuple[int, int]] = field(default_factory=list)
+
+    def save(self, filepath: str) -> None:
+        state = self.state
+        dtype = np.asarray(state.t).dtype
+        if isinstance(state, QuaternionState):
+            attitude = np.array([state.q_inertial_to_body, state.q_inertial_to_ref], dtype)
+        else:
+            attitude = np.array([state.C_inertial_to_body, state.C_inertial_to_ref], dtype)
+
+        tmp = f'{filepath}.tmp'
+        with open(tmp, 'wb') as fp:
+            np.savez(
+                fp,
+                config=np.array(json.dumps(self.config, sort_keys=True)),
+                tick=np.array(self.tick, np.int64),
+                scalars=np.asarray(state.values, dtype),
+                C_body_to_ref=np.asarray(state.C_body_to_ref, dtype),
+                attitude=attitude,
+                increment=_pack([self.increment] if self.increment is not None else [], dtype).reshape(-1),
+                increments=_pack(self.increments, dtype),
+                normalization_cycles=np.array(self.normalization_cycles, np.int64),
+                sinks=np.array(self.sinks, np.int64).reshape(-1, 2),
+            )
+        os.replace(tmp, filepath)
+
+    @classmethod
+    def load(cls, filepath: str) -> 'Checkpoint':
+        with np.load(filepath) as data:
+            scalars, attitude, C_body_to_ref = data['scalars'], data['attitude'], data['C_body_to_ref']
+            dtype = scalars.dtype.type
+            if attitude.shape == (len(StateHistory.QUATERNIONS), 4):
+                state = QuaternionState(*scalars, *attitude, dtype=dtype)
+                state.C_body_to_ref = C_body_to_ref
+            else:
+                state = State(*scalars, C_body_to_ref, *attitude, dtype=dtype)
+            increment = data['increment']
+            return cls(
+                tick=int(data['tick']),
+                state=state,
+                increment=SmallIncrements(*increment, dtype=dtype) if len(increment) else None,
+                increments=[SmallIncrements(*row, dtype=dtype) for row in data['increments']],
+                normalization_cycles=int(data['normalization_cycles']),
+                config=json.loads(str(data['config'])),
+                sinks=[tuple(int(value) for value in row) for row in data['sinks']] if 'sinks' in data else [],
+            )
+
+
+def _pack(increments: list[SmallIncrements], dtype: type) -> np.ndarray:
+    return np.array([incr.data for incr in increments], dtype).reshape(-1, 7)
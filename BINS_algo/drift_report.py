@@ -0,0 +1,86 @@
+'''
+Отчёт о расхождении рабочего (float64) и эталонного (longdouble) режимов точности.
+
+Один и тот же сценарий прогоняется в обоих режимах, после чего по каждому состоянию
+считаются ошибки координат [m], скоростей [m/sec] и углов ориентации [arcsec] float64
+относительно longdouble.
+
+Запуск из командной строки (по умолчанию - 90-минутная миссия неподвижной БИНС):
+    python -m BINS_algo.drift_report [scenario.json] [--kernels closed_form]
+'''
+import json
+import time
+import asyncio
+import argparse
+from dataclasses import replace
+import numpy as np
+import pandas as pd
+
+from .scenarios import Scenario
+from .constants import RADIUS_EARTH
+
+
+ARCSEC = np.rad2deg(1) * 3_600
+
+
+def run_precision(scenario: Scenario, precision: str) -> tuple[pd.DataFrame, float]:
+    '''История состояний сценария в заданной точности и время счёта [sec]'''
+    nav = replace(scenario, precision=precision).navigation_system()
+    started = time.perf_counter()
+    asyncio.run(nav.navigate_blocks())
+    elapsed = time.perf_counter() - started
+    return pd.DataFrame(nav.state_vault.as_array().astype(np.float64), columns=nav.state_vault.COLUMNS), elapsed
+
+
+def compare_precision(scenario: Scenario = Scenario()) -> tuple[pd.DataFrame, dict]:
+    '''
+    Расхождение float64 относительно longdouble: (ошибки по времени, сводка).
+    Сводка содержит максимальные и конечные ошибки и время счёта обоих режимов.
+    '''
+    reference, reference_elapsed = run_precision(scenario, 'longdouble')
+    fast, fast_elapsed = run_precision(scenario, 'float64')
+
+    drift = pd.DataFrame({'t': reference['t']})
+    drift['north_m'] = (fast['latitude'] - reference['latitude']) * float(RADIUS_EARTH)
+    drift['east_m'] = (fast['longitude'] - reference['longitude']) * float(RADIUS_EARTH) * np.cos(reference['latitude'])
+    drift['position_m'] = np.hypot(drift['north_m'], drift['east_m'])
+    drift['velocity_m_s'] = np.hypot(fast['velocity_x_ref'] - reference['velocity_x_ref'], fast['velocity_y_ref'] - reference['velocity_y_ref'])
+    for angle in ('heading', 'pitch', 'roll'):
+        drift[f'{angle}_arcsec'] = np.angle(np.exp(1j * (fast[angle] - reference[angle]))) * ARCSEC
+
+    errors = drift.drop(columns='t').abs()
+    summary = {
+        'states': len(drift),
+        'duration_sec': float(drift['t'].iloc[-1]) if len(drift) else 0.0,
+        'longdouble_sec': reference_elapsed,
+        'float64_sec': fast_elapsed,
+        'speedup': reference_elapsed / fast_elapsed,
+        **{f'max_{name}': float(value) for name, value in errors.max().items()},
+        **{f'final_{name}': float(value) for name, value in errors.iloc[-1].items()},
+    }
+    return drift, summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Сравнение режимов точности float64 и longdouble')
+    parser.add_argument('scenario', nargs='?', help='JSON с параметрами Scenario (по умолчанию - 90-минутная миссия)')
+    parser.add_argument('--kernels', default=None, help='Ядра 3x3 операций (reference / closed_form / numba)')
+    parser.add_argument('--output', default=None, help='CSV для ошибок по времени')
+    args = parser.parse_args()
+
+    scenario = Scenario()
+    if args.scenario:
+        with open(args.scenario) as fp:
+            scenario = Scenario(**json.load(fp))
+    if args.kernels:
+        scenario = replace(scenario, kernels=args.kernels)
+
+    drift, summary = compare_precision(scenario)
+    if args.output:
+        drift.to_csv(args.output, index=False)
+    for name, value in summary.items():
+        print(f'{name:>24}: {value:.6g}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+'''
+Модель Земли и величины навигационной СК, зависящие от широты.
+
+Модели:
+    sphere - сфера радиуса RADIUS_EARTH с постоянным GRAVITY_AXELERATION и U_EARTH_ROTATION_RATE (эталон)
+    wgs84  - эллипсоид WGS-84: радиусы кривизны меридиана R_M и первого вертикала R_N,
+             нормальная сила тяжести по формуле Сомильяны, скорость вращения 7.292115e-5 rad/sec
+
+NavFrame - контекст цикла: синус, косинус, тангенс широты, проекции скорости вращения Земли,
+радиусы кривизны и сила тяжести считаются один раз на широте prevState и используются в шагах
+[10], [15] и [16]. Пока широта не меняется (стоянка), величины не пересчитываются.
+Для сферы радиусы и сила тяжести - константы модели, результат совпадает с прежними формулами побитно.
+'''
+from dataclasses import dataclass
+import numpy as np
+
+from .precision import Precision, LONGDOUBLE
+from .constants import U_EARTH_ROTATION_RATE, GRAVITY_AXELERATION, RADIUS_EARTH
+
+
+@dataclass(frozen=True)
+class EarthModel:
+    name: str
+    semi_major_axis: float
+    eccentricity2: float
+    gravity_equator: float
+    gravity_k: float
+    rotation_rate: float
+
+    def radii(self, sin_latitude: np.floating, dtype: type = np.longdouble) -> tuple[np.floating, np.floating]:
+        '''Радиусы кривизны меридиана R_M и первого вертикала R_N'''
+        a = dtype(self.semi_major_axis)
+        if self.eccentricity2 == 0:
+            return a, a
+        e2 = dtype(self.eccentricity2)
+        w2 = 1 - e2 * sin_latitude * sin_latitude
+        radius_east = a / np.sqrt(w2)
+        return radius_east * (1 - e2) / w2, radius_east
+
+    def gravity(self, sin_latitude: np.floating, dtype: type = np.longdouble) -> np.floating:
+        '''Нормальная сила тяжести на поверхности: γ_e (1 + k sin^2 φ) / sqrt(1 - e^2 sin^2 φ)'''
+        if self.eccentricity2 == 0 and self.gravity_k == 0:
+            return dtype(self.gravity_equator)
+        sin2 = sin_latitude * sin_latitude
+        return dtype(self.gravity_equator) * (1 + dtype(self.gravity_k) * sin2) / np.sqrt(1 - dtype(self.eccentricity2) * sin2)
+
+
+SPHERE = EarthModel(
+    name='sphere',
+    semi_major_axis=RADIUS_EARTH,
+    eccentricity2=0.0,
+    gravity_equator=GRAVITY_AXELERATION,
+    gravity_k=0.0,
+    rotation_rate=U_EARTH_ROTATION_RATE,
+)
+_WGS84_FLATTENING = 1 / 298.257223563
+WGS84 = EarthModel(
+    name='wgs84',
+    semi_major_axis=6_378_137.0,
+    eccentricity2=_WGS84_FLATTENING * (2 - _WGS84_FLATTENING),
+    gravity_equator=9.7803253359,
+    gravity_k=0.00193185265241,
+    rotation_rate=7.292115e-5,
+)
+
+EARTH_MODELS = {model.name: model for model in (SPHERE, WGS84)}
+
+
+def get_earth_model(earth: 'str | EarthModel') -> EarthModel:
+    '''Модель Земли по имени (sphere, wgs84) или готовый объект'''
+    if isinstance(earth, EarthModel):
+        return earth
+    assert earth in EARTH_MODELS, f'unknown earth model: {earth}, expected one of {tuple(EARTH_MODELS)}'
+    return EARTH_MODELS[earth]
+
+
+class NavFrame:
+    '''Величины опорной СК на широте latitude, общие для шагов одного цикла'''
+    __slots__ = (
+        'earth', 'dtype', 'rotation_rate', 'latitude', 'sin_latitude', 'cos_latitude', 'tan_latitude',
+        'earth_rate_y', 'earth_rate_z', 'radius_north', 'radius_east', 'gravity',
+    )
+
+    def __init__(self, precision: Precision = LONGDOUBLE, earth: 'str | EarthModel' = SPHERE):
+        self.earth = get_earth_model(earth)
+        self.dtype = precision.dtype
+        # Для сферы - те же приведённые константы, что в Precision
+        self.rotation_rate = precision.U_EARTH_ROTATION_RATE if self.earth is SPHERE else self.dtype(self.earth.rotation_rate)
+        self.latitude = None
+
+    def at(self, latitude: np.floating) -> 'NavFrame':
+        '''Пересчёт на широте latitude (если она изменилась), возвращает self'''
+        if latitude == self.latitude:
+            return self
+        return self.compute(latitude)
+
+    def compute(self, latitude: np.floating | np.ndarray) -> 'NavFrame':
+        '''Пересчёт без проверки кэша, latitude - скаляр или массив широт (K,) нескольких навигаторов'''
+        self.latitude = latitude
+        self.sin_latitude = np.sin(latitude)
+        self.cos_latitude = np.cos(latitude)
+        self.tan_latitude = np.tan(latitude)
+        # Проекции скорости вращения Земли: (0, U cos φ, U sin φ)
+        self.earth_rate_y = self.rotation_rate * self.cos_latitude
+        self.earth_rate_z = self.rotation_rate * self.sin_latitude
+        self.radius_north, self.radius_east = self.earth.radii(self.sin_latitude, self.dtype)
+        self.gravity = self.earth.gravity(self.sin_latitude, self.dtype)
+        return self
+
+    @property
+    def earth_rate(self) -> np.ndarray:
+        return np.array([0, self.earth_rate_y, self.earth_rate_z], self.dtype)
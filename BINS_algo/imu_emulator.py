@@ -1,3 +1,4 @@
+import os
 import numpy as np
 import pandas as pd
 
@@ -8,27 +9,144 @@ from .constants import U_EARTH_ROTATION_RATE, RADIUS_EARTH, GRAVITY_AXELERATION
 
 
 class IMU_reader:
+    '''
+    Чтение записанных показаний ИНС (t, ax, ay, az, wx, wy, wz).
+
+    Поддерживаемые форматы:
+        text   - текст с разделителем-пробелом и заголовком (читается по частям через pandas)
+        npy    - массив (N, 7) в формате .npy (открывается через memmap)
+        binary - сырые записи фиксированной длины из 7 чисел dtype (float64/float32) через np.memmap
+    Формат по умолчанию определяется по расширению файла: .npy, .bin/.f64/.f32, остальное - текст.
+
+    Чтение можно начать с произвольной записи start (возобновление с контрольной точки):
+    бинарные форматы адресуются напрямую, для текста строится индекс байтовых смещений каждой
+    INDEX_STEP-й записи (один проход по байтам без разбора чисел), который кэшируется рядом
+    с журналом в filepath + '.idx.npz' и перестраивается при изменении размера или времени файла.
+    '''
+    COLUMNS = ('t', 'ax', 'ay', 'az', 'wx', 'wy', 'wz')
+    BINARY_EXTENSIONS = {'.bin': np.float64, '.f64': np.float64, '.f32': np.float32}
+    INDEX_STEP = 4096
+    INDEX_READ_SIZE = 1 << 24
+
     initial_state: State
     filepath: str
-    dataframe: pd.DataFrame
+    frequency: int
+    format: str
+    dtype: type
+    chunk_size: int
 
-    def __init__(self, initial_state: State, filepath: str):
+    def __init__(
+        self,
+        initial_state: State,
+        filepath: str,
+        frequency: int = 800,
+        format: str | None = None,
+        dtype: type | None = None,
+        chunk_size: int = 65_536,
+    ):
+        extension = os.path.splitext(filepath)[1].lower()
         self.initial_state = initial_state
         self.filepath = filepath
+        self.frequency = frequency
+        self.format = format or ('npy' if extension == '.npy' else 'binary' if extension in self.BINARY_EXTENSIONS else 'text')
+        self.dtype = dtype or self.BINARY_EXTENSIONS.get(extension, np.float64)
+        self.chunk_size = chunk_size
+        assert self.format in ('text', 'npy', 'binary'), f'unknown IMU log format: {self.format}'
+        self._index: np.ndarray | None = None
 
-    async def iter(self):
-        with open(self.filepath, 'r+') as fp:
-            self.dataframe = pd.read_csv(fp, sep=' ')
-        for _, frame in self.dataframe.iterrows():
-            yield SmallIncrements(
-                t=frame['t'],
-                dax=frame['ax'],
-                day=frame['ay'],
-                daz=frame['az'],
-                dwx=frame['wx'],
-                dwy=frame['wy'],
-                dwz=frame['wz'],
-            )
+    def records(self) -> np.ndarray:
+        '''Все записи (N, 7) без загрузки в память (memmap), только для бинарных форматов'''
+        match self.format:
+            case 'npy':
+                records = np.load(self.filepath, mmap_mode='r')
+            case 'binary':
+                records = np.memmap(self.filepath, dtype=self.dtype, mode='r').reshape(-1, len(self.COLUMNS))
+            case _:
+                raise ValueError('records() is available only for binary formats, use iter_blocks()')
+        assert records.ndim == 2 and records.shape[1] == len(self.COLUMNS), f'(N, {len(self.COLUMNS)}) records expected'
+        return records
+
+    def text_index(self) -> np.ndarray:
+        '''Байтовые смещения записей 0, INDEX_STEP, 2 INDEX_STEP, ... текстового журнала'''
+        if self._index is not None:
+            return self._index
+        stat = os.stat(self.filepath)
+        cache = f'{self.filepath}.idx.npz'
+        try:
+            with np.load(cache) as data:
+                if (int(data['size']), int(data['mtime_ns']), int(data['step'])) == (stat.st_size, stat.st_mtime_ns, self.INDEX_STEP):
+                    self._index = data['offsets']
+                    return self._index
+        except (OSError, KeyError, ValueError):
+            pass
+
+        offsets = []
+        with open(self.filepath, 'rb') as fp:
+            # Запись i начинается после i-го перевода строки (нулевой завершает заголовок)
+            lines, position = -1, 0
+            while chunk := fp.read(self.INDEX_READ_SIZE):
+                newlines = np.flatnonzero(np.frombuffer(chunk, np.uint8) == ord('\n'))
+                records = lines + 1 + np.arange(len(newlines))
+                starts = position + newlines[records % self.INDEX_STEP == 0] + 1
+                offsets.extend(int(start) for start in starts if start < stat.st_size)
+                lines += len(newlines)
+                position += len(chunk)
+        self._index = np.array(offsets, np.int64)
+        try:
+            np.savez(cache, size=stat.st_size, mtime_ns=stat.st_mtime_ns, step=self.INDEX_STEP, offsets=self._index)
+        except OSError:
+            pass
+        return self._index
+
+    def count(self) -> int:
+        '''Число записей журнала (для текста - по индексу и хвосту после последней индексированной записи)'''
+        if self.format != 'text':
+            return len(self.records())
+        index = self.text_index()
+        if not len(index):
+            return 0
+        with open(self.filepath, 'rb') as fp:
+            fp.seek(index[-1])
+            tail = sum(1 for line in fp if line.strip())
+        return (len(index) - 1) * self.INDEX_STEP + tail
+
+    def _text_blocks(self, start: int = 0):
+        if start == 0:
+            with pd.read_csv(self.filepath, sep=' ', chunksize=self.chunk_size) as reader:
+                yield from reader
+            return
+
+        index = self.text_index()
+        if start // self.INDEX_STEP >= len(index):
+            return
+        columns = pd.read_csv(self.filepath, sep=' ', nrows=0).columns
+        with open(self.filepath, 'rb') as fp:
+            fp.seek(index[start // self.INDEX_STEP])
+            with pd.read_csv(fp, sep=' ', header=None, names=columns, skiprows=start % self.INDEX_STEP, chunksize=self.chunk_size) as reader:
+                yield from reader
+
+    async def iter_blocks(self, start: int = 0):
+        '''Поток блоков записей (n, 7) размером до chunk_size, начиная с записи start'''
+        if self.format == 'text':
+            for frame in self._text_blocks(start):
+                yield frame[list(self.COLUMNS)].to_numpy(np.float64)
+            return
+
+        records = self.records()
+        for offset in range(start, len(records), self.chunk_size):
+            yield np.asarray(records[offset:offset + self.chunk_size])
+
+    async def iter(self, start: int = 0):
+        async for block in self.iter_blocks(start):
+            # Приращения - представления строк блока, блок не изменяется навигацией
+            for record in block:
+                yield SmallIncrements.view(record)
+
+    async def convert(self, filepath: str, dtype: type = np.float64) -> None:
+        '''Потоковая перезапись журнала в бинарный формат фиксированной длины (.bin/.f64/.f32)'''
+        with open(filepath, 'wb') as fp:
+            async for block in self.iter_blocks():
+                np.ascontiguousarray(block, dtype=dtype).tofile(fp)
 
 
 class IMU_emulator:
@@ -37,22 +155,41 @@ class IMU_emulator:
     w_b: np.ndarray
     frequency: int
     ttl_sec: int
+    chunk_size: int
 
-    def __init__(self, initial_state: State, a_b: np.ndarray, w_b: np.ndarray, frequency: int = 800, ttl_sec: int = 90 * 60):
+    def __init__(self, initial_state: State, a_b: np.ndarray, w_b: np.ndarray, frequency: int = 800, ttl_sec: int = 90 * 60, chunk_size: int = 65_536):
         self.initial_state = initial_state
         self.a_b = a_b
         self.w_b = w_b
         self.frequency = frequency
         self.ttl_sec = ttl_sec
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def stationary(
+        cls,
+        initial_state: State,
+        gyro_bias: np.ndarray | tuple = (0, 0, 0),
+        accel_bias: np.ndarray | tuple = (0, 0, 0),
+        **kwargs,
+    ) -> 'IMU_emulator':
+        '''Неподвижная ИНС: проекции скорости вращения Земли и ускорения силы тяжести на связанные оси с дрейфами датчиков'''
+        C_ref_to_body = initial_state.C_body_to_ref.T
+        w_b = C_ref_to_body @ MathFunc.EarthRotationRateRef(initial_state.latitude) + np.asarray(gyro_bias, np.longdouble)
+        a_b = C_ref_to_body @ np.array([0, 0, GRAVITY_AXELERATION], np.longdouble) + np.asarray(accel_bias, np.longdouble)
+        return cls(initial_state, a_b, w_b, **kwargs)
 
-    async def iter(self):
-        current_time = 0
+    def ticks(self) -> int:
+        '''Число тактов за ttl_sec (общее для iter и iter_blocks)'''
+        return int(round(self.ttl_sec * self.frequency))
 
-        while current_time < self.ttl_sec:
-            dt = 1 / self.frequency
-            current_time += dt
+    async def iter(self, start: int = 0):
+        # Время такта k - (k + 1) dt, как в iter_blocks: без накопления суммы шагов, с такта start сразу
+        dt = 1 / self.frequency
+        step = np.longdouble(dt)
+        for tick in range(start, self.ticks()):
             yield SmallIncrements(
-                t=current_time,
+                t=(tick + 1) * step,
                 dax=self.a_b[0] * dt,
                 day=self.a_b[1] * dt,
                 daz=self.a_b[2] * dt,
@@ -60,3 +197,16 @@ class IMU_emulator:
                 dwy=self.w_b[1] * dt,
                 dwz=self.w_b[2] * dt,
             )
+
+    async def iter_blocks(self, start: int = 0):
+        '''Поток блоков записей (n, 7) размером до chunk_size, начиная с такта start'''
+        dt = 1 / self.frequency
+        count = self.ticks()
+        increments = np.concatenate((self.a_b, self.w_b)).astype(np.longdouble) * dt
+
+        for start in range(start, count, self.chunk_size):
+            stop = min(start + self.chunk_size, count)
+            block = np.empty((stop - start, 7), np.longdouble)
+            block[:, 0] = np.arange(start + 1, stop + 1) * np.longdouble(dt)
+            block[:, 1:] = increments
+            yield block
@@ -0,0 +1,264 @@
+'''
+Ядра малоразмерной линейной алгебры (3x3 / 3) для шагов алгоритма БИНС.
+
+reference   - эталон: функции math_functions и оператор @
+closed_form - замкнутые формулы для матриц поворота и Рунге-Кута, запись в предвыделенные буферы
+numba       - те же замкнутые формулы, скомпилированные numba (вычисления в float64, результаты - в точности
+              навигации; если numba установлена)
+
+Результаты acceleration, euler_vector, body_rotation, ref_rotation и matvec у closed_form и numba
+пишутся во внутренние буферы ядра и действительны до следующего вызова того же метода.
+matmul и matmul_bt без out выделяют новый массив (матрицы сохраняются в состоянии).
+'''
+import numpy as np
+
+from .small_increments import SmallIncrements
+from . import math_functions as MathFunc
+from .precision import Precision, LONGDOUBLE, FLOAT64
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _acceleration(increments: np.ndarray, h1: float, out: np.ndarray) -> np.ndarray:
+    '''[5] Рунге-Кутта 4 порядка: k = da - dw x Δa, increments (S, 6): dax, day, daz, dwx, dwy, dwz'''
+    y0 = y1 = y2 = increments[0, 0] * 0
+    for i in range(increments.shape[0]):
+        ax, ay, az, wx, wy, wz = increments[i, 0], increments[i, 1], increments[i, 2], increments[i, 3], increments[i, 4], increments[i, 5]
+
+        k10 = ax - (wy * y2 - wz * y1)
+        k11 = ay - (wz * y0 - wx * y2)
+        k12 = az - (wx * y1 - wy * y0)
+
+        p0, p1, p2 = y0 + h1 / 2 * k10, y1 + h1 / 2 * k11, y2 + h1 / 2 * k12
+        k20 = ax - (wy * p2 - wz * p1)
+        k21 = ay - (wz * p0 - wx * p2)
+        k22 = az - (wx * p1 - wy * p0)
+
+        p0, p1, p2 = y0 + h1 / 2 * k20, y1 + h1 / 2 * k21, y2 + h1 / 2 * k22
+        k30 = ax - (wy * p2 - wz * p1)
+        k31 = ay - (wz * p0 - wx * p2)
+        k32 = az - (wx * p1 - wy * p0)
+
+        p0, p1, p2 = y0 + h1 * k30, y1 + h1 * k31, y2 + h1 * k32
+        k40 = ax - (wy * p2 - wz * p1)
+        k41 = ay - (wz * p0 - wx * p2)
+        k42 = az - (wx * p1 - wy * p0)
+
+        y0 += (k10 + 2 * k20 + 2 * k30 + k40) / 6
+        y1 += (k11 + 2 * k21 + 2 * k31 + k41) / 6
+        y2 += (k12 + 2 * k22 + 2 * k32 + k42) / 6
+
+    out[0], out[1], out[2] = y0, y1, y2
+    return out
+
+
+def _euler_vector(increments: np.ndarray, out: np.ndarray) -> np.ndarray:
+    '''[7] Вектор конечного поворота с двухвыборочной поправкой на конинг по половинам цикла (чётное число приращений)'''
+    half = increments.shape[0] // 2
+    a0 = a1 = a2 = b0 = b1 = b2 = increments[0, 3] * 0
+    for i in range(half):
+        a0 += increments[i, 3]
+        a1 += increments[i, 4]
+        a2 += increments[i, 5]
+    for i in range(half, increments.shape[0]):
+        b0 += increments[i, 3]
+        b1 += increments[i, 4]
+        b2 += increments[i, 5]
+    out[0] = a0 + b0 + 2 / 3 * (a1 * b2 - a2 * b1)
+    out[1] = a1 + b1 + 2 / 3 * (a2 * b0 - a0 * b2)
+    out[2] = a2 + b2 + 2 / 3 * (a0 * b1 - a1 * b0)
+    return out
+
+
+def _rotation(x, y, z, a, b, out: np.ndarray) -> np.ndarray:
+    '''I - a [v x] + b [v x]^2 в замкнутом виде'''
+    xx, yy, zz, xy, xz, yz = b * x * x, b * y * y, b * z * z, b * x * y, b * x * z, b * y * z
+    out[0, 0], out[0, 1], out[0, 2] = 1 - yy - zz, a * z + xy, -a * y + xz
+    out[1, 0], out[1, 1], out[1, 2] = -a * z + xy, 1 - xx - zz, a * x + yz
+    out[2, 0], out[2, 1], out[2, 2] = a * y + xz, -a * x + yz, 1 - xx - yy
+    return out
+
+
+def _body_rotation(tetta: np.ndarray, out: np.ndarray) -> np.ndarray:
+    '''[8] I - sin(θ)/θ [θ x] + (1 - cos(θ))/θ^2 [θ x]^2'''
+    x, y, z = tetta[0], tetta[1], tetta[2]
+    module = np.sqrt(x * x + y * y + z * z)
+    return _rotation(x, y, z, np.sin(module) / module, (1 - np.cos(module)) / (module * module), out)
+
+
+def _ref_rotation(w_ref: np.ndarray, H4: float, out: np.ndarray) -> np.ndarray:
+    '''[11] I - H4 [w x] + H4^2 / 2 [w x]^2'''
+    return _rotation(w_ref[0], w_ref[1], w_ref[2], H4, H4 * H4 / 2, out)
+
+
+def _matmul(a: np.ndarray, b: np.ndarray, out: np.ndarray) -> np.ndarray:
+    for i in range(3):
+        for j in range(3):
+            out[i, j] = a[i, 0] * b[0, j] + a[i, 1] * b[1, j] + a[i, 2] * b[2, j]
+    return out
+
+
+def _matmul_bt(a: np.ndarray, b: np.ndarray, out: np.ndarray) -> np.ndarray:
+    for i in range(3):
+        for j in range(3):
+            out[i, j] = a[i, 0] * b[j, 0] + a[i, 1] * b[j, 1] + a[i, 2] * b[j, 2]
+    return out
+
+
+def _matvec(a: np.ndarray, x: np.ndarray, out: np.ndarray) -> np.ndarray:
+    for i in range(3):
+        out[i] = a[i, 0] * x[0] + a[i, 1] * x[1] + a[i, 2] * x[2]
+    return out
+
+
+class ReferenceKernels:
+    '''Эталонные ядра: функции math_functions и оператор @'''
+    name = 'reference'
+    precision: Precision
+
+    def __init__(self, precision: Precision = LONGDOUBLE):
+        self.precision = precision
+
+    def acceleration(self, increments: list[SmallIncrements], h1: int | float | np.longdouble) -> np.ndarray:
+        return MathFunc.calculateAxeleration(increments, h1, self.precision)
+
+    def euler_vector(self, increments: list[SmallIncrements]) -> np.ndarray:
+        return MathFunc.calculateEulerRotationVectorProjection(increments, self.precision)
+
+    def body_rotation(self, tetta: np.ndarray) -> np.ndarray:
+        return MathFunc.calculateAngleOfBodyRotation(tetta, self.precision)
+
+    def ref_rotation(self, w_ref: np.ndarray, H4: int | float | np.longdouble) -> np.ndarray:
+        return MathFunc.calculateAngleOfRefRotation(w_ref, H4, self.precision)
+
+    def matmul(self, a: np.ndarray, b: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        return a @ b
+
+    def matmul_bt(self, a: np.ndarray, b: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        return a @ b.transpose()
+
+    def matvec(self, a: np.ndarray, x: np.ndarray) -> np.ndarray:
+        return a @ x
+
+
+class ClosedFormKernels(ReferenceKernels):
+    '''Замкнутые формулы на предвыделенных буферах'''
+    name = 'closed_form'
+    dtype: type
+
+    def __init__(self, precision: Precision = LONGDOUBLE):
+        super().__init__(precision)
+        self.dtype = dtype = precision.dtype
+        self._increments = np.empty((4, 6), dtype)
+        self._acceleration = np.empty(3, dtype)
+        self._tetta = np.empty(3, dtype)
+        self._body_rotation = np.empty((3, 3), dtype)
+        self._ref_rotation = np.empty((3, 3), dtype)
+        self._matvec = np.empty(3, dtype)
+
+    def _pack(self, increments: list[SmallIncrements]) -> np.ndarray:
+        if len(increments) != len(self._increments):
+            self._increments = np.empty((len(increments), 6), self.dtype)
+        for row, incr in zip(self._increments, increments):
+            row[:] = incr.data[1:]
+        return self._increments
+
+    def acceleration(self, increments: list[SmallIncrements], h1: int | float | np.longdouble) -> np.ndarray:
+        return _acceleration(self._pack(increments), h1, self._acceleration)
+
+    def euler_vector(self, increments: list[SmallIncrements]) -> np.ndarray:
+        return _euler_vector(self._pack(increments), self._tetta)
+
+    def body_rotation(self, tetta: np.ndarray) -> np.ndarray:
+        return _body_rotation(tetta, self._body_rotation)
+
+    def ref_rotation(self, w_ref: np.ndarray, H4: int | float | np.longdouble) -> np.ndarray:
+        return _ref_rotation(w_ref, H4, self._ref_rotation)
+
+    def matmul(self, a: np.ndarray, b: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        return np.matmul(a, b, out=np.empty((3, 3), self.dtype) if out is None else out)
+
+    def matmul_bt(self, a: np.ndarray, b: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        return np.matmul(a, b.transpose(), out=np.empty((3, 3), self.dtype) if out is None else out)
+
+    def matvec(self, a: np.ndarray, x: np.ndarray) -> np.ndarray:
+        return np.matmul(a, x, out=self._matvec)
+
+
+class NumbaKernels(ClosedFormKernels):
+    '''
+    Замкнутые формулы, скомпилированные numba; вычисления ведутся в float64 во внутренних буферах,
+    результаты возвращаются в точности навигации (result_dtype), как у reference и closed_form
+    '''
+    name = 'numba'
+    result_dtype: type
+
+    def __init__(self, precision: Precision = LONGDOUBLE):
+        if numba is None:
+            raise ImportError('numba kernels require the numba package')
+        super().__init__(FLOAT64)
+        self.precision = precision
+        self.result_dtype = dtype = precision.dtype
+        self._acceleration_out = np.empty(3, dtype)
+        self._tetta_out = np.empty(3, dtype)
+        self._body_rotation_out = np.empty((3, 3), dtype)
+        self._ref_rotation_out = np.empty((3, 3), dtype)
+        self._matvec_out = np.empty(3, dtype)
+        jit = numba.njit(cache=True)
+        self._acceleration_jit = jit(_acceleration)
+        self._euler_vector_jit = jit(_euler_vector)
+        self._rotation_jit = jit(_rotation)
+        self._matmul_jit = jit(_matmul)
+        self._matmul_bt_jit = jit(_matmul_bt)
+        self._matvec_jit = jit(_matvec)
+
+    @staticmethod
+    def _f64(value: np.ndarray) -> np.ndarray:
+        return np.asarray(value, np.float64)
+
+    def _result(self, result: np.ndarray, out: np.ndarray | None) -> np.ndarray:
+        if out is None:
+            return result.astype(self.result_dtype, copy=False)
+        out[...] = result
+        return out
+
+    def acceleration(self, increments: list[SmallIncrements], h1: int | float | np.longdouble) -> np.ndarray:
+        return self._result(self._acceleration_jit(self._pack(increments), float(h1), self._acceleration), self._acceleration_out)
+
+    def euler_vector(self, increments: list[SmallIncrements]) -> np.ndarray:
+        return self._result(self._euler_vector_jit(self._pack(increments), self._tetta), self._tetta_out)
+
+    def body_rotation(self, tetta: np.ndarray) -> np.ndarray:
+        x, y, z = (float(value) for value in tetta)
+        module = np.sqrt(x * x + y * y + z * z)
+        rotation = self._rotation_jit(x, y, z, np.sin(module) / module, (1 - np.cos(module)) / (module * module), self._body_rotation)
+        return self._result(rotation, self._body_rotation_out)
+
+    def ref_rotation(self, w_ref: np.ndarray, H4: int | float | np.longdouble) -> np.ndarray:
+        x, y, z = (float(value) for value in w_ref)
+        H4 = float(H4)
+        return self._result(self._rotation_jit(x, y, z, H4, H4 * H4 / 2, self._ref_rotation), self._ref_rotation_out)
+
+    def matmul(self, a: np.ndarray, b: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        return self._result(self._matmul_jit(self._f64(a), self._f64(b), np.empty((3, 3), np.float64)), out)
+
+    def matmul_bt(self, a: np.ndarray, b: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        return self._result(self._matmul_bt_jit(self._f64(a), self._f64(b), np.empty((3, 3), np.float64)), out)
+
+    def matvec(self, a: np.ndarray, x: np.ndarray) -> np.ndarray:
+        return self._result(self._matvec_jit(self._f64(a), self._f64(x), self._matvec), self._matvec_out)
+
+
+KERNELS = {
+    kernels.name: kernels
+    for kernels in (ReferenceKernels, ClosedFormKernels, NumbaKernels)
+}
+
+
+def make_kernels(name: str, precision: Precision = LONGDOUBLE) -> ReferenceKernels:
+    '''Ядра по имени: reference, closed_form, numba'''
+    assert name in KERNELS, f'unknown kernels: {name}, expected one of {tuple(KERNELS)}'
+    return KERNELS[name](precision)
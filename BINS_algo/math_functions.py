@@ -1,10 +1,11 @@
 import numpy as np
 
 from .small_increments import SmallIncrements
-from .constants import U_EARTH_ROTATION_RATE, RADIUS_EARTH, GRAVITY_AXELERATION
+from .precision import Precision, LONGDOUBLE
+from .earth import NavFrame
 
 
-def calc_body_to_ref(heading: np.longdouble, pitch: np.longdouble, roll: np.longdouble) -> np.ndarray:
+def calc_body_to_ref(heading: np.longdouble, pitch: np.longdouble, roll: np.longdouble, precision: Precision = LONGDOUBLE) -> np.ndarray:
     return np.array([
         [
             np.cos(heading) * np.cos(roll) + np.sin(heading) * np.sin(pitch) * np.sin(roll),
@@ -21,22 +22,22 @@ def calc_body_to_ref(heading: np.longdouble, pitch: np.longdouble, roll: np.long
             np.sin(pitch),
             np.cos(pitch) * np.cos(roll)
         ]
-    ], dtype=np.longdouble)
+    ], dtype=precision.dtype)
 
 def normalizeMatrix(matrix: np.ndarray) -> None:
     '''Нормализация матрицы'''
     A64 = matrix.astype(np.float64)
     U, _, Vt = np.linalg.svd(A64)
     C = U @ Vt
-    return C.astype(np.longdouble)
+    return C.astype(matrix.dtype)
 
-def EarthRotationRateRef(latitude: np.longdouble) -> np.ndarray:
+def EarthRotationRateRef(latitude: np.longdouble, precision: Precision = LONGDOUBLE) -> np.ndarray:
     '''[0] Угловая скорость вращения Земли'''
     return  np.array([
         0,
-        U_EARTH_ROTATION_RATE * np.cos(latitude),
-        U_EARTH_ROTATION_RATE * np.sin(latitude),
-    ], np.longdouble)
+        precision.U_EARTH_ROTATION_RATE * np.cos(latitude),
+        precision.U_EARTH_ROTATION_RATE * np.sin(latitude),
+    ], precision.dtype)
 
 def integrateAngularRate(increment: SmallIncrements, small_increment: SmallIncrements) -> None:
     '''[1] Накопление приращений угловой скорости'''
@@ -46,6 +47,11 @@ def integrateAxeleration(increment: SmallIncrements, small_increment: SmallIncre
     '''[2] Накопление приращений ускорения'''
     increment.da += small_increment.da
 
+def integrateIncrements(records: np.ndarray, rate_decrease: int) -> np.ndarray:
+    '''[1]-[2] Накопление приращений ускорения и угловой скорости для массива тактов (N, 7) -> (N // rate_decrease, 6)'''
+    count = len(records) // rate_decrease * rate_decrease
+    return records[:count, 1:].reshape(-1, rate_decrease, 6).sum(axis=1)
+
 def errorCompensationAxelerometr(value: SmallIncrements) -> None:
     '''[3] Компенсация погрешностей акселерометров'''
     return
@@ -54,9 +60,17 @@ def errorCompensationAngularRateSensor(value: SmallIncrements) -> None:
     '''[4] Компенсация погрешностей гироскопов'''
     return
 
-def calculateAxeleration(data: list[SmallIncrements], h1: int | float | np.longdouble) -> np.ndarray:
+def errorCompensationAxelerometrBatch(da: np.ndarray) -> None:
+    '''[3] Компенсация погрешностей акселерометров для массива приращений'''
+    return
+
+def errorCompensationAngularRateSensorBatch(dw: np.ndarray) -> None:
+    '''[4] Компенсация погрешностей гироскопов для массива приращений'''
+    return
+
+def calculateAxeleration(data: list[SmallIncrements], h1: int | float | np.longdouble, precision: Precision = LONGDOUBLE) -> np.ndarray:
     '''[5] Вычисление ускорения на интервале с пониженной частотой (RATE_DECREASE * h) уравнение Рунге-Кута 4 порядка'''
-    delta_acceleration = np.array([0, 0 , 0], np.longdouble)
+    delta_acceleration = np.array([0, 0 , 0], precision.dtype)
 
     for i in range(0, len(data)):
         da = data[i].da
@@ -64,7 +78,7 @@ def calculateAxeleration(data: list[SmallIncrements], h1: int | float | np.longd
             [           0, -data[i].dwz,  data[i].dwy],
             [ data[i].dwz,            0, -data[i].dwx],
             [-data[i].dwy,  data[i].dwx,           0],
-        ], np.longdouble)
+        ], precision.dtype)
 
         k1 = da - dw @ delta_acceleration
         k2 = da - dw @ (delta_acceleration + h1 / 2 * k1)
@@ -74,48 +88,109 @@ def calculateAxeleration(data: list[SmallIncrements], h1: int | float | np.longd
 
     return delta_acceleration
 
-def calculateEulerRotationVectorProjection(data: list[SmallIncrements]) -> np.ndarray:
-    '''[7] Вычисление проекций вектора конечного поворота Эйлера θ с пониженной частотой'''
+def calculateAxelerationBatch(da: np.ndarray, dw: np.ndarray, h1: int | float | np.longdouble) -> np.ndarray:
+    '''[5] Вычисление ускорения методом Рунге-Кута 4 порядка сразу для всех циклов: da, dw (M, N, 3) -> (M, 3)'''
+    delta_acceleration = np.zeros((da.shape[0], 3), da.dtype)
+
+    for i in range(da.shape[1]):
+        k1 = da[:, i] - np.cross(dw[:, i], delta_acceleration)
+        k2 = da[:, i] - np.cross(dw[:, i], delta_acceleration + h1 / 2 * k1)
+        k3 = da[:, i] - np.cross(dw[:, i], delta_acceleration + h1 / 2 * k2)
+        k4 = da[:, i] - np.cross(dw[:, i], delta_acceleration + h1 * k3)
+        delta_acceleration += (k1 + 2*k2 + 2*k3 + k4) / 6
+
+    return delta_acceleration
+
+def calculateEulerRotationVectorProjection(data: list[SmallIncrements], precision: Precision = LONGDOUBLE) -> np.ndarray:
+    '''[7] Вычисление проекций вектора конечного поворота Эйлера θ с пониженной частотой (двухвыборочная поправка по половинам цикла)'''
+    half = len(data) // 2
+    a = [sum([incr.dwx for incr in data[:half]]), sum([incr.dwy for incr in data[:half]]), sum([incr.dwz for incr in data[:half]])]
+    b = [sum([incr.dwx for incr in data[half:]]), sum([incr.dwy for incr in data[half:]]), sum([incr.dwz for incr in data[half:]])]
     tetta = np.array([
         sum([incr.dwx for incr in data]),
         sum([incr.dwy for incr in data]),
         sum([incr.dwz for incr in data]),
-    ], np.longdouble) + 2/3 * np.array([
-        (data[0].dwy + data[1].dwy) * (data[2].dwz + data[3].dwz) - (data[0].dwz + data[1].dwz) * (data[2].dwy + data[3].dwy),
-        (data[0].dwz + data[1].dwz) * (data[2].dwx + data[3].dwx) - (data[0].dwx + data[1].dwx) * (data[2].dwz + data[3].dwz),
-        (data[0].dwx + data[1].dwx) * (data[2].dwy + data[3].dwy) - (data[0].dwy + data[1].dwy) * (data[2].dwx + data[3].dwx),
-    ])
-    
+    ], precision.dtype) + 2/3 * np.array([
+        a[1] * b[2] - a[2] * b[1],
+        a[2] * b[0] - a[0] * b[2],
+        a[0] * b[1] - a[1] * b[0],
+    ], precision.dtype)
+
     return tetta
 
-def calculateAngleOfBodyRotation(euler_vector_projection: np.ndarray) -> np.ndarray:
+def calculateEulerRotationVectorProjectionBatch(dw: np.ndarray) -> np.ndarray:
+    '''[7] Вычисление проекций вектора конечного поворота Эйлера θ сразу для всех циклов: dw (M, N, 3) -> (M, 3)'''
+    half = dw.shape[1] // 2
+    return dw.sum(axis=1) + 2/3 * np.cross(dw[:, :half].sum(axis=1), dw[:, half:].sum(axis=1))
+
+def calculateAngleOfBodyRotation(euler_vector_projection: np.ndarray, precision: Precision = LONGDOUBLE) -> np.ndarray:
     '''[8] Расчёт матрицы поворота связанной СК (body) на малый угол'''
     euler_vector_module = np.sqrt(euler_vector_projection[0] ** 2 + euler_vector_projection[1] ** 2 + euler_vector_projection[2] ** 2)
     euler_vector_matrix = np.array([
         [0, -euler_vector_projection[2], euler_vector_projection[1]],
         [euler_vector_projection[2], 0, -euler_vector_projection[0]],
         [-euler_vector_projection[1], euler_vector_projection[0], 0],
-    ], np.longdouble)
+    ], precision.dtype)
     C_prevbody_to_body = np.eye(3) - (np.sin(euler_vector_module) / euler_vector_module) * euler_vector_matrix + ((1 - np.cos(euler_vector_module)) / (euler_vector_module ** 2)) * (euler_vector_matrix @ euler_vector_matrix)
     return C_prevbody_to_body
 
-def calculateAngularRateProjection(velocity_x_ref:np.longdouble, velocity_y_ref: np.longdouble, latitude: np.longdouble) -> np.ndarray:
-    '''[10] Вычисление абсолютной угловой скорости опорной географической СК (ref)'''
-    earthRotationRateRef = EarthRotationRateRef(latitude)
+def calculateAngleOfBodyRotationBatch(euler_vector_projection: np.ndarray) -> np.ndarray:
+    '''[8] Расчёт матриц поворота связанной СК (body) на малый угол сразу для всех циклов: (M, 3) -> (M, 3, 3)'''
+    euler_vector_module = np.sqrt((euler_vector_projection ** 2).sum(axis=1))[:, None, None]
+    euler_vector_matrix = np.zeros((len(euler_vector_projection), 3, 3), euler_vector_projection.dtype)
+    euler_vector_matrix[:, 0, 1] = -euler_vector_projection[:, 2]
+    euler_vector_matrix[:, 0, 2] = euler_vector_projection[:, 1]
+    euler_vector_matrix[:, 1, 0] = euler_vector_projection[:, 2]
+    euler_vector_matrix[:, 1, 2] = -euler_vector_projection[:, 0]
+    euler_vector_matrix[:, 2, 0] = -euler_vector_projection[:, 1]
+    euler_vector_matrix[:, 2, 1] = euler_vector_projection[:, 0]
+    C_prevbody_to_body = np.eye(3) - (np.sin(euler_vector_module) / euler_vector_module) * euler_vector_matrix + ((1 - np.cos(euler_vector_module)) / (euler_vector_module ** 2)) * (euler_vector_matrix @ euler_vector_matrix)
+    return C_prevbody_to_body
+
+def calculateAngularRateProjection(
+        velocity_x_ref: np.longdouble,
+        velocity_y_ref: np.longdouble,
+        latitude: np.longdouble,
+        precision: Precision = LONGDOUBLE,
+        frame: NavFrame | None = None,
+    ) -> np.ndarray:
+    '''
+    [10] Вычисление абсолютной угловой скорости опорной географической СК (ref)
+    frame - величины цикла на широте latitude (см. earth.py), по умолчанию - сферическая Земля
+    '''
+    frame = NavFrame(precision).at(latitude) if frame is None else frame
     delta_angular_rate_ref = np.array([
-        -velocity_y_ref / RADIUS_EARTH,
-        earthRotationRateRef[1] + velocity_x_ref / RADIUS_EARTH,
-        earthRotationRateRef[2] + velocity_x_ref / RADIUS_EARTH * np.tan(latitude),
-    ], np.longdouble)
+        -velocity_y_ref / frame.radius_north,
+        frame.earth_rate_y + velocity_x_ref / frame.radius_east,
+        frame.earth_rate_z + velocity_x_ref / frame.radius_east * frame.tan_latitude,
+    ], precision.dtype)
     return delta_angular_rate_ref
 
-def calculateAngleOfRefRotation(w_ref: np.ndarray, H4: int | float | np.longdouble) -> np.ndarray:
+def calculateAngularRateProjectionStacked(velocity_x_ref: np.ndarray, velocity_y_ref: np.ndarray, frame: NavFrame) -> np.ndarray:
+    '''[10] Абсолютная угловая скорость опорной СК сразу для K навигаторов: скорости (K,), frame на широтах (K,) -> (K, 3)'''
+    return np.stack((
+        -velocity_y_ref / frame.radius_north,
+        frame.earth_rate_y + velocity_x_ref / frame.radius_east,
+        frame.earth_rate_z + velocity_x_ref / frame.radius_east * frame.tan_latitude,
+    ), axis=-1)
+
+def calculateAngleOfRefRotation(w_ref: np.ndarray, H4: int | float | np.longdouble, precision: Precision = LONGDOUBLE) -> np.ndarray:
     '''[11] Расчёт матрицы поворота опорной СК (ref) на малый угол'''
     w_ref_matrix = np.array([
         [0, -w_ref[2], w_ref[1]],
         [w_ref[2], 0, -w_ref[0]],
         [-w_ref[1], w_ref[0], 0],
-    ], np.longdouble)
+    ], precision.dtype)
+    C_prevref_to_ref = np.eye(3) - H4 * w_ref_matrix + (H4 ** 2) / 2 * (w_ref_matrix @ w_ref_matrix)
+    return C_prevref_to_ref
+
+def calculateAngleOfRefRotationStacked(w_ref: np.ndarray, H4: np.ndarray) -> np.ndarray:
+    '''[11] Матрицы поворота опорной СК на малый угол сразу для K навигаторов: w_ref (K, 3), H4 (K,) -> (K, 3, 3)'''
+    w_ref_matrix = np.zeros((len(w_ref), 3, 3), w_ref.dtype)
+    w_ref_matrix[:, 0, 1], w_ref_matrix[:, 0, 2] = -w_ref[:, 2], w_ref[:, 1]
+    w_ref_matrix[:, 1, 0], w_ref_matrix[:, 1, 2] = w_ref[:, 2], -w_ref[:, 0]
+    w_ref_matrix[:, 2, 0], w_ref_matrix[:, 2, 1] = -w_ref[:, 1], w_ref[:, 0]
+    H4 = H4[:, None, None]
     C_prevref_to_ref = np.eye(3) - H4 * w_ref_matrix + (H4 ** 2) / 2 * (w_ref_matrix @ w_ref_matrix)
     return C_prevref_to_ref
 
@@ -127,11 +202,52 @@ def calculateVelocityInRef(
         delta_angular_rate_ref,
         H4: int | float | np.longdouble,
         latitude: np.longdouble,
+        precision: Precision = LONGDOUBLE,
+        frame: NavFrame | None = None,
     ) -> np.ndarray:
-    '''Расчёт линейной скорости в опорной СК (ref)'''
-    earth_rotation_rate = EarthRotationRateRef(latitude)
-
-    next_velocity_x_ref = velocity_x_ref + delta_acceleration_ref[0] + H4 * ((earth_rotation_rate[2] + delta_angular_rate_ref[2]) * velocity_y_ref - (earth_rotation_rate[1] + delta_angular_rate_ref[1]) * velocity_z_ref)
-    next_velocity_y_ref = velocity_y_ref + delta_acceleration_ref[1] + H4 * (-(earth_rotation_rate[2] + delta_angular_rate_ref[2]) * velocity_x_ref + delta_angular_rate_ref[0] * velocity_z_ref)
-    next_velocity_z_ref = velocity_z_ref + delta_acceleration_ref[2] + H4 * ((earth_rotation_rate[1] + delta_angular_rate_ref[1]) * velocity_x_ref - delta_angular_rate_ref[0] * velocity_y_ref - GRAVITY_AXELERATION)
-    return np.array([next_velocity_x_ref, next_velocity_y_ref, next_velocity_z_ref], dtype=np.longdouble)
+    '''Расчёт линейной скорости в опорной СК (ref), frame - как в calculateAngularRateProjection'''
+    frame = NavFrame(precision).at(latitude) if frame is None else frame
+    earth_rate_y, earth_rate_z = frame.earth_rate_y, frame.earth_rate_z
+
+    next_velocity_x_ref = velocity_x_ref + delta_acceleration_ref[0] + H4 * ((earth_rate_z + delta_angular_rate_ref[2]) * velocity_y_ref - (earth_rate_y + delta_angular_rate_ref[1]) * velocity_z_ref)
+    next_velocity_y_ref = velocity_y_ref + delta_acceleration_ref[1] + H4 * (-(earth_rate_z + delta_angular_rate_ref[2]) * velocity_x_ref + delta_angular_rate_ref[0] * velocity_z_ref)
+    next_velocity_z_ref = velocity_z_ref + delta_acceleration_ref[2] + H4 * ((earth_rate_y + delta_angular_rate_ref[1]) * velocity_x_ref - delta_angular_rate_ref[0] * velocity_y_ref - frame.gravity)
+    return np.array([next_velocity_x_ref, next_velocity_y_ref, next_velocity_z_ref], dtype=precision.dtype)
+
+def calculateVelocityInRefStacked(
+        velocity_ref: np.ndarray,
+        delta_acceleration_ref: np.ndarray,
+        delta_angular_rate_ref: np.ndarray,
+        H4: np.ndarray,
+        frame: NavFrame,
+    ) -> np.ndarray:
+    '''[15] Линейная скорость в опорной СК сразу для K навигаторов: векторы (K, 3), H4 (K,), frame на широтах (K,) -> (K, 3)'''
+    velocity_x_ref, velocity_y_ref, velocity_z_ref = velocity_ref[:, 0], velocity_ref[:, 1], velocity_ref[:, 2]
+    earth_rate_y, earth_rate_z = frame.earth_rate_y, frame.earth_rate_z
+
+    next_velocity_x_ref = velocity_x_ref + delta_acceleration_ref[:, 0] + H4 * ((earth_rate_z + delta_angular_rate_ref[:, 2]) * velocity_y_ref - (earth_rate_y + delta_angular_rate_ref[:, 1]) * velocity_z_ref)
+    next_velocity_y_ref = velocity_y_ref + delta_acceleration_ref[:, 1] + H4 * (-(earth_rate_z + delta_angular_rate_ref[:, 2]) * velocity_x_ref + delta_angular_rate_ref[:, 0] * velocity_z_ref)
+    next_velocity_z_ref = velocity_z_ref + delta_acceleration_ref[:, 2] + H4 * ((earth_rate_y + delta_angular_rate_ref[:, 1]) * velocity_x_ref - delta_angular_rate_ref[:, 0] * velocity_y_ref - frame.gravity)
+    return np.stack((next_velocity_x_ref, next_velocity_y_ref, next_velocity_z_ref), axis=-1)
+
+def calculateCoordinates(latitude, longitude, velocity_x_ref, velocity_y_ref, H4, frame: NavFrame) -> tuple:
+    '''[16] Вычисление координат (скаляры или массивы (K,) навигаторов, frame - на широте latitude)'''
+    next_latitude = latitude + H4 * velocity_y_ref / frame.radius_north
+    next_longitude = longitude + H4 * velocity_x_ref / (frame.radius_east * frame.cos_latitude)
+    return next_latitude, next_longitude
+
+def calculateOrientationAngles(C_body_to_ref: np.ndarray) -> tuple:
+    '''[17] Курс, тангаж и крен по матрице C_body_to_ref (3, 3) или стопке (K, 3, 3)'''
+    heading = np.arctan2(
+        C_body_to_ref[..., 0, 1],
+        C_body_to_ref[..., 1, 1]
+    )
+    roll = -np.arctan2(
+        C_body_to_ref[..., 2, 0],
+        C_body_to_ref[..., 2, 2]
+    )
+    pitch = np.arctan2(
+        C_body_to_ref[..., 2, 1],
+        np.sqrt(C_body_to_ref[..., 0, 1] ** 2 + C_body_to_ref[..., 1, 1] ** 2)
+    )
+    return heading, pitch, roll
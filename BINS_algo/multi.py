@@ -0,0 +1,175 @@
+'''
+Несколько независимых навигаторов в одном цикле (несколько ИНС, резервные копии с другим
+rate_decrease / samples или начальной выставкой).
+
+Каждый навигатор задаётся обычным Navigation_System (источник, начальное состояние, алгоритмы
+шагов [5] и [7], хранилище и приёмники). Нерекуррентные шаги [1]-[5], [7], [8] считаются
+для каждого векторно по всем циклам блока (cycle_inputs), рекуррентные [6], [9]-[17] - для всех
+K навигаторов сразу над массивами (K, 3, 3) и (K, 3) функциями *Stacked из math_functions:
+число операций numpy на цикл не зависит от K. Состояния пишутся в хранилища (StateHistory.extend)
+и приёмники (write_array) пачками по блоку, контрольные точки навигаторов (checkpoint_every) - на
+границе блока, как в navigate_blocks.
+
+Ограничения: общие частота, точность, модель Земли и число тактов в цикле rate_decrease * samples
+(циклы идут в ногу), ориентация - матрицы МНК без нормирования (attitude='dcm', normalization='none'),
+без профилировщика, телеметрии и монитора ортогональности (profile, telemetry, monitor_every).
+Совместная навигация идёт до конца самого короткого источника.
+'''
+import numpy as np
+
+from .state import State
+from .navigation_system import Navigation_System
+from .profiling import NullTimer
+from .earth import NavFrame
+from . import math_functions as MathFunc
+
+
+class MultiNavigator:
+    '''K навигаторов с общим циклом, рекуррентная часть - над стопками массивов'''
+    navs: list[Navigation_System]
+
+    def __init__(self, navs: list[Navigation_System]):
+        assert navs, 'at least one navigator is required'
+        first = navs[0]
+        for nav in navs:
+            assert nav.imu.frequency == first.imu.frequency, 'navigators must share the IMU frequency'
+            assert nav.cycle == first.cycle, 'navigators must share the number of ticks per cycle (rate_decrease * samples)'
+            assert nav.precision is first.precision, 'navigators must share the precision'
+            assert nav.earth == first.earth, 'navigators must share the earth model'
+            assert nav.attitude == 'dcm' and nav.normalization.strategy == 'none', 'only dcm attitude without normalization is supported'
+            assert isinstance(nav.timer, NullTimer), 'profile and telemetry are not supported by the multi-navigator'
+            assert not nav.normalization.monitor_every, 'orthogonality monitor (monitor_every) is not supported by the multi-navigator'
+        self.navs = list(navs)
+        self._frame = NavFrame(first.precision, first.earth)
+
+    @property
+    def cycle(self) -> int:
+        return self.navs[0].cycle
+
+    @property
+    def dtype(self) -> type:
+        return self.navs[0].precision.dtype
+
+    def reset(self, initial_states: list[State | None] | None = None) -> None:
+        for nav, initial_state in zip(self.navs, initial_states or [None] * len(self.navs)):
+            nav.reset(initial_state)
+
+    async def navigate(self, resume: list[str | None] | None = None) -> None:
+        '''
+        Совместная навигация по потокам блоков источников (iter_blocks) до конца самого короткого.
+        resume - контрольные точки навигаторов на границе цикла (None - навигатор начинает с начала)
+        '''
+        for nav, checkpoint in zip(self.navs, resume or [None] * len(self.navs), strict=True):
+            if checkpoint is None:
+                nav.reset()
+            else:
+                nav.restore(checkpoint)
+                assert nav._increment is None and not nav._increments, 'multi-navigator resumes only from a cycle boundary'
+        cycle = self.cycle
+        streams = [nav.imu.iter_blocks(start=nav._tick_counter) for nav in self.navs]
+        pending = [np.empty((0, 7), self.dtype) for _ in self.navs]
+        try:
+            while True:
+                # Блоки дочитываются у отстающих источников, чтобы буферы не росли при разных размерах блоков
+                longest = max(len(records) for records in pending)
+                for k, stream in enumerate(streams):
+                    if len(pending[k]) >= cycle and len(pending[k]) >= longest:
+                        continue
+                    block = await anext(stream, None)
+                    if block is None:
+                        if len(pending[k]) < cycle:
+                            return
+                        continue
+                    pending[k] = np.concatenate((pending[k], block)) if len(pending[k]) else block
+                full = min(len(records) for records in pending) // cycle * cycle
+                if full:
+                    self.navigate_batch([records[:full] for records in pending])
+                    pending = [records[full:] for records in pending]
+                    for nav in self.navs:
+                        nav._maybe_checkpoint()
+        finally:
+            for stream in streams:
+                await stream.aclose()
+            for nav in self.navs:
+                nav.flush_sinks()
+
+    def navigate_batch(self, records: list[np.ndarray]) -> list[State]:
+        '''
+        Один блок записей (N, 7) на каждого навигатора (одинаковое число полных циклов) от их
+        текущих состояний (_prevState), возвращает последние состояния
+        '''
+        navs, dtype = self.navs, self.dtype
+        inputs = [nav.cycle_inputs(block) for nav, block in zip(navs, records)]
+        cycles = len(inputs[0][0])
+        assert all(len(t) == cycles for t, *_ in inputs), 'all navigators need the same number of cycles'
+        if cycles == 0:
+            return [nav._prevState for nav in navs]
+
+        # Входы (K, C, ...) и стопки состояний (K, ...)
+        t = np.stack([values[0] for values in inputs])
+        delta_acceleration_body = np.stack([values[1] for values in inputs])
+        body_rotation = np.stack([values[2] for values in inputs])
+        H4 = np.array([values[3] for values in inputs])
+
+        states = [nav._prevState for nav in navs]
+        scalars = np.array([state.values for state in states], dtype)
+        C_body_to_ref = np.array([state.C_body_to_ref for state in states], dtype)
+        C_inertial_to_body = np.array([state.C_inertial_to_body for state in states], dtype)
+        C_inertial_to_ref = np.array([state.C_inertial_to_ref for state in states], dtype)
+
+        store_matrices = any(nav.state_vault.store_matrices for nav in navs)
+        out = np.empty((len(navs), cycles, scalars.shape[1]), dtype)
+        out_matrices = np.empty((len(navs), cycles, 3, 3, 3), dtype) if store_matrices else None
+        frame = self._frame
+
+        for i in range(cycles):
+            latitude, longitude, velocity_ref = scalars[:, 1], scalars[:, 2], scalars[:, 3:6]
+            frame.compute(latitude)
+
+            # [6] Вычисление ускорения в осях опорной СК
+            delta_acceleration_ref = (C_body_to_ref @ delta_acceleration_body[:, i, :, None])[..., 0]
+
+            # [9] Вычисление матрицы МНК для перехода из инерциальной СК в связанную
+            C_inertial_to_body = body_rotation[:, i] @ C_inertial_to_body
+
+            # [10] Вычисление абсолютной угловой скорости опорной географической СК (ref)
+            delta_angular_rate_ref = MathFunc.calculateAngularRateProjectionStacked(velocity_ref[:, 0], velocity_ref[:, 1], frame)
+
+            # [11] Расчёт матрицы поворота опорной СК (ref) на малый угол
+            C_prevref_to_ref = MathFunc.calculateAngleOfRefRotationStacked(delta_angular_rate_ref, H4)
+
+            # [12] Вычисление матрицы МНК для перехода из инерциальной СК в опорную
+            C_inertial_to_ref = C_prevref_to_ref @ C_inertial_to_ref
+
+            # [13] Вычисление матрицы МНК для перехода из связанной СК в опорную
+            C_body_to_ref = C_inertial_to_ref @ C_inertial_to_body.transpose(0, 2, 1)
+
+            # [15] Линейные скорости в опорной СК
+            row = out[:, i]
+            row[:, 0] = t[:, i]
+            row[:, 3:6] = MathFunc.calculateVelocityInRefStacked(velocity_ref, delta_acceleration_ref, delta_angular_rate_ref, H4, frame)
+            row[:, 5] = 0
+
+            # [16] Вычисление координат
+            row[:, 1], row[:, 2] = MathFunc.calculateCoordinates(latitude, longitude, row[:, 3], row[:, 4], H4, frame)
+
+            # [17] Вычисление углов ориентации
+            row[:, 6], row[:, 7], row[:, 8] = MathFunc.calculateOrientationAngles(C_body_to_ref)
+
+            scalars = row
+            if out_matrices is not None:
+                out_matrices[:, i, 0] = C_body_to_ref
+                out_matrices[:, i, 1] = C_inertial_to_body
+                out_matrices[:, i, 2] = C_inertial_to_ref
+
+        # Пачка состояний каждому навигатору, последнее - начальное для следующего блока
+        lasts = []
+        for k, (nav, block) in enumerate(zip(navs, records)):
+            nav.state_vault.extend(out[k], out_matrices[k] if out_matrices is not None and nav.state_vault.store_matrices else None)
+            for sink in nav.sinks:
+                sink.write_array(out[k])
+            nav._prevState = State(*out[k, -1], C_body_to_ref[k], C_inertial_to_body[k], C_inertial_to_ref[k], dtype=dtype)
+            nav._tick_counter += cycles * nav.cycle
+            nav.normalization.cycles += cycles
+            lasts.append(nav._prevState)
+        return lasts
@@ -1,137 +1,508 @@
-import csv
 import numpy as np
 
-from .state import State
+from .state import State, QuaternionState
+from .state_history import StateHistory
 from .small_increments import SmallIncrements
-from .imu_emulator import IMU_emulator
+from .imu_emulator import IMU_emulator, IMU_reader
 from . import math_functions as MathFunc
-from .constants import U_EARTH_ROTATION_RATE, RADIUS_EARTH, GRAVITY_AXELERATION
+from .kernels import ReferenceKernels, make_kernels
+from .precision import Precision, get_precision
+from .sinks import StateSink, CSVSink
+from .profiling import StageTimer, NullTimer
+from .telemetry import Telemetry
+from .algorithms import CycleAlgorithm
+from .normalization import Normalization
+from .checkpoint import Checkpoint
+from . import quaternions as Quat
+from .earth import EarthModel, NavFrame, get_earth_model
 
 
 class Navigation_System:
-    __slot__ = ('imu')
-    imu: IMU_emulator
+    __slots__ = (
+        'imu', 'rate_decrease', 'state_vault', 'kernels', 'precision', 'sinks', 'timer', 'algorithm',
+        'normalization', 'attitude', 'earth', 'checkpoint_path', 'checkpoint_every',
+        '_H1', '_H4', '_frame', '_increment', '_increments', '_prevState', '_tick_counter', '_checkpoint_tick',
+    )
+    imu: IMU_emulator | IMU_reader
     rate_decrease: int
-    state_vault: list[State]
+    state_vault: StateHistory
+    kernels: ReferenceKernels
+    precision: Precision
+    sinks: list[StateSink]
+    timer: StageTimer
+    algorithm: CycleAlgorithm
+    normalization: Normalization
+    attitude: str
+    earth: EarthModel
+    checkpoint_path: str | None
+    checkpoint_every: int
 
-    def __init__(self, imu: IMU_emulator, rate_decrease: int = 4):
+    def __init__(
+        self,
+        imu: IMU_emulator | IMU_reader,
+        rate_decrease: int = 4,
+        state_vault: StateHistory | None = None,
+        kernels: str = 'reference',
+        precision: str | type | Precision = 'longdouble',
+        sinks: list[StateSink] | None = None,
+        profile: bool = False,
+        samples: int = 4,
+        velocity: str = 'rk4',
+        coning: str = 'pairs',
+        normalization: str = 'none',
+        normalize_every: int = 1,
+        monitor_every: int = 0,
+        attitude: str = 'dcm',
+        earth: str | EarthModel = 'sphere',
+        checkpoint_path: str | None = None,
+        checkpoint_every: int = 0,
+        telemetry: Telemetry | None = None,
+    ):
+        '''
+        kernels - ядра 3x3 операций: reference (эталон), closed_form или numba (см. kernels.py)
+        precision - точность вычислений: longdouble (эталон) или float64 (см. precision.py)
+        sinks - потоковые приёмники состояний, пишутся пачками по ходу навигации (см. sinks.py)
+        profile - накопление времени по шагам [1]-[17] в self.timer (см. profiling.py)
+        samples - число приращений (по rate_decrease тактов) в цикле навигации
+        velocity, coning - алгоритмы шагов [5] и [7] (см. algorithms.py)
+        normalization - нормирование матриц МНК раз в normalize_every циклов,
+            monitor_every - период записи ошибки ортогональности (см. normalization.py)
+        attitude - представление ориентации в шагах [8]-[14]: dcm (матрицы МНК, эталон)
+            или quaternion (кватернионы, нормируются каждый цикл, см. quaternions.py)
+        earth - модель Земли в шагах [10], [15], [16]: sphere (постоянные радиус и сила тяжести, эталон)
+            или wgs84 (радиусы кривизны эллипсоида и нормальная сила тяжести, см. earth.py)
+        checkpoint_path - файл контрольной точки, перезаписывается не реже чем раз в checkpoint_every
+            циклов (navigate - ровно, navigate_blocks - на границе блока источника, см. checkpoint.py)
+        telemetry - счётчики, гистограммы и экспорт метрик по ходу прогона, заменяет профилировщик
+            self.timer (см. telemetry.py)
+        '''
+        assert not checkpoint_every or checkpoint_path, 'checkpoint_every requires checkpoint_path'
+        assert attitude in ('dcm', 'quaternion'), f'unknown attitude: {attitude}, expected dcm or quaternion'
+        assert attitude == 'dcm' or normalization == 'none', 'quaternions are normalized every cycle, matrix normalization is not applicable'
         self.imu = imu
         self.rate_decrease = rate_decrease
-        self.state_vault = []
+        self.attitude = attitude
+        self.precision = get_precision(precision)
+        self.earth = get_earth_model(earth)
+        self._frame = NavFrame(self.precision, self.earth)
+        self.state_vault = StateHistory(dtype=self.precision.dtype, quaternions=attitude == 'quaternion') if state_vault is None else state_vault
+        self.kernels = make_kernels(kernels, self.precision)
+        self.sinks = list(sinks or [])
+        self.timer = telemetry if telemetry is not None else StageTimer() if profile else NullTimer()
+        self.algorithm = CycleAlgorithm(self.kernels, samples, velocity, coning)
+        self.normalization = Normalization(normalization, normalize_every, monitor_every)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        if telemetry is not None:
+            telemetry.ticks_per_cycle = self.cycle
         # self.imu.integration_prescaler = rate_decrease
 
-    async def navigate(self) -> None:
+    @property
+    def samples(self) -> int:
+        return self.algorithm.samples
+
+    @property
+    def cycle(self) -> int:
+        '''Число тактов в цикле навигации'''
+        return self.rate_decrease * self.samples
+
+    def _initial_state(self, initial_state: State | None = None) -> State:
+        '''Начальное состояние в точности вычислений, при attitude='quaternion' - в кватернионах'''
+        state = (self.imu.initial_state if initial_state is None else initial_state).astype(self.precision.dtype)
+        if self.attitude == 'quaternion' and not isinstance(state, QuaternionState):
+            state = QuaternionState.from_state(state, self.precision.dtype)
+        return state
+
+    def reset(self, initial_state: State | None = None) -> None:
+        '''Сброс буферов потактовой навигации (process) к начальному состоянию'''
         # Const
         dt = 1 / self.imu.frequency
-        H1 = self.rate_decrease * dt
-        H4 = 4 * H1
+        self._H1 = self.rate_decrease * dt
+        self._H4 = self.samples * self._H1
 
         # Buffered data
-        increment: SmallIncrements | None = None
-        increments: list[SmallIncrements] = []
-        prevState = self.imu.initial_state
-        tick_counter = 0
-
-        async for small_increment in self.imu.iter():
-            increment = increment or SmallIncrements(0, 0, 0, 0, 0, 0, 0)
-            increment.t = small_increment.t
-            tick_counter += 1
-
-            # [1] Накопление приращений скорости
-            MathFunc.integrateAngularRate(increment, small_increment)
-
-            # [2] Накопление приращений ускорений
-            MathFunc.integrateAxeleration(increment, small_increment)
-
-            if tick_counter % self.rate_decrease == 0:
-                # [3] Компенсация погрешностей акселерометров
-                MathFunc.errorCompensationAxelerometr(increment)
-                
-                # [4] Компенсация погрешностей гироскопов
-                MathFunc.errorCompensationAngularRateSensor(increment)
-                
-                increments.append(increment)
-                increment = None
-            
-            if tick_counter % (self.rate_decrease * 4) == 0:
-                state = State(small_increment.t, None, None, None, None, None, None, None, None, None, None)    # type:ignore
-
-                # [5] Вычисление ускорения методом Рунге-Кута 4-го порядка
-                delta_acceleration_body = MathFunc.calculateAxeleration(increments, H1)
-                
-                # [6] Вычисление ускорения в осях опорной СК
-                delta_acceleration_ref = prevState.C_body_to_ref @ delta_acceleration_body
-                # print(delta_acceleration_body)
-                # print(prevState.C_body_to_ref)
-                # print(delta_acceleration_ref)
-
-                # [7] Вычисление проекций вектора Эйлера
-                euler_vector_matrix = MathFunc.calculateEulerRotationVectorProjection(increments)
-
-                # [8] Расчёт матрицы поворота связанной СК (body) на малый угол
-                C_prevbody_to_body = MathFunc.calculateAngleOfBodyRotation(euler_vector_matrix)
-
-                # [9] Вычисление матрицы МНК для перехода из инерциальной СК в связанную
-                C_inertial_to_body = C_prevbody_to_body @ prevState.C_inertial_to_body
-                state.C_inertial_to_body = C_inertial_to_body
-
-                # [10] Вычисление абсолютной угловой скорости опорной географической СК (ref)
-                delta_angular_rate_ref = MathFunc.calculateAngularRateProjection(prevState.velocity_x_ref, prevState.velocity_y_ref, prevState.latitude)
-
-                # [11] Расчёт матрицы поворота опорной СК (ref) на малый угол
-                C_prevref_to_ref = MathFunc.calculateAngleOfRefRotation(delta_angular_rate_ref, H4)
-
-                # [12] Вычисление матрицы МНК для перехода из инерциальной СК в опорную
-                C_inertial_to_ref = C_prevref_to_ref @ prevState.C_inertial_to_ref
-                state.C_inertial_to_ref = C_inertial_to_ref
-
-                # [13] Вычисление матрицы МНК для перехода из связанной СК в опорную
-                C_body_to_ref = C_inertial_to_ref @ C_inertial_to_body.transpose()
-
-                # [14] Нормирование матрицы МНК для перехода из связанной СК в опорную
-                MathFunc.normalizeMatrix(C_body_to_ref)
-                state.C_body_to_ref = C_body_to_ref
-
-                # [15] Линейные скорости в опорной СК
-                state.velocity = MathFunc.calculateVelocityInRef(
-                    prevState.velocity_x_ref,
-                    prevState.velocity_y_ref,
-                    prevState.velocity_z_ref,
-                    delta_acceleration_ref,
-                    delta_angular_rate_ref,
-                    H4,
-                    prevState.latitude,
-                )
-                state.velocity_z_ref = np.longdouble(0.0)
-
-                # [16] Вычисление координат
-                state.latitude = prevState.latitude + H4 * state.velocity_y_ref / RADIUS_EARTH
-                state.longitude = prevState.longitude + H4 * state.velocity_x_ref / (RADIUS_EARTH * np.cos(prevState.latitude))
-
-                # [17] Вычисление углов ориентации
-                state.heading = np.arctan2(
-                    C_body_to_ref[0, 1],
-                    C_body_to_ref[1, 1]
-                )
-                state.roll = -np.arctan2(
-                    C_body_to_ref[2, 0],
-                    C_body_to_ref[2, 2]
-                )
-                state.pitch = np.arctan2(
-                    C_body_to_ref[2, 1],
-                    np.sqrt(C_body_to_ref[0, 1] ** 2 + C_body_to_ref[1, 1] ** 2)
-                )
-                
-                # Reset
-                increment = None
-                increments = []
-                prevState = state
-                self.state_vault.append(state)
+        self._increment: SmallIncrements | None = None
+        self._increments: list[SmallIncrements] = []
+        self._prevState = self._initial_state(initial_state)
+        self._tick_counter = 0
+        self._checkpoint_tick = 0
+        self.normalization.reset()
+
+    def _checkpoint_config(self) -> dict:
+        '''Параметры, при которых контрольная точка совместима с этой навигационной системой'''
+        return {
+            'frequency': self.imu.frequency,
+            'rate_decrease': self.rate_decrease,
+            'samples': self.samples,
+            'dtype': np.dtype(self.precision.dtype).name,
+            'velocity': self.algorithm.velocity,
+            'coning': self.algorithm.coning,
+            'normalization': self.normalization.strategy,
+            'normalize_every': self.normalization.every,
+            'attitude': self.attitude,
+            'earth': self.earth.name,
+        }
+
+    def save_checkpoint(self, filepath: str | None = None) -> None:
+        '''
+        Запись контрольной точки текущего состояния (по умолчанию в checkpoint_path),
+        приёмники сбрасываются, их позиции сохраняются для продолжения файлов при restore
+        '''
+        filepath = filepath or self.checkpoint_path
+        assert filepath, 'checkpoint path is not set'
+        Checkpoint(
+            tick=self._tick_counter,
+            state=self._prevState,
+            increment=self._increment,
+            increments=self._increments,
+            normalization_cycles=self.normalization.cycles,
+            config=self._checkpoint_config(),
+            sinks=[sink.position() for sink in self.sinks],
+        ).save(filepath)
+        self._checkpoint_tick = self._tick_counter
+
+    def restore(self, filepath: str) -> int:
+        '''
+        Восстановление из контрольной точки вместо reset, возвращает число уже обработанных тактов.
+        Файлы приёмников обрезаются до позиций контрольной точки и дописываются (приёмники - те же
+        и в том же порядке, что при записи; ещё не писавшие в файлы)
+        '''
+        checkpoint = Checkpoint.load(filepath)
+        config = self._checkpoint_config()
+        mismatch = {key: (value, config.get(key)) for key, value in checkpoint.config.items() if config.get(key) != value}
+        assert not mismatch, f'checkpoint is incompatible (saved, current): {mismatch}'
+        assert len(checkpoint.sinks) in (0, len(self.sinks)), f'checkpoint has {len(checkpoint.sinks)} sinks, navigator has {len(self.sinks)}'
+        for sink, (rows, offset) in zip(self.sinks, checkpoint.sinks):
+            sink.resume(rows, offset)
+
+        self.reset(checkpoint.state)
+        self._increment = checkpoint.increment
+        self._increments = checkpoint.increments
+        self._tick_counter = self._checkpoint_tick = checkpoint.tick
+        self.normalization.cycles = checkpoint.normalization_cycles
+        return checkpoint.tick
+
+    def _maybe_checkpoint(self) -> None:
+        if self.checkpoint_every and self._tick_counter - self._checkpoint_tick >= self.checkpoint_every * self.cycle:
+            self.save_checkpoint()
+
+    def process(self, small_increment: SmallIncrements) -> State | None:
+        '''Обработка одного такта ИНС, возвращает новое состояние в конце цикла (каждые rate_decrease * samples тактов)'''
+        timer = self.timer
+        timer.start()
+        increment = self._increment or SmallIncrements(0, 0, 0, 0, 0, 0, 0, dtype=self.precision.dtype)
+        increment.t = small_increment.t
+        self._tick_counter += 1
+
+        # [1] Накопление приращений скорости
+        MathFunc.integrateAngularRate(increment, small_increment)
+        timer.lap('[1]')
+
+        # [2] Накопление приращений ускорений
+        MathFunc.integrateAxeleration(increment, small_increment)
+        self._increment = increment
+        timer.lap('[2]')
+
+        if self._tick_counter % self.rate_decrease == 0:
+            # [3] Компенсация погрешностей акселерометров
+            MathFunc.errorCompensationAxelerometr(increment)
+            timer.lap('[3]')
+
+            # [4] Компенсация погрешностей гироскопов
+            MathFunc.errorCompensationAngularRateSensor(increment)
+
+            self._increments.append(increment)
+            self._increment = None
+            timer.lap('[4]')
+
+        if self._tick_counter % self.cycle != 0:
+            return None
+
+        # [5] Вычисление приращения скорости за цикл
+        delta_acceleration_body = self.algorithm.acceleration(self._increments, self._H1)
+        timer.lap('[5]')
+
+        # [7] Вычисление проекций вектора Эйлера
+        euler_vector_matrix = self.algorithm.euler_vector(self._increments)
+        timer.lap('[7]')
+
+        # [8] Расчёт матрицы (кватерниона) поворота связанной СК (body) на малый угол
+        if self.attitude == 'quaternion':
+            body_rotation = Quat.from_rotation_vector(-euler_vector_matrix)
+        else:
+            body_rotation = self.kernels.body_rotation(euler_vector_matrix)
+        timer.lap('[8]')
+
+        state = self._propagate(self._prevState, small_increment.t, delta_acceleration_body, body_rotation, self._H4)
+
+        # Reset
+        self._increment = None
+        self._increments = []
+        self._prevState = state
+        self._store(state)
+        timer.lap('store')
+        self._maybe_checkpoint()
+        return state
+
+    async def navigate(self, resume: str | None = None) -> None:
+        '''Потактовая навигация; resume - контрольная точка, с такта которой продолжается чтение источника'''
+        if resume is None:
+            self.reset()
+        else:
+            self.restore(resume)
+        async for small_increment in self.imu.iter(start=self._tick_counter):
+            self.process(small_increment)
+
+        self.flush_sinks()
+        self.timer.flush()
+
+    async def navigate_blocks(self, resume: str | None = None) -> None:
+        '''
+        Навигация по потоку блоков записей источника (iter_blocks) пакетным методом.
+        resume - контрольная точка на границе цикла (такие пишутся navigate и navigate_blocks)
+        '''
+        if resume is None:
+            self.reset()
+        else:
+            self.restore(resume)
+            assert self._increment is None and not self._increments, 'navigate_blocks resumes only from a cycle boundary, use navigate'
+        cycle = self.cycle
+        pending = np.empty((0, 7), self.precision.dtype)
+
+        async for block in self.imu.iter_blocks(start=self._tick_counter):
+            records = np.concatenate((pending, block)) if len(pending) else block
+            full = len(records) // cycle * cycle
+            self._prevState = self.navigate_batch(records[:full], self._prevState)
+            self._tick_counter += full
+            pending = records[full:]
+            self._maybe_checkpoint()
+
+        self.flush_sinks()
+        self.timer.flush()
+
+    def navigate_batch(self, records: np.ndarray, initial_state: State | None = None) -> State:
+        '''
+        Пакетная навигация по массиву записей ИНС (N, 7): t, ax, ay, az, wx, wy, wz.
+
+        Шаги [1]-[5], [7], [8] считаются векторно для всех циклов сразу, последовательно
+        (по циклам) выполняются только рекуррентные шаги [6], [9]-[17].
+        Неполный последний цикл отбрасывается, как и в navigate. Возвращает последнее состояние.
+        '''
+        prevState = self._initial_state(initial_state)
+        t, delta_acceleration_body, body_rotation, H4 = self.cycle_inputs(records)
+        timer = self.timer
+        for i in range(len(t)):
+            prevState = self._propagate(prevState, t[i], delta_acceleration_body[i], body_rotation[i], H4)
+            self._store(prevState)
+            timer.lap('store')
+
+        return prevState
+
+    def cycle_inputs(self, records: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+        '''
+        Нерекуррентные шаги [1]-[5], [7], [8] для всех полных циклов массива записей (N, 7).
+        Возвращает время конца циклов (C,), приращения скорости в связанных осях (C, 3),
+        повороты связанной СК (C, 3, 3) или кватернионы (C, 4) и H4.
+        '''
+        # Const
+        dt = 1 / self.imu.frequency
+        H1 = self.rate_decrease * dt
+        H4 = self.samples * H1
+
+        records = np.asarray(records, dtype=self.precision.dtype)
+        cycles = len(records) // self.cycle
+        records = records[:cycles * self.cycle]
+        if cycles == 0:
+            return records[:0, 0], np.empty((0, 3), records.dtype), np.empty((0, 3, 3), records.dtype), H4
+
+        timer = self.timer
+        timer.start()
+
+        # [1] - [2] Накопление приращений скорости и ускорений
+        increments = MathFunc.integrateIncrements(records, self.rate_decrease).reshape(cycles, self.samples, 6)
+        da, dw = increments[..., :3], increments[..., 3:]
+        timer.lap('[1-2]')
+
+        # [3] Компенсация погрешностей акселерометров
+        MathFunc.errorCompensationAxelerometrBatch(da)
+        timer.lap('[3]')
+
+        # [4] Компенсация погрешностей гироскопов
+        MathFunc.errorCompensationAngularRateSensorBatch(dw)
+        timer.lap('[4]')
+
+        # [5] Вычисление приращения скорости за цикл
+        delta_acceleration_body = self.algorithm.acceleration_batch(da, dw, H1)
+        timer.lap('[5]')
+
+        # [7] Вычисление проекций вектора Эйлера
+        euler_vector_matrix = self.algorithm.euler_vector_batch(dw)
+        timer.lap('[7]')
+
+        # [8] Расчёт матриц (кватернионов) поворота связанной СК (body) на малый угол
+        if self.attitude == 'quaternion':
+            body_rotation = Quat.from_rotation_vector(-euler_vector_matrix)
+        else:
+            body_rotation = MathFunc.calculateAngleOfBodyRotationBatch(euler_vector_matrix)
+        timer.lap('[8]')
+
+        return records[self.cycle - 1::self.cycle, 0], delta_acceleration_body, body_rotation, H4
+
+    def _propagate(
+            self,
+            prevState: State,
+            t: np.longdouble,
+            delta_acceleration_body: np.ndarray,
+            body_rotation: np.ndarray,
+            H4: int | float | np.longdouble,
+        ) -> State:
+        '''
+        Рекуррентная часть цикла: шаги [6], [9]-[17].
+        body_rotation - матрица C_prevbody_to_body или, при attitude='quaternion', кватернион того же поворота
+        '''
+        timer = self.timer
+
+        # [6] Вычисление ускорения в осях опорной СК
+        delta_acceleration_ref = self.kernels.matvec(prevState.C_body_to_ref, delta_acceleration_body)
+        timer.lap('[6]')
+
+        # Величины опорной СК на широте prevState, общие для [10], [15], [16]
+        frame = self._frame.at(prevState.latitude)
+
+        # [9] - [14] Ориентация
+        if self.attitude == 'quaternion':
+            state, delta_angular_rate_ref = self._orientation_quaternion(prevState, t, body_rotation, H4, frame)
+        else:
+            state, delta_angular_rate_ref = self._orientation_dcm(prevState, t, body_rotation, H4, frame)
+        C_body_to_ref = state.C_body_to_ref
+
+        # [15] Линейные скорости в опорной СК
+        state.velocity = MathFunc.calculateVelocityInRef(
+            prevState.velocity_x_ref,
+            prevState.velocity_y_ref,
+            prevState.velocity_z_ref,
+            delta_acceleration_ref,
+            delta_angular_rate_ref,
+            H4,
+            prevState.latitude,
+            self.precision,
+            frame,
+        )
+        state.velocity_z_ref = self.precision.dtype(0.0)
+        timer.lap('[15]')
+
+        # [16] Вычисление координат
+        state.latitude, state.longitude = MathFunc.calculateCoordinates(
+            prevState.latitude, prevState.longitude, state.velocity_x_ref, state.velocity_y_ref, H4, frame,
+        )
+        timer.lap('[16]')
+
+        # [17] Вычисление углов ориентации
+        state.heading, state.pitch, state.roll = MathFunc.calculateOrientationAngles(C_body_to_ref)
+        timer.lap('[17]')
+
+        return state
+
+    def _orientation_dcm(
+            self,
+            prevState: State,
+            t: np.longdouble,
+            C_prevbody_to_body: np.ndarray,
+            H4: int | float | np.longdouble,
+            frame: NavFrame,
+        ) -> tuple[State, np.ndarray]:
+        '''Шаги [9]-[14] по матрицам МНК, возвращает новое состояние и абсолютную угловую скорость ref'''
+        timer = self.timer
+        state = State(t, None, None, None, None, None, None, None, None, None, None, dtype=self.precision.dtype)    # type:ignore
+
+        # [9] Вычисление матрицы МНК для перехода из инерциальной СК в связанную
+        C_inertial_to_body = self.kernels.matmul(C_prevbody_to_body, prevState.C_inertial_to_body)
+        state.C_inertial_to_body = C_inertial_to_body
+        timer.lap('[9]')
+
+        # [10] Вычисление абсолютной угловой скорости опорной географической СК (ref)
+        delta_angular_rate_ref = MathFunc.calculateAngularRateProjection(prevState.velocity_x_ref, prevState.velocity_y_ref, prevState.latitude, self.precision, frame)
+        timer.lap('[10]')
+
+        # [11] Расчёт матрицы поворота опорной СК (ref) на малый угол
+        C_prevref_to_ref = self.kernels.ref_rotation(delta_angular_rate_ref, H4)
+        timer.lap('[11]')
+
+        # [12] Вычисление матрицы МНК для перехода из инерциальной СК в опорную
+        C_inertial_to_ref = self.kernels.matmul(C_prevref_to_ref, prevState.C_inertial_to_ref)
+        state.C_inertial_to_ref = C_inertial_to_ref
+        timer.lap('[12]')
+
+        # [13] Вычисление матрицы МНК для перехода из связанной СК в опорную
+        C_body_to_ref = self.kernels.matmul_bt(C_inertial_to_ref, C_inertial_to_body)
+        timer.lap('[13]')
+
+        # [14] Нормирование рекуррентных матриц МНК, C_body_to_ref пересчитывается из нормированных
+        normalized = self.normalization.normalize(C_inertial_to_body, C_inertial_to_ref)
+        if normalized is not None:
+            state.C_inertial_to_body, state.C_inertial_to_ref = normalized
+            C_body_to_ref = self.kernels.matmul_bt(state.C_inertial_to_ref, state.C_inertial_to_body)
+        self.normalization.monitor(t, C_body_to_ref)
+        state.C_body_to_ref = C_body_to_ref
+        timer.lap('[14]')
+
+        return state, delta_angular_rate_ref
+
+    def _orientation_quaternion(
+            self,
+            prevState: QuaternionState,
+            t: np.longdouble,
+            q_prevbody_to_body: np.ndarray,
+            H4: int | float | np.longdouble,
+            frame: NavFrame,
+        ) -> tuple[QuaternionState, np.ndarray]:
+        '''
+        Шаги [9]-[14] по кватернионам: произведения [9], [12], [13] в замкнутом виде (16 умножений против 27
+        у матриц 3x3), матрица C_body_to_ref строится один раз за цикл (для [6] следующего цикла и [17])
+        '''
+        timer = self.timer
+        state = QuaternionState(t, None, None, None, None, None, None, None, None, None, None, dtype=self.precision.dtype)    # type:ignore
+
+        # [9] Кватернион перехода из инерциальной СК в связанную
+        q_inertial_to_body = Quat.multiply(q_prevbody_to_body, prevState.q_inertial_to_body)
+        timer.lap('[9]')
+
+        # [10] Вычисление абсолютной угловой скорости опорной географической СК (ref)
+        delta_angular_rate_ref = MathFunc.calculateAngularRateProjection(prevState.velocity_x_ref, prevState.velocity_y_ref, prevState.latitude, self.precision, frame)
+        timer.lap('[10]')
+
+        # [11] Кватернион поворота опорной СК (ref) на угол H4 w_ref
+        q_prevref_to_ref = Quat.from_rotation_vector(-H4 * delta_angular_rate_ref)
+        timer.lap('[11]')
+
+        # [12] Кватернион перехода из инерциальной СК в опорную
+        q_inertial_to_ref = Quat.multiply(q_prevref_to_ref, prevState.q_inertial_to_ref)
+        timer.lap('[12]')
+
+        # [13] Кватернион перехода из связанной СК в опорную
+        q_body_to_ref = Quat.multiply(q_inertial_to_ref, Quat.conjugate(q_inertial_to_body))
+        timer.lap('[13]')
+
+        # [14] Нормирование рекуррентных кватернионов (ошибка нормы q_body_to_ref не накапливается) и матрица C_body_to_ref
+        state.q_inertial_to_body = Quat.normalize(q_inertial_to_body)
+        state.q_inertial_to_ref = Quat.normalize(q_inertial_to_ref)
+        state.C_body_to_ref = Quat.to_dcm(q_body_to_ref)
+        self.normalization.normalize()
+        self.normalization.monitor(t, state.C_body_to_ref)
+        timer.lap('[14]')
+
+        return state, delta_angular_rate_ref
+
+    def _store(self, state: State) -> None:
+        self.state_vault.append(state)
+        for sink in self.sinks:
+            sink.write(state)
+        self.timer.cycle(state)
+
+    def flush_sinks(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
 
     def save_states(self, filepath: str) -> None:
-        with open(filepath, 'w+') as fp:
-            with open(filepath, mode='w+', newline='') as fp:
-                writer = csv.writer(fp)
-                writer.writerow(["t", "latitude", "longitude", "velocity_x_ref", "velocity_y_ref", "velocity_z_ref", "heading", "pitch", "roll"])
-                for state in self.state_vault:
-                    writer.writerow([state.t, state.latitude, state.longitude, state.velocity_x_ref, state.velocity_y_ref, state.velocity_z_ref, state.heading, state.pitch, state.roll])
+        with CSVSink(filepath, dtype=self.state_vault.dtype) as sink:
+            sink.write_array(self.state_vault.as_array())
@@ -0,0 +1,99 @@
+'''
+Нормирование матриц МНК (шаг [14]) и контроль их ортогональности.
+
+Рекуррентно накапливаются только C_inertial_to_body ([9]) и C_inertial_to_ref ([12]),
+C_body_to_ref ([13]) пересчитывается из них каждый цикл, поэтому нормируются именно они.
+
+Стратегии:
+    none         - без нормирования
+    symmetric    - симметричная поправка первого порядка C - 1/2 (C C^T - I) C (два умножения 3x3)
+    gram_schmidt - последовательная ортонормализация строк по Граму-Шмидту
+    svd          - ближайшая ортогональная матрица по SVD (normalizeMatrix, float64) с
+                   уточняющей симметричной поправкой в точности вычислений
+
+Стратегия применяется раз в every циклов. Монитор (monitor_every > 0) раз в monitor_every
+циклов записывает ошибку ортогональности max|C C^T - I| матрицы C_body_to_ref,
+что позволяет подобрать every по допустимому дрейфу.
+'''
+import numpy as np
+
+from . import math_functions as MathFunc
+
+
+def orthogonality_error(matrix: np.ndarray) -> float:
+    '''max|C C^T - I|'''
+    return float(np.abs(matrix @ matrix.T - np.eye(3)).max())
+
+
+def symmetric(matrix: np.ndarray) -> np.ndarray:
+    '''Симметричная поправка первого порядка: C - 1/2 (C C^T - I) C'''
+    error = matrix @ matrix.T - np.eye(3, dtype=matrix.dtype)
+    return matrix - error @ matrix / 2
+
+
+def gram_schmidt(matrix: np.ndarray) -> np.ndarray:
+    '''Ортонормализация строк по Граму-Шмидту'''
+    x = matrix[0] / np.sqrt(matrix[0] @ matrix[0])
+    y = matrix[1] - (matrix[1] @ x) * x
+    y = y / np.sqrt(y @ y)
+    z = matrix[2] - (matrix[2] @ x) * x - (matrix[2] @ y) * y
+    z = z / np.sqrt(z @ z)
+    return np.array([x, y, z], matrix.dtype)
+
+
+def svd(matrix: np.ndarray) -> np.ndarray:
+    '''SVD в float64 и симметричная поправка в исходной точности'''
+    return symmetric(MathFunc.normalizeMatrix(matrix))
+
+
+STRATEGIES = {
+    'none': None,
+    'symmetric': symmetric,
+    'gram_schmidt': gram_schmidt,
+    'svd': svd,
+}
+
+
+class Normalization:
+    '''Шаг [14]: нормирование рекуррентных матриц и монитор ортогональности'''
+    strategy: str
+    every: int
+    monitor_every: int
+    cycles: int
+    errors: list[tuple[float, float]]
+
+    def __init__(self, strategy: str = 'none', every: int = 1, monitor_every: int = 0):
+        assert strategy in STRATEGIES, f'unknown normalization: {strategy}, expected one of {tuple(STRATEGIES)}'
+        assert every >= 1, 'normalization period must be positive'
+        self.strategy = strategy
+        self.every = every
+        self.monitor_every = monitor_every
+        self._normalize = STRATEGIES[strategy]
+        self.reset()
+
+    def reset(self) -> None:
+        self.cycles = 0
+        self.errors = []
+
+    def normalize(self, *matrices: np.ndarray) -> tuple[np.ndarray, ...] | None:
+        '''Нормированные матрицы или None, если в этом цикле нормирование не выполняется'''
+        self.cycles += 1
+        if self._normalize is None or self.cycles % self.every != 0:
+            return None
+        return tuple(self._normalize(matrix) for matrix in matrices)
+
+    def monitor(self, t: float, C_body_to_ref: np.ndarray) -> None:
+        if self.monitor_every and self.cycles % self.monitor_every == 0:
+            self.errors.append((float(t), orthogonality_error(C_body_to_ref)))
+
+    def report(self) -> dict:
+        '''Сводка монитора: число замеров, последняя и максимальная ошибка ортогональности'''
+        errors = [error for _, error in self.errors]
+        return {
+            'strategy': self.strategy,
+            'every': self.every,
+            'cycles': self.cycles,
+            'samples': len(errors),
+            'last_error': errors[-1] if errors else None,
+            'max_error': max(errors) if errors else None,
+        }
@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+import numpy as np
+
+from .constants import U_EARTH_ROTATION_RATE, GRAVITY_AXELERATION, RADIUS_EARTH
+
+
+@dataclass(frozen=True)
+class Precision:
+    '''
+    Политика точности вычислений: тип чисел и приведённые к нему константы.
+
+    longdouble - эталонный режим для валидации
+    float64    - рабочий режим: BLAS/SIMD и быстрые скалярные операции
+    '''
+    name: str
+    dtype: type
+    U_EARTH_ROTATION_RATE: np.floating
+    GRAVITY_AXELERATION: np.floating
+    RADIUS_EARTH: np.floating
+
+    @classmethod
+    def of(cls, name: str, dtype: type) -> 'Precision':
+        return cls(
+            name=name,
+            dtype=dtype,
+            U_EARTH_ROTATION_RATE=dtype(U_EARTH_ROTATION_RATE),
+            GRAVITY_AXELERATION=dtype(GRAVITY_AXELERATION),
+            RADIUS_EARTH=dtype(RADIUS_EARTH),
+        )
+
+
+LONGDOUBLE = Precision.of('longdouble', np.longdouble)
+FLOAT64 = Precision.of('float64', np.float64)
+
+PRECISIONS = {precision.name: precision for precision in (LONGDOUBLE, FLOAT64)}
+
+
+def get_precision(precision: 'str | type | Precision') -> Precision:
+    '''Политика точности по имени (longdouble, float64), типу numpy или готовому объекту'''
+    if isinstance(precision, Precision):
+        return precision
+    for candidate in PRECISIONS.values():
+        if precision == candidate.name or precision is candidate.dtype:
+            return candidate
+    raise ValueError(f'unknown precision: {precision}, expected one of {tuple(PRECISIONS)}')
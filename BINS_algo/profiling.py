@@ -0,0 +1,56 @@
+import time
+from collections import defaultdict
+
+
+class StageTimer:
+    '''Накопление времени по пронумерованным шагам алгоритма: lap('[5]') закрывает интервал шага [5]'''
+    totals: dict[str, float]
+    counts: dict[str, int]
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._last = time.perf_counter()
+
+    def start(self) -> None:
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.totals[stage] += now - self._last
+        self.counts[stage] += 1
+        self._last = now
+
+    def reset(self) -> None:
+        self.totals.clear()
+        self.counts.clear()
+        self.start()
+
+    def cycle(self, state) -> None:
+        '''Завершение цикла навигации (используется телеметрией, см. telemetry.py)'''
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def report(self) -> dict[str, dict]:
+        '''Суммарное время, число вызовов и доля по шагам в порядке номеров'''
+        total = sum(self.totals.values()) or 1.0
+        key = lambda stage: (0, [int(part) for part in stage.strip('[]').split('-')]) if stage.startswith('[') else (1, [])
+        return {
+            stage: {'sec': self.totals[stage], 'calls': self.counts[stage], 'share': self.totals[stage] / total}
+            for stage in sorted(self.totals, key=key)
+        }
+
+
+class NullTimer(StageTimer):
+    '''Выключенный профилировщик: вызовы ничего не делают'''
+
+    def __init__(self):
+        super().__init__()
+
+    def start(self) -> None:
+        pass
+
+    def lap(self, stage: str) -> None:
+        pass
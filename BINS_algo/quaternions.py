@@ -0,0 +1,97 @@
+'''
+Единичные кватернионы q = (w, x, y, z) для представления ориентации.
+
+Кватерниону сопоставляется матрица поворота R(q) (to_dcm), произведение согласовано
+с произведением матриц: R(p ⊗ q) = R(p) R(q), R(conjugate(q)) = R(q)^T.
+Функции принимают как отдельные кватернионы (4,), так и массивы (..., 4).
+'''
+import numpy as np
+
+
+def _components(q: np.ndarray) -> tuple:
+    '''Компоненты w, x, y, z: скаляры у одного кватерниона (4,), массивы (...) у массива (..., 4)'''
+    q = q if q.ndim == 1 else np.moveaxis(q, -1, 0)
+    return q[0], q[1], q[2], q[3]
+
+
+def _join(components: tuple) -> np.ndarray:
+    '''
+    Массив (..., len(components)) из скаляров или массивов одной формы components;
+    вложенные кортежи - строки матрицы (..., строки, столбцы)
+    '''
+    rows = isinstance(components[0], tuple)
+    if np.ndim(components[0][0] if rows else components[0]) == 0:
+        return np.array(components)
+    if rows:
+        return np.stack([np.stack(row, axis=-1) for row in components], axis=-2)
+    return np.stack(components, axis=-1)
+
+
+def multiply(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    '''Произведение Гамильтона p ⊗ q в замкнутом виде по компонентам (16 умножений)'''
+    pw, px, py, pz = _components(p)
+    qw, qx, qy, qz = _components(q)
+    return _join((
+        pw * qw - px * qx - py * qy - pz * qz,
+        pw * qx + px * qw + py * qz - pz * qy,
+        pw * qy - px * qz + py * qw + pz * qx,
+        pw * qz + px * qy - py * qx + pz * qw,
+    ))
+
+
+def conjugate(q: np.ndarray) -> np.ndarray:
+    out = -q
+    out[..., 0] = q[..., 0]
+    return out
+
+
+def normalize(q: np.ndarray) -> np.ndarray:
+    return q / np.sqrt((q * q).sum(axis=-1, keepdims=True))
+
+
+def from_rotation_vector(v: np.ndarray) -> np.ndarray:
+    '''Кватернион поворота на вектор v: R(q) = exp([v x]) = I + sin|v|/|v| [v x] + (1 - cos|v|)/|v|^2 [v x]^2'''
+    angle = np.sqrt((v * v).sum(axis=-1))
+    # sin(|v|/2) / |v| -> 1/2 при |v| -> 0
+    scale = np.where(angle == 0, 0.5, np.sin(angle / 2) / np.where(angle == 0, 1, angle))
+    out = np.empty(v.shape[:-1] + (4,), v.dtype)
+    out[..., 0] = np.cos(angle / 2)
+    out[..., 1:] = v * scale[..., None]
+    return out
+
+
+def to_dcm(q: np.ndarray) -> np.ndarray:
+    '''
+    Матрица поворота R(q) (3, 3) или (..., 3, 3) в однородной форме (q ⊗ v ⊗ q*): для ненормированного
+    кватерниона - R(q / |q|) |q|^2
+    '''
+    w, x, y, z = _components(q)
+    ww, xx, yy, zz = w * w, x * x, y * y, z * z
+    xy, xz, yz, wx, wy, wz = x * y, x * z, y * z, w * x, w * y, w * z
+    return _join((
+        (ww + xx - yy - zz, 2 * (xy - wz), 2 * (xz + wy)),
+        (2 * (xy + wz), ww - xx + yy - zz, 2 * (yz - wx)),
+        (2 * (xz - wy), 2 * (yz + wx), ww - xx - yy + zz),
+    ))
+
+
+def from_dcm(C: np.ndarray) -> np.ndarray:
+    '''Кватернион матрицы поворота (3, 3) по методу Шеппарда (w >= 0)'''
+    trace = C[0, 0] + C[1, 1] + C[2, 2]
+    largest = np.argmax([trace, C[0, 0], C[1, 1], C[2, 2]])
+    match largest:
+        case 0:
+            w = np.sqrt(1 + trace) / 2
+            q = [w, (C[2, 1] - C[1, 2]) / (4 * w), (C[0, 2] - C[2, 0]) / (4 * w), (C[1, 0] - C[0, 1]) / (4 * w)]
+        case 1:
+            x = np.sqrt(1 + C[0, 0] - C[1, 1] - C[2, 2]) / 2
+            q = [(C[2, 1] - C[1, 2]) / (4 * x), x, (C[0, 1] + C[1, 0]) / (4 * x), (C[0, 2] + C[2, 0]) / (4 * x)]
+        case 2:
+            y = np.sqrt(1 - C[0, 0] + C[1, 1] - C[2, 2]) / 2
+            q = [(C[0, 2] - C[2, 0]) / (4 * y), (C[0, 1] + C[1, 0]) / (4 * y), y, (C[1, 2] + C[2, 1]) / (4 * y)]
+        case _:
+            z = np.sqrt(1 - C[0, 0] - C[1, 1] + C[2, 2]) / 2
+            q = [(C[1, 0] - C[0, 1]) / (4 * z), (C[0, 2] + C[2, 0]) / (4 * z), (C[1, 2] + C[2, 1]) / (4 * z), z]
+    q = np.array(q, C.dtype)
+    return q if q[0] >= 0 else -q
+
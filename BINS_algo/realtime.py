@@ -0,0 +1,228 @@
+'''
+Режим реального времени: источник ИНС, навигационное ядро и приёмники состояний работают
+как отдельные задачи asyncio, связанные ограниченными очередями.
+
+    источник --(ticks, queue_size)--> навигация --(states, sink_queue_size)--> приёмники
+
+Источник:
+    paced_ticks - воспроизведение imu.iter_blocks() в темпе реального времени в том же процессе
+    UDPSource   - приём тактов по UDP (float64 записи t, ax..wz), отправитель - udp_replay
+Отставание:
+    очередь тактов полна            - такт отбрасывается (UDP нельзя притормозить)
+    возраст такта > срока цикла     - policy='flag': цикл помечается опоздавшим,
+                                      policy='drop': такт отбрасывается без интегрирования
+Срок цикла - rate_decrease * samples / frequency; задержка цикла отсчитывается от прихода его последнего такта.
+
+Демонстрация (журнал воспроизводится по UDP на localhost в реальном времени):
+    python -m BINS_algo.realtime log.npy --port 9000 --seconds 30
+'''
+import time
+import asyncio
+import argparse
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+import numpy as np
+
+from .small_increments import SmallIncrements
+from .navigation_system import Navigation_System
+from .imu_emulator import IMU_emulator, IMU_reader
+from .sinks import StateSink
+
+
+RECORD_DTYPE = np.dtype('<f8')
+RECORD_SIZE = 7 * RECORD_DTYPE.itemsize
+
+
+@dataclass
+class RealtimeStats:
+    '''Метрики конвейера реального времени'''
+    ticks_received: int = 0
+    ticks_dropped_full: int = 0
+    ticks_dropped_late: int = 0
+    cycles: int = 0
+    late_cycles: int = 0
+    max_tick_queue: int = 0
+    max_state_queue: int = 0
+    latency: list[float] = field(default_factory=list)
+    tick_queue_depth: list[int] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        latency = np.array(self.latency) * 1e3
+        return {
+            'ticks_received': self.ticks_received,
+            'ticks_dropped_full': self.ticks_dropped_full,
+            'ticks_dropped_late': self.ticks_dropped_late,
+            'cycles': self.cycles,
+            'late_cycles': self.late_cycles,
+            'latency_p50_ms': float(np.percentile(latency, 50)) if len(latency) else 0.0,
+            'latency_p99_ms': float(np.percentile(latency, 99)) if len(latency) else 0.0,
+            'latency_max_ms': float(latency.max()) if len(latency) else 0.0,
+            'max_tick_queue': self.max_tick_queue,
+            'max_state_queue': self.max_state_queue,
+        }
+
+
+async def paced_ticks(imu: IMU_emulator | IMU_reader, speed: float = 1.0) -> AsyncIterator[np.ndarray]:
+    '''Блоки тактов источника в темпе реального времени (speed - ускорение воспроизведения)'''
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    step = max(imu.frequency // 100, 1)
+    t0 = None
+    async for block in imu.iter_blocks():
+        for start in range(0, len(block), step):
+            chunk = block[start:start + step]
+            t0 = chunk[0, 0] if t0 is None else t0
+            delay = started + float(chunk[-1, 0] - t0) / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield chunk
+
+
+async def udp_replay(imu: IMU_emulator | IMU_reader, host: str = '127.0.0.1', port: int = 9000, speed: float = 1.0, ticks_per_packet: int = 16) -> None:
+    '''Отправка тактов источника по UDP в темпе реального времени'''
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+    try:
+        async for chunk in paced_ticks(imu, speed):
+            for start in range(0, len(chunk), ticks_per_packet):
+                transport.sendto(np.ascontiguousarray(chunk[start:start + ticks_per_packet], RECORD_DTYPE).tobytes())
+    finally:
+        transport.close()
+
+
+class UDPSource(asyncio.DatagramProtocol):
+    '''Приём тактов ИНС по UDP в ограниченную очередь'''
+    queue: asyncio.Queue
+    stats: RealtimeStats
+
+    def __init__(self, queue: asyncio.Queue, stats: RealtimeStats):
+        self.queue = queue
+        self.stats = stats
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        arrival = time.perf_counter()
+        for tick in np.frombuffer(data[:len(data) // RECORD_SIZE * RECORD_SIZE], RECORD_DTYPE).reshape(-1, 7):
+            self.stats.ticks_received += 1
+            try:
+                self.queue.put_nowait((tick, arrival))
+            except asyncio.QueueFull:
+                self.stats.ticks_dropped_full += 1
+        self.stats.max_tick_queue = max(self.stats.max_tick_queue, self.queue.qsize())
+
+    async def listen(self, host: str = '127.0.0.1', port: int = 9000) -> asyncio.DatagramTransport:
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(lambda: self, local_addr=(host, port))
+        return transport
+
+
+class RealtimeNavigator:
+    '''Конвейер реального времени вокруг Navigation_System.process'''
+    nav: Navigation_System
+    sinks: list[StateSink]
+    policy: str
+    deadline: float
+    stats: RealtimeStats
+
+    def __init__(self, nav: Navigation_System, sinks: list[StateSink] | None = None, queue_size: int = 4096, sink_queue_size: int = 256, policy: str = 'flag'):
+        assert policy in ('flag', 'drop'), f'unknown policy: {policy}'
+        self.nav = nav
+        self.sinks = list(sinks or [])
+        self.policy = policy
+        self.deadline = nav.cycle / nav.imu.frequency
+        self.stats = RealtimeStats()
+        self.ticks: asyncio.Queue = asyncio.Queue(queue_size)
+        self.states: asyncio.Queue = asyncio.Queue(sink_queue_size)
+
+    async def feed(self, chunks: AsyncIterator[np.ndarray]) -> None:
+        '''Стадия источника: перекладывает блоки тактов в очередь (ждёт при полной очереди)'''
+        async for chunk in chunks:
+            arrival = time.perf_counter()
+            for tick in chunk:
+                self.stats.ticks_received += 1
+                await self.ticks.put((tick, arrival))
+            self.stats.max_tick_queue = max(self.stats.max_tick_queue, self.ticks.qsize())
+        await self.ticks.put(None)
+
+    async def navigate(self) -> None:
+        '''Стадия навигации: такты из очереди -> Navigation_System.process -> очередь состояний'''
+        self.nav.reset()
+        while (item := await self.ticks.get()) is not None:
+            tick, arrival = item
+            now = time.perf_counter()
+            if self.policy == 'drop' and now - arrival > self.deadline:
+                self.stats.ticks_dropped_late += 1
+                continue
+
+            state = self.nav.process(SmallIncrements.view(tick))
+            if state is None:
+                continue
+
+            latency = time.perf_counter() - arrival
+            self.stats.cycles += 1
+            self.stats.late_cycles += latency > self.deadline
+            self.stats.latency.append(latency)
+            self.stats.tick_queue_depth.append(self.ticks.qsize())
+            await self.states.put(state)
+            self.stats.max_state_queue = max(self.stats.max_state_queue, self.states.qsize())
+            # Отдаём управление остальным стадиям раз в цикл
+            await asyncio.sleep(0)
+        await self.states.put(None)
+
+    async def drain(self) -> None:
+        '''Стадия вывода: состояния из очереди -> приёмники'''
+        while (state := await self.states.get()) is not None:
+            for sink in self.sinks:
+                sink.write(state)
+        for sink in self.sinks:
+            sink.flush()
+
+    async def run(self, chunks: AsyncIterator[np.ndarray] | None = None) -> RealtimeStats:
+        '''Запуск конвейера; без chunks такты берутся из очереди (например, из UDPSource) до stop()'''
+        stages = [self.navigate(), self.drain()]
+        if chunks is not None:
+            stages.append(self.feed(chunks))
+        await asyncio.gather(*stages)
+        return self.stats
+
+    async def stop(self) -> None:
+        '''Завершение конвейера после обработки уже принятых тактов'''
+        await self.ticks.put(None)
+
+
+async def replay_over_udp(nav: Navigation_System, port: int = 9000, speed: float = 1.0, sinks: list[StateSink] | None = None, **kwargs) -> RealtimeStats:
+    '''Журнал источника nav.imu отправляется по UDP на localhost и обрабатывается конвейером'''
+    realtime = RealtimeNavigator(nav, sinks, **kwargs)
+    transport = await UDPSource(realtime.ticks, realtime.stats).listen(port=port)
+    pipeline = asyncio.create_task(realtime.run())
+    try:
+        await udp_replay(nav.imu, port=port, speed=speed)
+        await asyncio.sleep(realtime.deadline)
+    finally:
+        transport.close()
+        await realtime.stop()
+        await pipeline
+    return realtime.stats
+
+
+def main() -> None:
+    from .scenarios import Scenario
+
+    parser = argparse.ArgumentParser(description='Навигация в реальном времени по журналу, воспроизводимому по UDP')
+    parser.add_argument('log', nargs='?', help='Журнал ИНС для IMU_reader (по умолчанию - неподвижная БИНС)')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--speed', type=float, default=1.0, help='Ускорение воспроизведения')
+    parser.add_argument('--seconds', type=float, default=30, help='Длительность эмуляции без журнала')
+    parser.add_argument('--policy', default='flag', choices=('flag', 'drop'))
+    args = parser.parse_args()
+
+    scenario = Scenario(ttl_sec=args.seconds)
+    nav = scenario.navigation_system()
+    if args.log:
+        nav.imu = IMU_reader(scenario.initial_state(), args.log, frequency=scenario.frequency)
+
+    stats = asyncio.run(replay_over_udp(nav, args.port, args.speed, policy=args.policy))
+    for name, value in stats.summary().items():
+        print(f'{name:>20}: {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+'''
+Пакетный прогон сценариев распространения ошибок БИНС на пуле процессов.
+
+Сценарии задаются сеткой параметров или спецификацией случайной выборки, каждый прогон
+выполняется в отдельном процессе, а результаты по мере готовности дописываются в общий
+столбцовый файл results.csv (столбец run_id + столбцы StateHistory). Метаданные прогонов
+пишутся в manifest.jsonl; при повторном запуске завершённые сценарии пропускаются.
+
+Запуск из командной строки:
+    python -m BINS_algo.scenarios spec.json output_dir --workers 8
+'''
+import os
+import json
+import time
+import hashlib
+import asyncio
+import argparse
+import itertools
+from typing import Annotated, Callable, Iterable
+from dataclasses import dataclass, asdict, fields, replace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+from .state import State
+from .state_history import StateHistory
+from .imu_emulator import IMU_emulator
+from .navigation_system import Navigation_System
+from .precision import get_precision
+from . import math_functions as MathFunc
+
+
+RESULTS_FILE = 'results.csv'
+MANIFEST_FILE = 'manifest.jsonl'
+
+
+@dataclass(frozen=True)
+class Scenario:
+    latitude: Annotated[float, 'Начальная широта [deg]'] = 56.0
+    longitude: Annotated[float, 'Начальная долгота [deg]'] = 0.0
+    heading: Annotated[float, 'Курс [deg]'] = 45.0
+    pitch: Annotated[float, 'Тангаж [deg]'] = 0.0
+    roll: Annotated[float, 'Крен [deg]'] = 5.0
+    gyro_bias: Annotated[tuple[float, float, float], 'Дрейфы ДУС [deg/h]'] = (0.0, 0.0, 0.0)
+    accel_bias: Annotated[tuple[float, float, float], 'Дрейфы акселерометров [m/sec^2]'] = (0.0, 0.0, 0.0)
+    frequency: Annotated[int, 'Частота ИНС [Hz]'] = 800
+    ttl_sec: Annotated[float, 'Длительность [sec]'] = 90 * 60
+    rate_decrease: Annotated[int, 'Понижение частоты'] = 4
+    decimation: Annotated[int, 'Прореживание сохраняемых состояний'] = 1
+    precision: Annotated[str, 'Точность вычислений (longdouble / float64)'] = 'longdouble'
+    kernels: Annotated[str, 'Ядра 3x3 операций (reference / closed_form / numba)'] = 'reference'
+
+    def __post_init__(self):
+        object.__setattr__(self, 'gyro_bias', tuple(float(x) for x in self.gyro_bias))
+        object.__setattr__(self, 'accel_bias', tuple(float(x) for x in self.accel_bias))
+
+    @property
+    def run_id(self) -> str:
+        '''Устойчивый идентификатор прогона по значениям параметров'''
+        return hashlib.sha1(json.dumps(asdict(self), sort_keys=True).encode()).hexdigest()[:16]
+
+    def initial_state(self) -> State:
+        heading, pitch, roll = np.deg2rad([self.heading, self.pitch, self.roll]).astype(np.longdouble)
+        C_body_to_ref = MathFunc.calc_body_to_ref(heading, pitch, roll)
+        return State(
+            t=0,
+            latitude=np.deg2rad(self.latitude),
+            longitude=np.deg2rad(self.longitude),
+            velocity_x_ref=0,
+            velocity_y_ref=0,
+            velocity_z_ref=0,
+            heading=heading,
+            pitch=pitch,
+            roll=roll,
+            C_body_to_ref=C_body_to_ref,
+            C_inertial_to_body=C_body_to_ref.T,
+        )
+
+    def navigation_system(self) -> Navigation_System:
+        imu = IMU_emulator.stationary(
+            self.initial_state(),
+            gyro_bias=np.deg2rad(self.gyro_bias) / 3_600,
+            accel_bias=self.accel_bias,
+            frequency=self.frequency,
+            ttl_sec=self.ttl_sec,
+        )
+        return Navigation_System(
+            imu,
+            rate_decrease=self.rate_decrease,
+            state_vault=StateHistory(store_matrices=False, decimation=self.decimation, dtype=get_precision(self.precision).dtype),
+            kernels=self.kernels,
+            precision=self.precision,
+        )
+
+
+def grid(base: Scenario = Scenario(), **axes: Iterable) -> list[Scenario]:
+    '''Декартово произведение значений параметров: grid(heading=[0, 45], latitude=[0, 56])'''
+    names = list(axes)
+    return [replace(base, **dict(zip(names, values))) for values in itertools.product(*axes.values())]
+
+
+def sample(base: Scenario = Scenario(), count: int = 1, seed: int | None = None, **distributions: dict) -> list[Scenario]:
+    '''
+    Случайная выборка параметров: sample(count=100, seed=1, heading={'uniform': [0, 360]}, gyro_bias={'normal': [0, 0.1]}).
+    Для векторных параметров (дрейфы) разыгрывается по три значения.
+    '''
+    rng = np.random.default_rng(seed)
+    vectors = {field.name for field in fields(Scenario) if field.name.endswith('_bias')}
+    scenarios = []
+    for _ in range(count):
+        values = {}
+        for name, distribution in distributions.items():
+            (kind, args), = distribution.items()
+            value = getattr(rng, kind)(*args, size=3 if name in vectors else None)
+            values[name] = tuple(value) if name in vectors else type(getattr(base, name))(value)
+        scenarios.append(replace(base, **values))
+    return scenarios
+
+
+def expand_spec(spec: dict) -> list[Scenario]:
+    '''
+    Сценарии из JSON-спецификации:
+        {"base": {...}, "grid": {"heading": [0, 45]}}
+        {"base": {...}, "random": {"count": 100, "seed": 1, "params": {"heading": {"uniform": [0, 360]}}}}
+    '''
+    base = Scenario(**spec.get('base', {}))
+    scenarios = []
+    if 'grid' in spec:
+        scenarios += grid(base, **spec['grid'])
+    if 'random' in spec:
+        random = spec['random']
+        scenarios += sample(base, random.get('count', 1), random.get('seed'), **random.get('params', {}))
+    return scenarios or [base]
+
+
+def run_scenario(scenario: Scenario) -> tuple[str, np.ndarray, float]:
+    '''Прогон одного сценария: (run_id, история состояний (N, 9), время счёта [sec])'''
+    started = time.perf_counter()
+    nav = scenario.navigation_system()
+    asyncio.run(nav.navigate_blocks())
+    return scenario.run_id, nav.state_vault.as_array().astype(np.float64), time.perf_counter() - started
+
+
+def finished_runs(output_dir: str) -> dict[str, dict]:
+    '''Завершённые прогоны из manifest.jsonl'''
+    manifest = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest):
+        return {}
+    with open(manifest) as fp:
+        records = [json.loads(line) for line in fp if line.endswith('\n')]
+    return {record['run_id']: record for record in records}
+
+
+def run_scenarios(
+        scenarios: Iterable[Scenario],
+        output_dir: str,
+        workers: int | None = None,
+        progress: Callable[[int, int, dict], None] | None = None,
+) -> list[str]:
+    '''
+    Прогон сценариев на пуле из workers процессов (по умолчанию - все ядра).
+    progress(выполнено, всего, запись манифеста) вызывается после записи каждого прогона.
+
+    Результат каждого прогона дописывается в results.csv, после чего в manifest.jsonl
+    добавляется строка метаданных с размером results.csv. При возобновлении results.csv
+    обрезается до последнего записанного в манифест размера, а manifest.jsonl - до последней
+    полной строки, так что строки прогона, прерванного сбоем, не дублируются и не склеиваются
+    со следующей записью. Возвращает run_id выполненных прогонов.
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    results = os.path.join(output_dir, RESULTS_FILE)
+    manifest = os.path.join(output_dir, MANIFEST_FILE)
+    done = finished_runs(output_dir)
+    size = max((record['results_size'] for record in done.values()), default=0)
+    if os.path.exists(results):
+        os.truncate(results, size)
+    if os.path.exists(manifest):
+        with open(manifest, 'rb') as fp:
+            os.truncate(manifest, fp.read().rfind(b'\n') + 1)
+
+    pending = {scenario.run_id: scenario for scenario in scenarios if scenario.run_id not in done}
+    completed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            open(results, 'a', newline='') as results_fp, \
+            open(manifest, 'a') as manifest_fp:
+        futures = [executor.submit(run_scenario, scenario) for scenario in pending.values()]
+        for future in as_completed(futures):
+            run_id, states, elapsed = future.result()
+            frame = pd.DataFrame(states, columns=StateHistory.COLUMNS)
+            frame.insert(0, 'run_id', run_id)
+            frame.to_csv(results_fp, header=results_fp.tell() == 0, index=False, float_format='%.17g')
+            results_fp.flush()
+
+            record = {'run_id': run_id, **asdict(pending[run_id]), 'states': len(states), 'elapsed_sec': elapsed, 'results_size': results_fp.tell()}
+            manifest_fp.write(json.dumps(record) + '\n')
+            manifest_fp.flush()
+            completed.append(run_id)
+            if progress is not None:
+                progress(len(completed), len(pending), record)
+
+    return completed
+
+
+def load_results(output_dir: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    '''Результаты всех прогонов (столбец run_id) и таблица метаданных прогонов'''
+    manifest = pd.DataFrame(finished_runs(output_dir).values())
+    results = pd.read_csv(os.path.join(output_dir, RESULTS_FILE))
+    return results, manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Пакетный прогон сценариев БИНС')
+    parser.add_argument('spec', help='JSON-спецификация сценариев (base / grid / random)')
+    parser.add_argument('output_dir', help='Каталог результатов (results.csv, manifest.jsonl)')
+    parser.add_argument('--workers', type=int, default=None, help='Число процессов (по умолчанию - все ядра)')
+    args = parser.parse_args()
+
+    with open(args.spec) as fp:
+        scenarios = expand_spec(json.load(fp))
+
+    def progress(completed: int, total: int, record: dict) -> None:
+        print(f'[{completed}/{total}] {record["run_id"]} {record["elapsed_sec"]:.1f} sec')
+
+    run_scenarios(scenarios, args.output_dir, args.workers, progress)
+
+
+if __name__ == '__main__':
+    main()
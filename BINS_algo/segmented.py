@@ -0,0 +1,277 @@
+'''
+Параллельная обработка длинного журнала ИНС по временным окнам.
+
+Журнал делится на окна по window_sec (целое число циклов навигации), каждое окно считается
+в отдельном процессе от своего начального состояния (seed), результаты сшиваются в одну
+траекторию trajectory.npy (столбцы StateHistory, точность вычислений).
+
+Начальные состояния окон:
+    первое окно          - initial_state
+    states (CSV / .npy)  - эталон или ранее посчитанная траектория со столбцами StateHistory:
+                           берётся строка с t последней записи журнала перед границей окна
+                           (с точностью до половины такта)
+    без states           - грубый предварительный проход: та же навигация в float64 с понижением
+                           частоты rate_decrease * coarse_factor, только по границам окон
+Из скалярных величин seed строится C_body_to_ref по курсу, тангажу и крену; инерциальная СК
+окна совмещается с опорной на его начале: C_inertial_to_ref = I, C_inertial_to_body = C_body_to_ref^T
+(вычисления зависят только от C_body_to_ref = C_inertial_to_ref C_inertial_to_body^T).
+
+Диагностика сшивки (boundaries.csv): на каждой внутренней границе конечное состояние окна
+сравнивается с начальным состоянием следующего - разрыв координат [m], скорости [m/sec]
+и углов ориентации [arcsec]. При эталонных seed это ошибка навигации, накопленная за окно.
+
+Запуск из командной строки:
+    python -m BINS_algo.segmented log.npy output_dir --window 3600 --workers 8 [--states truth.csv]
+'''
+import os
+import time
+import asyncio
+import argparse
+from typing import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+from .state import State
+from .state_history import StateHistory
+from .imu_emulator import IMU_reader
+from .navigation_system import Navigation_System
+from .sinks import NpySink
+from .scenarios import Scenario
+from .precision import get_precision
+from .constants import RADIUS_EARTH
+from . import math_functions as MathFunc
+
+
+TRAJECTORY_FILE = 'trajectory.npy'
+BOUNDARIES_FILE = 'boundaries.csv'
+ARCSEC = np.rad2deg(1) * 3_600
+
+
+def windows(count: int, window: int) -> list[tuple[int, int]]:
+    '''Окна [start, stop) тактов журнала длиной window (последнее - до конца журнала)'''
+    return [(start, min(start + window, count)) for start in range(0, count, window)]
+
+
+def load_states(filepath: str) -> np.ndarray:
+    '''Траектория (N, 9) в столбцах StateHistory из .npy (NpySink) или CSV (save_states / CSVSink)'''
+    if os.path.splitext(filepath)[1].lower() == '.npy':
+        return np.load(filepath)
+    return pd.read_csv(filepath)[list(StateHistory.COLUMNS)].to_numpy(np.float64)
+
+
+def seed_state(row: np.ndarray, dtype: type = np.longdouble) -> State:
+    '''Начальное состояние окна по скалярным величинам (строка StateHistory.COLUMNS)'''
+    values = dict(zip(StateHistory.COLUMNS, np.asarray(row, dtype)))
+    C_body_to_ref = MathFunc.calc_body_to_ref(values['heading'], values['pitch'], values['roll'], get_precision(dtype))
+    return State(**values, C_body_to_ref=C_body_to_ref, C_inertial_to_body=C_body_to_ref.T, dtype=dtype)
+
+
+def record_times(reader: IMU_reader, ticks: list[int]) -> list[float]:
+    '''Время t последней записи перед каждым тактом ticks (записи tick - 1 журнала)'''
+    async def first(tick: int) -> float:
+        stream = reader.iter_blocks(start=tick - 1)
+        try:
+            block = await anext(stream)
+        finally:
+            await stream.aclose()
+        return float(block[0, 0])
+
+    return [asyncio.run(first(tick)) for tick in ticks]
+
+
+def seeds_from_states(states: np.ndarray, times: list[float], frequency: int, dtype: type = np.longdouble) -> list[State]:
+    '''Начальные состояния на моменты times (см. record_times) по ближайшим по времени строкам траектории'''
+    t = np.asarray(states[:, 0], np.float64)
+    seeds = []
+    for time_ in times:
+        index = int(np.clip(np.searchsorted(t, time_), 1, len(t) - 1))
+        index = index if abs(t[index] - time_) < abs(t[index - 1] - time_) else index - 1
+        assert abs(t[index] - time_) <= 0.5 / frequency, f'no state at t={time_:.6f} sec (nearest t={t[index]:.6f})'
+        seeds.append(seed_state(states[index], dtype))
+    return seeds
+
+
+async def replay(nav: Navigation_System, start: int, stop: int, state: State) -> State:
+    '''Навигация по тактам [start, stop) источника nav.imu от состояния state, возвращает последнее'''
+    cycle = nav.cycle
+    pending = np.empty((0, 7), nav.precision.dtype)
+    position = start
+    async for block in nav.imu.iter_blocks(start=start):
+        block = block[:stop - position]
+        position += len(block)
+        records = np.concatenate((pending, block)) if len(pending) else block
+        full = len(records) // cycle * cycle
+        state = nav.navigate_batch(records[:full], state)
+        pending = records[full:]
+        if position >= stop:
+            break
+    return state
+
+
+def coarse_seeds(
+    reader: IMU_reader,
+    initial_state: State,
+    ticks: list[int],
+    coarse_factor: int = 8,
+    rate_decrease: int = 4,
+    samples: int = 4,
+    dtype: type = np.longdouble,
+) -> list[State]:
+    '''Начальные состояния на тактах ticks по грубому последовательному проходу (float64)'''
+    nav = Navigation_System(
+        reader,
+        rate_decrease=rate_decrease * coarse_factor,
+        samples=samples,
+        precision='float64',
+        state_vault=StateHistory(store_matrices=False, max_length=1, dtype=np.float64),
+    )
+    state, position, seeds = initial_state, 0, []
+    for tick in ticks:
+        state = asyncio.run(replay(nav, position, tick, state))
+        position = tick
+        seeds.append(state.astype(dtype))
+    return seeds
+
+
+def replay_window(filepath: str, frequency: int, window: int, start: int, stop: int, seed: State, output: str, nav_options: dict) -> dict:
+    '''Одно окно в отдельном процессе: траектория пишется в output, возвращается конечное состояние'''
+    started = time.perf_counter()
+    dtype = get_precision(nav_options.get('precision', 'longdouble')).dtype
+    sink = NpySink(output, dtype=dtype)
+    nav = Navigation_System(
+        IMU_reader(seed, filepath, frequency=frequency),
+        state_vault=StateHistory(store_matrices=False, max_length=1, dtype=dtype),
+        sinks=[sink],
+        **nav_options,
+    )
+    last = asyncio.run(replay(nav, start, stop, seed))
+    sink.close()
+    return {
+        'window': window,
+        'start': start,
+        'stop': stop,
+        'states': sink.rows_written,
+        'last': np.array(last.values, dtype),
+        'elapsed_sec': time.perf_counter() - started,
+    }
+
+
+def boundary_diagnostics(lasts: list[np.ndarray], seeds: list[State]) -> pd.DataFrame:
+    '''Разрывы на границах: конечное состояние окна k-1 относительно начального окна k'''
+    rows = []
+    for window, (last, seed) in enumerate(zip(lasts, seeds), start=1):
+        last = dict(zip(StateHistory.COLUMNS, np.asarray(last, np.float64)))
+        seed = {name: float(getattr(seed, name)) for name in StateHistory.COLUMNS}
+        north = (last['latitude'] - seed['latitude']) * float(RADIUS_EARTH)
+        east = (last['longitude'] - seed['longitude']) * float(RADIUS_EARTH) * np.cos(seed['latitude'])
+        row = {
+            'window': window,
+            't': seed['t'],
+            'dt_sec': last['t'] - seed['t'],
+            'north_m': north,
+            'east_m': east,
+            'position_m': np.hypot(north, east),
+            'velocity_m_s': np.hypot(last['velocity_x_ref'] - seed['velocity_x_ref'], last['velocity_y_ref'] - seed['velocity_y_ref']),
+        }
+        for angle in ('heading', 'pitch', 'roll'):
+            row[f'{angle}_arcsec'] = float(np.angle(np.exp(1j * (last[angle] - seed[angle])))) * ARCSEC
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def segmented_replay(
+    filepath: str,
+    initial_state: State,
+    output_dir: str,
+    window_sec: float = 3_600,
+    frequency: int = 800,
+    states: str | np.ndarray | None = None,
+    workers: int | None = None,
+    coarse_factor: int = 8,
+    progress: Callable[[int, int, dict], None] | None = None,
+    **nav_options,
+) -> pd.DataFrame:
+    '''
+    Параллельная навигация по журналу filepath окнами по window_sec на пуле из workers процессов.
+    nav_options - параметры Navigation_System (rate_decrease, samples, precision, attitude, ...).
+    progress(выполнено, всего, результат окна replay_window) вызывается по завершении каждого окна.
+    В output_dir пишутся trajectory.npy и boundaries.csv, возвращается диагностика границ.
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    rate_decrease, samples = nav_options.get('rate_decrease', 4), nav_options.get('samples', 4)
+    dtype = get_precision(nav_options.get('precision', 'longdouble')).dtype
+    reader = IMU_reader(initial_state, filepath, frequency=frequency)
+
+    # Окна - целое число циклов (и циклов грубого прохода, если seed считаются им)
+    cycle = rate_decrease * samples * (coarse_factor if states is None else 1)
+    window = max(round(window_sec * frequency / cycle), 1) * cycle
+    spans = windows(reader.count(), window)
+    ticks = [start for start, _ in spans[1:]]
+    if states is None:
+        seeds = coarse_seeds(reader, initial_state, ticks, coarse_factor, rate_decrease, samples, dtype)
+    else:
+        states = load_states(states) if isinstance(states, str) else states
+        seeds = seeds_from_states(states, record_times(reader, ticks), frequency, dtype)
+    seeds = [initial_state.astype(dtype)] + seeds
+
+    parts = [os.path.join(output_dir, f'window-{index:05d}.npy') for index in range(len(spans))]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(replay_window, filepath, frequency, index, start, stop, seed, part, nav_options)
+            for index, ((start, stop), seed, part) in enumerate(zip(spans, seeds, parts))
+        ]
+        results = [None] * len(spans)
+        for completed, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results[result['window']] = result
+            if progress is not None:
+                progress(completed, len(spans), result)
+
+    # Сшивка окон в одну траекторию
+    with NpySink(os.path.join(output_dir, TRAJECTORY_FILE), dtype=dtype) as sink:
+        for part in parts:
+            sink.write_array(np.load(part))
+            os.remove(part)
+
+    boundaries = boundary_diagnostics([result['last'] for result in results[:-1]], seeds[1:])
+    boundaries.to_csv(os.path.join(output_dir, BOUNDARIES_FILE), index=False)
+    return boundaries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Параллельная навигация по журналу ИНС окнами')
+    parser.add_argument('log', help='Журнал ИНС (текст, .npy, .bin/.f64/.f32)')
+    parser.add_argument('output_dir', help='Каталог результатов (trajectory.npy, boundaries.csv)')
+    parser.add_argument('--window', type=float, default=3_600, help='Длительность окна [sec]')
+    parser.add_argument('--frequency', type=int, default=800)
+    parser.add_argument('--states', default=None, help='Эталонная траектория для начальных состояний окон (CSV / .npy)')
+    parser.add_argument('--coarse-factor', type=int, default=8, help='Понижение частоты грубого прохода, если --states не задан')
+    parser.add_argument('--workers', type=int, default=None, help='Число процессов (по умолчанию - все ядра)')
+    parser.add_argument('--rate-decrease', type=int, default=4)
+    parser.add_argument('--precision', default='longdouble', choices=('longdouble', 'float64'))
+    parser.add_argument('--latitude', type=float, default=Scenario.latitude, help='Начальная широта [deg]')
+    parser.add_argument('--longitude', type=float, default=Scenario.longitude, help='Начальная долгота [deg]')
+    parser.add_argument('--heading', type=float, default=Scenario.heading, help='Начальный курс [deg]')
+    parser.add_argument('--pitch', type=float, default=Scenario.pitch, help='Начальный тангаж [deg]')
+    parser.add_argument('--roll', type=float, default=Scenario.roll, help='Начальный крен [deg]')
+    args = parser.parse_args()
+
+    initial_state = Scenario(
+        latitude=args.latitude, longitude=args.longitude, heading=args.heading, pitch=args.pitch, roll=args.roll,
+    ).initial_state()
+
+    def progress(completed: int, total: int, result: dict) -> None:
+        print(f'[{completed}/{total}] ticks {result["start"]}-{result["stop"]}: {result["states"]} states, {result["elapsed_sec"]:.1f} sec')
+
+    boundaries = segmented_replay(
+        args.log, initial_state, args.output_dir,
+        window_sec=args.window, frequency=args.frequency, states=args.states, workers=args.workers,
+        coarse_factor=args.coarse_factor, progress=progress, rate_decrease=args.rate_decrease, precision=args.precision,
+    )
+    if len(boundaries):
+        print(boundaries.drop(columns='t').abs().max().to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+'''
+Потоковые приёмники (sinks) состояний навигационной системы.
+
+Состояния копятся в предвыделенном буфере и сбрасываются в файл пачками по batch_size,
+поэтому результаты появляются на диске по ходу прогона и переживают его аварийное завершение
+(теряется не более одной пачки). Файл открывается при первом сбросе: новый приёмник его перезаписывает,
+а после resume(rows, offset) (возобновление с контрольной точки) файл обрезается до позиции offset,
+сохранённой position() в момент записи контрольной точки, и дописывается.
+
+CSVSink     - текстовый CSV с заголовком (формат save_states)
+ParquetSink - каталог частей part-NNNNN.parquet через pandas (нужен pyarrow или fastparquet)
+NpySink     - один .npy (N, 9), заголовок которого переписывается при каждом сбросе
+'''
+import os
+import csv
+import numpy as np
+import pandas as pd
+
+from .state import State
+from .state_history import StateHistory
+
+
+class StateSink:
+    '''Базовый буферизованный приёмник состояний'''
+    COLUMNS = StateHistory.COLUMNS
+
+    filepath: str
+    batch_size: int
+    dtype: type
+
+    def __init__(self, filepath: str, batch_size: int = 4096, dtype: type = np.longdouble):
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self.dtype = dtype
+        self.rows_written = 0
+        self._buffer = np.empty((batch_size, len(self.COLUMNS)), dtype)
+        self._count = 0
+        self._opened = False
+
+    def position(self) -> tuple[int, int]:
+        '''Число записанных строк и позиция в файле после сброса буфера (для контрольной точки)'''
+        self.flush()
+        self._ensure_open()
+        return self.rows_written, self._offset()
+
+    def resume(self, rows: int, offset: int) -> None:
+        '''Продолжение файла после rows строк, записанных до позиции offset (см. position)'''
+        assert not self._opened and not self._count, 'sink must be resumed before anything is written'
+        self._open(offset)
+        self._opened = True
+        self.rows_written = rows
+
+    def _ensure_open(self) -> None:
+        if not self._opened:
+            self._open(None)
+            self._opened = True
+
+    def write(self, state: State) -> None:
+        self._buffer[self._count] = state.values
+        self._count += 1
+        if self._count == self.batch_size:
+            self.flush()
+
+    def write_array(self, rows: np.ndarray) -> None:
+        '''Запись готового массива состояний (N, 9) мимо буфера'''
+        self.flush()
+        if len(rows):
+            self._ensure_open()
+            self._write(np.asarray(rows, self.dtype))
+            self.rows_written += len(rows)
+            self.flush()
+
+    def flush(self) -> None:
+        if self._count:
+            self._ensure_open()
+            self._write(self._buffer[:self._count])
+            self.rows_written += self._count
+            self._count = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._ensure_open()
+
+    def _open(self, offset: int | None) -> None:
+        '''Новый файл (offset is None) или продолжение после позиции offset'''
+        raise NotImplementedError
+
+    def _offset(self) -> int:
+        raise NotImplementedError
+
+    def _write(self, rows: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def __enter__(self) -> 'StateSink':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class CSVSink(StateSink):
+    '''Текстовый CSV с заголовком; значения пишутся с полной точностью dtype'''
+
+    def _open(self, offset: int | None) -> None:
+        if offset is None:
+            self._fp = open(self.filepath, mode='w', newline='', buffering=1 << 20)
+        else:
+            os.truncate(self.filepath, offset)
+            self._fp = open(self.filepath, mode='a', newline='', buffering=1 << 20)
+        self._writer = csv.writer(self._fp)
+        if offset is None:
+            self._writer.writerow(self.COLUMNS)
+            self._fp.flush()
+
+    def _offset(self) -> int:
+        return self._fp.tell()
+
+    def _write(self, rows: np.ndarray) -> None:
+        self._writer.writerows(rows)
+        self._fp.flush()
+
+    def close(self) -> None:
+        super().close()
+        self._fp.close()
+
+
+class ParquetSink(StateSink):
+    '''
+    Столбцовый Parquet: каждая пачка - отдельная часть part-NNNNN.parquet в каталоге filepath,
+    уже записанные части читаются pd.read_parquet(filepath) во время прогона.
+    longdouble в Parquet не поддерживается, значения пишутся как float64.
+    '''
+
+    def __init__(self, filepath: str, batch_size: int = 65_536, dtype: type = np.longdouble):
+        super().__init__(filepath, batch_size, dtype)
+        self._parts = 0
+
+    def _open(self, offset: int | None) -> None:
+        os.makedirs(self.filepath, exist_ok=True)
+        # Новый приёмник удаляет все части прежнего прогона, после resume - записанные после контрольной точки
+        self._parts = offset or 0
+        for name in os.listdir(self.filepath):
+            if name.startswith('part-') and name.endswith('.parquet') and int(name[5:-8]) >= self._parts:
+                os.remove(os.path.join(self.filepath, name))
+
+    def _offset(self) -> int:
+        return self._parts
+
+    def _write(self, rows: np.ndarray) -> None:
+        frame = pd.DataFrame(rows.astype(np.float64), columns=self.COLUMNS)
+        frame.to_parquet(os.path.join(self.filepath, f'part-{self._parts:05d}.parquet'), index=False)
+        self._parts += 1
+
+
+class NpySink(StateSink):
+    '''
+    Сырые строки (N, 9) в одном .npy. Заголовок фиксированной длины переписывается
+    с текущим числом строк после каждого сброса, поэтому файл всегда читается np.load.
+    '''
+    HEADER_SIZE = 128
+
+    def _open(self, offset: int | None) -> None:
+        if offset is None:
+            self._fp = open(self.filepath, 'w+b')
+            self._write_header()
+        else:
+            self._fp = open(self.filepath, 'r+b')
+            self._fp.truncate(offset)
+            self._fp.seek(0, os.SEEK_END)
+
+    def _offset(self) -> int:
+        return self._fp.tell()
+
+    def _write_header(self) -> None:
+        header = repr({
+            'descr': np.lib.format.dtype_to_descr(np.dtype(self.dtype)),
+            'fortran_order': False,
+            'shape': (self.rows_written, len(self.COLUMNS)),
+        })
+        prefix = np.lib.format.magic(1, 0) + (self.HEADER_SIZE - 10).to_bytes(2, 'little')
+        self._fp.seek(0)
+        self._fp.write(prefix + header.ljust(self.HEADER_SIZE - len(prefix) - 1).encode('latin1') + b'\n')
+        self._fp.seek(0, os.SEEK_END)
+
+    def _write(self, rows: np.ndarray) -> None:
+        self._fp.write(np.ascontiguousarray(rows).tobytes())
+
+    def flush(self) -> None:
+        super().flush()
+        if self._opened:
+            self._write_header()
+            self._fp.flush()
+
+    def close(self) -> None:
+        super().close()
+        self._fp.close()
+
+
+SINKS = {
+    '.csv': CSVSink,
+    '.txt': CSVSink,
+    '.parquet': ParquetSink,
+    '.npy': NpySink,
+}
+
+
+def make_sink(filepath: str, **kwargs) -> StateSink:
+    '''Приёмник по расширению файла: .csv/.txt, .parquet, .npy'''
+    extension = os.path.splitext(filepath)[1].lower()
+    assert extension in SINKS, f'unknown sink format: {extension}, expected one of {tuple(SINKS)}'
+    return SINKS[extension](filepath, **kwargs)
@@ -1,20 +1,40 @@
 from typing import Annotated
-from dataclasses import dataclass
 import numpy as np
 
 
-@dataclass
+def _field(index: int, doc: str) -> property:
+    '''Скалярное поле - элемент массива data'''
+    def get(self) -> np.longdouble:
+        return self.data[index]
+
+    def set(self, value: int | float | np.longdouble) -> None:
+        self.data[index] = value
+
+    return property(get, set, doc=doc)
+
+
 class SmallIncrements:
-    t: Annotated[np.longdouble, 'Время [sec]']
-    dax: Annotated[np.longdouble, 'Малое приращение ускорения по x [м/с^2]']
-    day: Annotated[np.longdouble, 'Малое приращение ускорения по y [м/с^2]']
-    daz: Annotated[np.longdouble, 'Малое приращение ускорения по z [м/с^2]']
-    dwx: Annotated[np.longdouble, 'Малое приращение угловой скорости по x [рад/с]']
-    dwy: Annotated[np.longdouble, 'Малое приращение угловой скорости по y [рад/с]']
-    dwz: Annotated[np.longdouble, 'Малое приращение угловой скорости по z [рад/с]']
+    '''
+    Малые приращения одного такта (или накопленные за несколько тактов).
+    Значения хранятся в массиве data (7,): t, dax, day, daz, dwx, dwy, dwz, поэтому da и dw -
+    представления (view) без копирования, а приращение может быть строкой общего массива
+    записей источника (N, 7) без выделения памяти (view).
+    '''
+    __slots__ = ('data',)
+    FIELDS = ('t', 'dax', 'day', 'daz', 'dwx', 'dwy', 'dwz')
+
+    data: Annotated[np.ndarray, 't, dax, day, daz, dwx, dwy, dwz']
+
+    t = _field(0, 'Время [sec]')
+    dax = _field(1, 'Малое приращение ускорения по x [м/с^2]')
+    day = _field(2, 'Малое приращение ускорения по y [м/с^2]')
+    daz = _field(3, 'Малое приращение ускорения по z [м/с^2]')
+    dwx = _field(4, 'Малое приращение угловой скорости по x [рад/с]')
+    dwy = _field(5, 'Малое приращение угловой скорости по y [рад/с]')
+    dwz = _field(6, 'Малое приращение угловой скорости по z [рад/с]')
 
     def __init__(
-        self, 
+        self,
         t: int | float | np.longdouble,
         dax: int | float | np.longdouble,
         day: int | float | np.longdouble,
@@ -22,39 +42,36 @@ class SmallIncrements:
         dwx: int | float | np.longdouble,
         dwy: int | float | np.longdouble,
         dwz: int | float | np.longdouble,
+        dtype: type = np.longdouble,
     ):
-        self.t = np.longdouble(t)
-        self.dax = np.longdouble(dax)
-        self.day = np.longdouble(day)
-        self.daz = np.longdouble(daz)
-        self.dwx = np.longdouble(dwx)
-        self.dwy = np.longdouble(dwy)
-        self.dwz = np.longdouble(dwz)
+        self.data = np.array((t, dax, day, daz, dwx, dwy, dwz), dtype)
+
+    @classmethod
+    def view(cls, record: np.ndarray) -> 'SmallIncrements':
+        '''Приращение - представление записи (7,) без копирования, изменения видны в исходном массиве'''
+        increment = cls.__new__(cls)
+        increment.data = record
+        return increment
+
+    @property
+    def dtype(self) -> type:
+        return self.data.dtype.type
 
     @property
     def da(self) -> np.ndarray:
-        return np.array([
-            self.dax, 
-            self.day,
-            self.daz,
-        ], np.longdouble)
-    
+        return self.data[1:4]
+
     @da.setter
     def da(self, value: np.ndarray):
-        self.dax = np.longdouble(value[0])
-        self.day = np.longdouble(value[1])
-        self.daz = np.longdouble(value[2])
-    
+        self.data[1:4] = value
+
     @property
     def dw(self) -> np.ndarray:
-        return np.array([
-            self.dwx, 
-            self.dwy,
-            self.dwz,
-        ], np.longdouble)
-    
+        return self.data[4:7]
+
     @dw.setter
     def dw(self, value: np.ndarray):
-        self.dwx = np.longdouble(value[0])
-        self.dwy = np.longdouble(value[1])
-        self.dwz = np.longdouble(value[2])
+        self.data[4:7] = value
+
+    def __repr__(self) -> str:
+        return f'SmallIncrements({", ".join(f"{name}={value!r}" for name, value in zip(self.FIELDS, self.data))})'
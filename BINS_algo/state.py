@@ -1,23 +1,43 @@
 from typing import Annotated
-from dataclasses import dataclass
 import numpy as np
 
+from . import quaternions as Quat
+
+
+def _field(index: int, doc: str) -> property:
+    '''Скалярная величина - элемент массива values'''
+    def get(self) -> np.longdouble:
+        return self.values[index]
+
+    def set(self, value: int | float | np.longdouble) -> None:
+        self.values[index] = value
+
+    return property(get, set, doc=doc)
+
 
-@dataclass
 class State:
-    t: Annotated[np.longdouble, 'Время [sec]']
-    latitude: Annotated[np.longdouble, 'Широта [deg]']
-    longitude: Annotated[np.longdouble, 'Долгота [deg]']
-    velocity_x_ref: Annotated[np.longdouble, 'Скорость по оси x [m/s]']
-    velocity_y_ref: Annotated[np.longdouble, 'Скорость по оси y [m/s]']
-    velocity_z_ref: Annotated[np.longdouble, 'Скорость по оси z [m/s]']
-    heading: Annotated[np.longdouble, 'Курс']
-    pitch: Annotated[np.longdouble, 'Тангаж']
-    roll: Annotated[np.longdouble, 'Крен']
+    '''
+    Состояние навигационной системы. Скалярные величины хранятся в массиве values (9,)
+    в порядке StateHistory.COLUMNS: velocity - представление (view) values[3:6], а состояние
+    целиком копируется в историю и приёмники одной операцией.
+    '''
+    __slots__ = ('values', 'C_body_to_ref', 'C_inertial_to_body', 'C_inertial_to_ref')
+
+    values: Annotated[np.ndarray, 't, latitude, longitude, velocity_x_ref, velocity_y_ref, velocity_z_ref, heading, pitch, roll']
     C_body_to_ref: Annotated[np.ndarray, 'МНК перехода от связанной к опорной']
     C_inertial_to_body: Annotated[np.ndarray, 'МНК перехода от инерциальной к связанной']
     C_inertial_to_ref: Annotated[np.ndarray, 'МНК перехода от инерциальной к опорной']
 
+    t = _field(0, 'Время [sec]')
+    latitude = _field(1, 'Широта [deg]')
+    longitude = _field(2, 'Долгота [deg]')
+    velocity_x_ref = _field(3, 'Скорость по оси x [m/s]')
+    velocity_y_ref = _field(4, 'Скорость по оси y [m/s]')
+    velocity_z_ref = _field(5, 'Скорость по оси z [m/s]')
+    heading = _field(6, 'Курс')
+    pitch = _field(7, 'Тангаж')
+    roll = _field(8, 'Крен')
+
     def __init__(
         self, 
         t: int | float | np.longdouble,
@@ -32,27 +52,102 @@ class State:
         C_body_to_ref: np.ndarray,
         C_inertial_to_body: np.ndarray,
         C_inertial_to_ref: np.ndarray | None = None,
+        dtype: type = np.longdouble,
     ):
-        self.t = np.longdouble(t)
-        self.latitude = np.longdouble(latitude)
-        self.longitude = np.longdouble(longitude)
-        self.velocity_x_ref = np.longdouble(velocity_x_ref)
-        self.velocity_y_ref = np.longdouble(velocity_y_ref)
-        self.velocity_z_ref = np.longdouble(velocity_z_ref)
-        self.heading = np.longdouble(heading)
-        self.pitch = np.longdouble(pitch)
-        self.roll = np.longdouble(roll)
+        # None (величина ещё не вычислена) хранится как nan
+        self.values = np.array((t, latitude, longitude, velocity_x_ref, velocity_y_ref, velocity_z_ref, heading, pitch, roll), dtype)
         self.C_body_to_ref = C_body_to_ref
         self.C_inertial_to_body = C_inertial_to_body
-        self.C_inertial_to_ref = np.array(C_inertial_to_ref or np.eye(3), dtype=np.longdouble)
+        self.C_inertial_to_ref = np.array(np.eye(3) if C_inertial_to_ref is None else C_inertial_to_ref, dtype=dtype)
+
+    def astype(self, dtype: type) -> 'State':
+        '''Копия состояния с величинами и матрицами типа dtype'''
+        return State(
+            *self.values,
+            None if self.C_body_to_ref is None else np.array(self.C_body_to_ref, dtype),
+            None if self.C_inertial_to_body is None else np.array(self.C_inertial_to_body, dtype),
+            self.C_inertial_to_ref,
+            dtype=dtype,
+        )
 
     @property
-    def velocity(self):
-        return np.array([self.velocity_x_ref, self.velocity_y_ref, self.velocity_z_ref], np.longdouble)
+    def velocity(self) -> np.ndarray:
+        return self.values[3:6]
 
     @velocity.setter
     def velocity(self, value: np.ndarray) -> None:
         assert len(value) == 3, '3 values of velocity projection was expected'
-        self.velocity_x_ref = value[0]
-        self.velocity_y_ref = value[1]
-        self.velocity_z_ref = value[2]
+        self.values[3:6] = value
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(t={self.t!r}, latitude={self.latitude!r}, longitude={self.longitude!r}, heading={self.heading!r}, pitch={self.pitch!r}, roll={self.roll!r})'
+
+
+class QuaternionState(State):
+    '''
+    Состояние с ориентацией в кватернионах: R(q_inertial_to_body) = C_inertial_to_body,
+    R(q_inertial_to_ref) = C_inertial_to_ref. Матрицы МНК строятся при первом обращении.
+    '''
+    __slots__ = ('q_inertial_to_body', 'q_inertial_to_ref', '_C_body_to_ref')
+
+    q_inertial_to_body: Annotated[np.ndarray, 'Кватернион перехода от инерциальной к связанной']
+    q_inertial_to_ref: Annotated[np.ndarray, 'Кватернион перехода от инерциальной к опорной']
+
+    def __init__(
+        self,
+        t: int | float | np.longdouble,
+        latitude: int | float | np.longdouble,
+        longitude: int | float | np.longdouble,
+        velocity_x_ref: int | float | np.longdouble,
+        velocity_y_ref: int | float | np.longdouble,
+        velocity_z_ref: int | float | np.longdouble,
+        heading: int | float | np.longdouble,
+        pitch: int | float | np.longdouble,
+        roll: int | float | np.longdouble,
+        q_inertial_to_body: np.ndarray | None,
+        q_inertial_to_ref: np.ndarray | None,
+        dtype: type = np.longdouble,
+    ):
+        self.values = np.array((t, latitude, longitude, velocity_x_ref, velocity_y_ref, velocity_z_ref, heading, pitch, roll), dtype)
+        self.q_inertial_to_body = None if q_inertial_to_body is None else np.asarray(q_inertial_to_body, dtype)
+        self.q_inertial_to_ref = None if q_inertial_to_ref is None else np.asarray(q_inertial_to_ref, dtype)
+        self._C_body_to_ref = None
+
+    @classmethod
+    def from_state(cls, state: State, dtype: type = np.longdouble) -> 'QuaternionState':
+        '''Переход от матриц МНК состояния к кватернионам'''
+        return cls(
+            *state.values,
+            Quat.from_dcm(np.asarray(state.C_inertial_to_body, dtype)),
+            Quat.from_dcm(np.asarray(state.C_inertial_to_ref, dtype)),
+            dtype=dtype,
+        )
+
+    def astype(self, dtype: type) -> 'QuaternionState':
+        return QuaternionState(
+            *self.values,
+            self.q_inertial_to_body, self.q_inertial_to_ref,
+            dtype=dtype,
+        )
+
+    @property
+    def q_body_to_ref(self) -> np.ndarray:
+        return Quat.multiply(self.q_inertial_to_ref, Quat.conjugate(self.q_inertial_to_body))
+
+    @property
+    def C_body_to_ref(self) -> np.ndarray:
+        if self._C_body_to_ref is None:
+            self._C_body_to_ref = Quat.to_dcm(self.q_body_to_ref)
+        return self._C_body_to_ref
+
+    @C_body_to_ref.setter
+    def C_body_to_ref(self, value: np.ndarray) -> None:
+        self._C_body_to_ref = value
+
+    @property
+    def C_inertial_to_body(self) -> np.ndarray:
+        return Quat.to_dcm(self.q_inertial_to_body)
+
+    @property
+    def C_inertial_to_ref(self) -> np.ndarray:
+        return Quat.to_dcm(self.q_inertial_to_ref)
@@ -0,0 +1,161 @@
+from typing import Iterator
+import numpy as np
+
+from .state import State, QuaternionState
+from . import quaternions as Quat
+
+
+class StateHistory:
+    '''
+    Колоночное (struct-of-arrays) хранилище истории состояний.
+
+    Скаляры состояния хранятся в предвыделенных столбцах, матрицы МНК - в блоке (N, 3, 3)
+    на каждую матрицу (можно отключить через store_matrices). Поддерживается прореживание
+    (сохраняется каждое decimation-е состояние) и кольцевой буфер на max_length последних
+    состояний, что ограничивает память на длинных прогонах.
+    При quaternions ориентация хранится блоком кватернионов (N, 2, 4) вместо (N, 3, 3, 3),
+    а матрицы МНК строятся из них по запросу.
+    '''
+    COLUMNS = ('t', 'latitude', 'longitude', 'velocity_x_ref', 'velocity_y_ref', 'velocity_z_ref', 'heading', 'pitch', 'roll')
+    MATRICES = ('C_body_to_ref', 'C_inertial_to_body', 'C_inertial_to_ref')
+    QUATERNIONS = ('q_inertial_to_body', 'q_inertial_to_ref')
+
+    store_matrices: bool
+    quaternions: bool
+    decimation: int
+    max_length: int | None
+    dtype: type
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        store_matrices: bool = True,
+        decimation: int = 1,
+        max_length: int | None = None,
+        dtype: type = np.longdouble,
+        quaternions: bool = False,
+    ):
+        assert decimation >= 1, 'decimation must be positive'
+        assert max_length is None or max_length > 0, 'max_length must be positive'
+        self.store_matrices = store_matrices
+        self.quaternions = quaternions
+        self.decimation = decimation
+        self.max_length = max_length
+        self.dtype = dtype
+        self._allocate(max_length or capacity)
+        self.clear()
+
+    def _allocate(self, capacity: int) -> None:
+        self._scalars = np.empty((capacity, len(self.COLUMNS)), self.dtype)
+        shape = (len(self.QUATERNIONS), 4) if self.quaternions else (len(self.MATRICES), 3, 3)
+        self._matrices = np.empty((capacity, *shape), self.dtype) if self.store_matrices else None
+
+    def _grow(self) -> None:
+        scalars, matrices = self._scalars, self._matrices
+        self._allocate(2 * len(scalars))
+        self._scalars[:len(scalars)] = scalars
+        if matrices is not None:
+            self._matrices[:len(matrices)] = matrices
+
+    def clear(self) -> None:
+        self._length = 0
+        self._head = 0
+        self._offered = 0
+
+    def append(self, state: State) -> None:
+        self._offered += 1
+        if (self._offered - 1) % self.decimation:
+            return
+
+        if self.max_length is None:
+            if self._length == len(self._scalars):
+                self._grow()
+            index = self._length
+            self._length += 1
+        else:
+            index = (self._head + self._length) % self.max_length
+            if self._length == self.max_length:
+                self._head = (self._head + 1) % self.max_length
+            else:
+                self._length += 1
+
+        self._scalars[index] = state.values
+        if self._matrices is not None:
+            for matrix, name in enumerate(self.QUATERNIONS if self.quaternions else self.MATRICES):
+                self._matrices[index, matrix] = getattr(state, name)
+
+    def extend(self, scalars: np.ndarray, matrices: np.ndarray | None = None) -> None:
+        '''
+        Пакетное добавление состояний (с тем же прореживанием, что и append): скаляры (n, len(COLUMNS)),
+        матрицы МНК (n, 3, 3, 3) или кватернионы (n, 2, 4) - обязательны при store_matrices
+        '''
+        assert self._matrices is None or matrices is not None, 'matrices are required when store_matrices is set'
+        first = -self._offered % self.decimation
+        self._offered += len(scalars)
+        scalars = scalars[first::self.decimation]
+        if self.max_length is not None:
+            scalars = scalars[-self.max_length:]
+        count = len(scalars)
+        if not count:
+            return
+
+        if self.max_length is None:
+            while self._length + count > len(self._scalars):
+                self._grow()
+            index = slice(self._length, self._length + count)
+            self._length += count
+        else:
+            index = (self._head + self._length + np.arange(count)) % self.max_length
+            self._head = (self._head + max(self._length + count - self.max_length, 0)) % self.max_length
+            self._length = min(self._length + count, self.max_length)
+
+        self._scalars[index] = scalars
+        if self._matrices is not None:
+            self._matrices[index] = matrices[first::self.decimation][-count:]
+
+    def _order(self) -> np.ndarray | slice:
+        '''Индексы хранимых состояний в хронологическом порядке'''
+        if self._head == 0:
+            return slice(0, self._length)
+        return (self._head + np.arange(self._length)) % self.max_length
+
+    def column(self, name: str) -> np.ndarray:
+        '''Столбец скалярной величины (view, если кольцевой буфер не провернулся)'''
+        return self._scalars[self._order(), self.COLUMNS.index(name)]
+
+    def matrices(self, name: str) -> np.ndarray:
+        '''Блок (N, 3, 3) матрицы МНК'''
+        assert self._matrices is not None, 'matrices are not stored'
+        if not self.quaternions:
+            return self._matrices[self._order(), self.MATRICES.index(name)]
+        q_inertial_to_body, q_inertial_to_ref = self._matrices[self._order()].transpose(1, 0, 2)
+        return Quat.to_dcm({
+            'C_body_to_ref': Quat.multiply(q_inertial_to_ref, Quat.conjugate(q_inertial_to_body)),
+            'C_inertial_to_body': q_inertial_to_body,
+            'C_inertial_to_ref': q_inertial_to_ref,
+        }[name])
+
+    def as_array(self) -> np.ndarray:
+        '''Скалярные величины в виде массива (N, len(COLUMNS))'''
+        return self._scalars[self._order()]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> State:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('state history index out of range')
+        index = (self._head + index) % len(self._scalars) if self.max_length else index
+
+        row = self._scalars[index]
+        if self.quaternions:
+            quaternions = self._matrices[index] if self._matrices is not None else (None, None)
+            return QuaternionState(*row, *quaternions, dtype=self.dtype)
+        matrices = self._matrices[index] if self._matrices is not None else (None, None, None)
+        return State(*row, *matrices, dtype=self.dtype)
+
+    def __iter__(self) -> Iterator[State]:
+        for index in range(self._length):
+            yield self[index]
@@ -0,0 +1,291 @@
+'''
+Телеметрия навигационного цикла во время прогона.
+
+Telemetry - профилировщик шагов (StageTimer), который дополнительно ведёт счётчики и гистограммы:
+    bins_ticks_total, bins_cycles_total          - обработанные такты (в завершённых циклах) и циклы
+    bins_cycles_per_second                       - темп навигации между замерами (по часам)
+    bins_cycle_interval_seconds                  - гистограмма времени между соседними циклами
+    bins_stage_seconds_total, bins_stage_calls_total - суммарное время и число вызовов шагов [1]-[17]
+                                                   в замеряемых циклах
+    bins_stage_latency_seconds                   - гистограмма длительности шагов в замеряемых циклах
+    bins_orthogonality_error                     - max|C C^T - I| матрицы C_body_to_ref
+    bins_velocity_rate_m_s2, bins_position_rate_m_s - скорость изменения скорости и координат решения
+    bins_time_seconds                            - время t последнего состояния
+Каждый цикл выполняется только счёт и одна вставка в гистограмму, остальные величины
+считаются раз в sample_every циклов. Длительности шагов замеряются только в цикле, следующем
+за замером (от сохранения состояния до сохранения следующего, шаги [1-2]-[8] пакетного режима -
+если цикл начинает блок): в остальных циклах start и lap - пустые функции, как у NullTimer.
+Выключенная телеметрия - NullTimer, как без profile.
+
+Экспорт:
+    prometheus_text()      - текстовый формат Prometheus
+    serve_metrics()        - HTTP-сервер в фоновом потоке: /metrics (Prometheus), /metrics.json
+    JsonLinesExporter      - снимок snapshot() строкой JSON в файл не чаще раза в every_sec (в замеряемом цикле)
+
+Пример:
+    telemetry = Telemetry(exporters=[JsonLinesExporter('metrics.jsonl', every_sec=5)])
+    server = serve_metrics(telemetry, port=9100)
+    nav = Navigation_System(imu, telemetry=telemetry)
+'''
+import json
+import time
+import threading
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+from .profiling import StageTimer
+from .normalization import orthogonality_error
+from .constants import RADIUS_EARTH
+
+
+LATENCY_BUCKETS = tuple(scale * 10.0 ** power for power in range(-6, 0) for scale in (1, 2.5, 5)) + (1.0,)
+
+
+def _idle(*args) -> None:
+    '''start и lap вне замеряемых циклов'''
+    pass
+
+
+class Histogram:
+    '''Гистограмма с фиксированными верхними границами корзин (как histogram в Prometheus)'''
+    bounds: tuple[float, ...]
+    counts: list[int]
+    sum: float
+    count: int
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.reset()
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        '''Оценка квантиля сверху - граница корзины, в которой он находится'''
+        if not self.count:
+            return None
+        rank, total = q * self.count, 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float('inf')
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        '''Накопленные счётчики корзин le: (граница, число значений <= границы)'''
+        counts = np.cumsum(self.counts).tolist()
+        return [(f'{bound:g}', count) for bound, count in zip(self.bounds, counts)] + [('+Inf', counts[-1])]
+
+
+class Telemetry(StageTimer):
+    '''Профилировщик шагов со счётчиками, гистограммами и экспортом метрик'''
+    sample_every: int
+    ticks_per_cycle: int
+    exporters: list['JsonLinesExporter']
+
+    def __init__(self, sample_every: int = 64, exporters: list['JsonLinesExporter'] | None = None):
+        assert sample_every >= 1, 'sample period must be positive'
+        self.sample_every = sample_every
+        self.ticks_per_cycle = 1
+        self.exporters = list(exporters or [])
+        self.cycle_interval = Histogram()
+        self.stages: dict[str, Histogram] = {}
+        super().__init__()
+        self.reset()
+
+    def reset(self) -> None:
+        super().reset()
+        self.cycles = 0
+        self.cycle_interval.reset()
+        self.stages.clear()
+        self.time = None
+        self.cycles_per_second = None
+        self.orthogonality_error = None
+        self.max_orthogonality_error = None
+        self.velocity_rate = None
+        self.position_rate = None
+        self._last_cycle = None
+        self._last_sample = None
+        self._measuring = False
+        self.start = self.lap = _idle
+
+    def _lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self.totals[stage] += elapsed
+        self.counts[stage] += 1
+        self._last = now
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+        histogram.observe(elapsed)
+
+    def _first_lap(self, stage: str) -> None:
+        '''Сохранение состояния в цикле замера: отсюда начинается замеряемый цикл'''
+        self.start, self.lap = self._start, self._lap
+        self._measuring = True
+        self._start()
+
+    def _last_lap(self, stage: str) -> None:
+        '''Сохранение состояния в замеряемом цикле: последний шаг замера'''
+        self._lap(stage)
+        self.start = self.lap = _idle
+        self._measuring = False
+
+    _start = StageTimer.start
+
+    def cycle(self, state) -> None:
+        '''Завершение цикла навигации с новым состоянием state (вызывается при сохранении состояния)'''
+        now = time.perf_counter()
+        self.cycles += 1
+        if self._last_cycle is not None:
+            self.cycle_interval.observe(now - self._last_cycle)
+        self._last_cycle = now
+        # Длительности шагов пишутся в цикле, следующем за замером
+        sampled = self.cycles % self.sample_every == 0
+        if sampled:
+            self._sample(state, now)
+        if self._measuring:
+            if not sampled:
+                self.lap = self._last_lap
+        elif sampled:
+            self.lap = self._first_lap
+
+    def _sample(self, state, now: float) -> None:
+        t = float(state.t)
+        velocity = np.array(state.velocity, np.float64)
+        position = (float(state.latitude), float(state.longitude))
+        self.orthogonality_error = orthogonality_error(np.asarray(state.C_body_to_ref, np.float64))
+        self.max_orthogonality_error = max(self.max_orthogonality_error or 0.0, self.orthogonality_error)
+        if self._last_sample is not None:
+            last_now, last_cycles, last_t, last_velocity, last_position = self._last_sample
+            if now > last_now:
+                self.cycles_per_second = (self.cycles - last_cycles) / (now - last_now)
+            if t > last_t:
+                north = (position[0] - last_position[0]) * RADIUS_EARTH
+                east = (position[1] - last_position[1]) * RADIUS_EARTH * np.cos(position[0])
+                self.velocity_rate = float(np.linalg.norm(velocity - last_velocity)) / (t - last_t)
+                self.position_rate = float(np.hypot(north, east)) / (t - last_t)
+        self.time = t
+        self._last_sample = (now, self.cycles, t, velocity, position)
+        for exporter in self.exporters:
+            exporter.maybe_write(self)
+
+    def flush(self) -> None:
+        '''Запись итогового снимка экспортёрами (в конце прогона)'''
+        for exporter in self.exporters:
+            exporter.write(self)
+
+    @property
+    def ticks(self) -> int:
+        return self.cycles * self.ticks_per_cycle
+
+    def snapshot(self) -> dict:
+        '''Текущие значения метрик (для JSON)'''
+        return {
+            'wall_time': time.time(),
+            'time': self.time,
+            'ticks': self.ticks,
+            'cycles': self.cycles,
+            'cycles_per_second': self.cycles_per_second,
+            'cycle_interval_p50_sec': self.cycle_interval.quantile(0.5),
+            'cycle_interval_p99_sec': self.cycle_interval.quantile(0.99),
+            'orthogonality_error': self.orthogonality_error,
+            'max_orthogonality_error': self.max_orthogonality_error,
+            'velocity_rate_m_s2': self.velocity_rate,
+            'position_rate_m_s': self.position_rate,
+            'stages': {stage: values['sec'] for stage, values in self.report().items()},
+        }
+
+    def prometheus_text(self) -> str:
+        '''Метрики в текстовом формате Prometheus'''
+        lines = []
+
+        def metric(name: str, kind: str, help: str, samples: list[tuple[str, float | int | None]]) -> None:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(f'{name}{labels} {value:.17g}' for labels, value in samples if value is not None)
+
+        def histogram(name: str, help: str, histograms: list[tuple[str, Histogram]]) -> None:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, values in histograms:
+                prefix = f'{labels},' if labels else ''
+                lines.extend(f'{name}_bucket{{{prefix}le="{bound}"}} {count}' for bound, count in values.cumulative())
+                labels = f'{{{labels}}}' if labels else ''
+                lines.append(f'{name}_sum{labels} {values.sum:.17g}')
+                lines.append(f'{name}_count{labels} {values.count}')
+
+        totals, counts, stages = dict(self.totals), dict(self.counts), dict(self.stages)
+        metric('bins_ticks_total', 'counter', 'IMU ticks in completed navigation cycles', [('', self.ticks)])
+        metric('bins_cycles_total', 'counter', 'Completed navigation cycles', [('', self.cycles)])
+        metric('bins_cycles_per_second', 'gauge', 'Navigation cycles per wall-clock second between samples', [('', self.cycles_per_second)])
+        histogram('bins_cycle_interval_seconds', 'Wall-clock time between consecutive cycles', [('', self.cycle_interval)])
+        metric('bins_stage_seconds_total', 'counter', 'Time spent in algorithm stages', [(f'{{stage="{stage}"}}', value) for stage, value in totals.items()])
+        metric('bins_stage_calls_total', 'counter', 'Algorithm stage calls', [(f'{{stage="{stage}"}}', value) for stage, value in counts.items()])
+        histogram('bins_stage_latency_seconds', 'Stage duration in sampled cycles', [(f'stage="{stage}"', values) for stage, values in stages.items()])
+        metric('bins_orthogonality_error', 'gauge', 'max|C C^T - I| of C_body_to_ref at the last sample', [('', self.orthogonality_error)])
+        metric('bins_max_orthogonality_error', 'gauge', 'Maximum sampled orthogonality error', [('', self.max_orthogonality_error)])
+        metric('bins_velocity_rate_m_s2', 'gauge', 'Rate of change of the velocity solution', [('', self.velocity_rate)])
+        metric('bins_position_rate_m_s', 'gauge', 'Rate of change of the position solution', [('', self.position_rate)])
+        metric('bins_time_seconds', 'gauge', 'Navigation time of the last sampled state', [('', self.time)])
+        return '\n'.join(lines) + '\n'
+
+
+class JsonLinesExporter:
+    '''Периодическая запись снимков телеметрии в файл JSON lines'''
+    filepath: str
+    every_sec: float
+
+    def __init__(self, filepath: str, every_sec: float = 10.0):
+        self.filepath = filepath
+        self.every_sec = every_sec
+        self._fp = open(filepath, 'a', buffering=1)
+        self._last = None
+
+    def maybe_write(self, telemetry: Telemetry) -> None:
+        now = time.monotonic()
+        if self._last is None or now - self._last >= self.every_sec:
+            self.write(telemetry)
+
+    def write(self, telemetry: Telemetry) -> None:
+        self._last = time.monotonic()
+        self._fp.write(json.dumps(telemetry.snapshot()) + '\n')
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+def serve_metrics(telemetry: Telemetry, host: str = '127.0.0.1', port: int = 9100) -> ThreadingHTTPServer:
+    '''HTTP-сервер метрик в фоновом потоке: /metrics - Prometheus, /metrics.json - snapshot(); остановка - shutdown()'''
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            match self.path:
+                case '/metrics':
+                    body, content_type = telemetry.prometheus_text().encode(), 'text/plain; version=0.0.4'
+                case '/metrics.json':
+                    body, content_type = json.dumps(telemetry.snapshot()).encode(), 'application/json'
+                case _:
+                    self.send_error(404)
+                    return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,224 @@
+'''
+Эмулятор ИНС по опорной траектории.
+
+Траектория задаётся последовательностью участков движения по поверхности сферической Земли
+с постоянными креном и тангажем: стоянка, разворот с постоянной угловой скоростью по курсу,
+разгон/торможение вдоль курса. Приращения датчиков и эталонная траектория считаются
+векторно, блоками по chunk_size тактов:
+
+    w_b = C_ref_to_body (w_ie + w_en + w_nb)             - абсолютная угловая скорость связанной СК
+    a_b = C_ref_to_body (dv/dt + (2 w_ie + w_en) x v + g) - кажущееся ускорение
+
+где w_ie и g - проекции скорости вращения Земли (как в EarthRotationRateRef) и силы тяжести,
+w_en - переносная угловая скорость, w_nb = (0, 0, -dheading/dt). Значения берутся в середине
+такта и умножаются на его длительность; к ним добавляются дрейфы и шумы датчиков (SensorErrors).
+
+Пример: выставка 5 минут, разгон до 20 m/sec, разворот на 90 deg и движение по прямой
+    profile = [stationary(300), accelerate(20, 1.0), turn(30, 3.0), stationary(600)]
+    imu = IMU_trajectory(initial_state, profile, errors=SensorErrors(gyro_noise=1e-6, seed=1))
+'''
+from typing import Annotated, Iterator
+from dataclasses import dataclass
+import numpy as np
+
+from .small_increments import SmallIncrements
+from .state import State
+from .state_history import StateHistory
+from .precision import LONGDOUBLE
+from . import math_functions as MathFunc
+
+
+@dataclass(frozen=True)
+class Segment:
+    '''Участок движения с постоянными угловой скоростью по курсу и продольным ускорением'''
+    duration: Annotated[float, 'Длительность [sec]']
+    turn_rate: Annotated[float, 'Угловая скорость по курсу [deg/sec]'] = 0.0
+    acceleration: Annotated[float, 'Продольное ускорение [m/sec^2]'] = 0.0
+
+
+def stationary(duration: float) -> Segment:
+    '''Стоянка (или движение с постоянной скоростью, если она набрана ранее)'''
+    return Segment(duration)
+
+
+def turn(duration: float, rate: float) -> Segment:
+    '''Разворот с постоянной угловой скоростью rate [deg/sec] (положительная - по часовой стрелке)'''
+    return Segment(duration, turn_rate=rate)
+
+
+def accelerate(duration: float, acceleration: float) -> Segment:
+    '''Разгон (торможение при отрицательном acceleration) вдоль курса'''
+    return Segment(duration, acceleration=acceleration)
+
+
+@dataclass(frozen=True)
+class SensorErrors:
+    '''Модель погрешностей датчиков: постоянные дрейфы и белые шумы с воспроизводимым seed'''
+    gyro_bias: Annotated[tuple[float, float, float], 'Дрейфы ДУС [rad/sec]'] = (0.0, 0.0, 0.0)
+    accel_bias: Annotated[tuple[float, float, float], 'Дрейфы акселерометров [m/sec^2]'] = (0.0, 0.0, 0.0)
+    gyro_noise: Annotated[float, 'Случайное блуждание угла [rad/sqrt(sec)]'] = 0.0
+    accel_noise: Annotated[float, 'Случайное блуждание скорости [m/sec/sqrt(sec)]'] = 0.0
+    seed: Annotated[int | None, 'Начальное значение генератора шумов'] = None
+
+
+class IMU_trajectory:
+    '''
+    Векторный эмулятор ИНС по профилю движения с эталонной траекторией.
+    Интерфейс источника тактов совпадает с IMU_emulator (iter, iter_blocks);
+    после окончания профиля движение продолжается с постоянной скоростью и курсом.
+    '''
+    initial_state: State
+    segments: list[Segment]
+    errors: SensorErrors
+    frequency: int
+    ttl_sec: float
+    chunk_size: int
+
+    def __init__(
+        self,
+        initial_state: State,
+        segments: list[Segment],
+        errors: SensorErrors = SensorErrors(),
+        frequency: int = 800,
+        ttl_sec: float | None = None,
+        chunk_size: int = 65_536,
+    ):
+        self.initial_state = initial_state
+        self.segments = list(segments)
+        self.errors = errors
+        self.frequency = frequency
+        self.ttl_sec = sum(segment.duration for segment in self.segments) if ttl_sec is None else ttl_sec
+        self.chunk_size = chunk_size
+
+        # Начала участков, курс и скорость в их начале
+        durations = np.array([segment.duration for segment in self.segments] + [np.inf], np.longdouble)
+        turn_rates = np.deg2rad(np.array([segment.turn_rate for segment in self.segments] + [0], np.longdouble))
+        accelerations = np.array([segment.acceleration for segment in self.segments] + [0], np.longdouble)
+        heading = np.longdouble(initial_state.heading)
+        speed = initial_state.velocity_x_ref * np.sin(heading) + initial_state.velocity_y_ref * np.cos(heading)
+        self._starts = np.concatenate(([0], np.cumsum(durations[:-1])))
+        self._turn_rates = turn_rates
+        self._accelerations = accelerations
+        self._headings = heading + np.concatenate(([0], np.cumsum(turn_rates[:-1] * durations[:-1])))
+        self._speeds = speed + np.concatenate(([0], np.cumsum(accelerations[:-1] * durations[:-1])))
+
+    def _motion(self, t: np.ndarray) -> tuple[np.ndarray, ...]:
+        '''Курс, скорость и их производные в моменты t'''
+        index = np.searchsorted(self._starts, t, side='right') - 1
+        elapsed = t - self._starts[index]
+        turn_rate = self._turn_rates[index]
+        acceleration = self._accelerations[index]
+        return self._headings[index] + turn_rate * elapsed, self._speeds[index] + acceleration * elapsed, turn_rate, acceleration
+
+    def _blocks(self) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        '''Блоки (записи ИНС (n, 7), эталонная траектория (n, 9)) на концах тактов'''
+        precision = LONGDOUBLE
+        R = precision.RADIUS_EARTH
+        U = precision.U_EARTH_ROTATION_RATE
+        dt = np.longdouble(1) / self.frequency
+        count = int(round(self.ttl_sec * self.frequency))
+        pitch = np.longdouble(self.initial_state.pitch)
+        roll = np.longdouble(self.initial_state.roll)
+        # C_body_to_ref = Rz(heading) C_level, C_level - крен и тангаж при нулевом курсе
+        C_level = MathFunc.calc_body_to_ref(0, pitch, roll, precision)
+        gyro_bias = np.asarray(self.errors.gyro_bias, np.longdouble) * dt
+        accel_bias = np.asarray(self.errors.accel_bias, np.longdouble) * dt
+        rng = np.random.default_rng(self.errors.seed)
+
+        latitude = np.longdouble(self.initial_state.latitude)
+        longitude = np.longdouble(self.initial_state.longitude)
+        heading, speed, _, _ = self._motion(np.zeros(1, np.longdouble))
+        velocity_x, velocity_y = speed * np.sin(heading), speed * np.cos(heading)
+        velocity_x_sec = velocity_x / np.cos(latitude)
+
+        for start in range(0, count, self.chunk_size):
+            n = min(start + self.chunk_size, count) - start
+            t = np.arange(start + 1, start + n + 1) * dt
+
+            # Эталонная траектория на концах тактов, координаты - интегрированием по трапециям
+            heading_end, speed_end, _, _ = self._motion(t)
+            sin_end, cos_end = np.sin(heading_end), np.cos(heading_end)
+            velocity_x_end = speed_end * sin_end
+            velocity_y_end = speed_end * cos_end
+            latitudes = latitude + np.cumsum((np.concatenate((velocity_y[-1:], velocity_y_end[:-1])) + velocity_y_end) * (dt / 2 / R))
+            velocity_x_sec_end = velocity_x_end / np.cos(latitudes)
+            longitudes = longitude + np.cumsum((np.concatenate((velocity_x_sec[-1:], velocity_x_sec_end[:-1])) + velocity_x_sec_end) * (dt / 2 / R))
+
+            # Угловая скорость и кажущееся ускорение в середине такта, проекции на ref
+            heading_mid, speed_mid, turn_rate, acceleration = self._motion(t - dt / 2)
+            sin_mid, cos_mid = np.sin(heading_mid), np.cos(heading_mid)
+            latitude_mid = (np.concatenate(([latitude], latitudes[:-1])) + latitudes) / 2
+            sin_latitude, cos_latitude = np.sin(latitude_mid), np.cos(latitude_mid)
+            vx, vy = speed_mid * sin_mid, speed_mid * cos_mid
+            earth_y, earth_z = U * cos_latitude, U * sin_latitude
+            transport_x, transport_y, transport_z = -vy / R, vx / R, vx / R * sin_latitude / cos_latitude
+
+            w_ref = np.empty((n, 3), np.longdouble)
+            w_ref[:, 0] = transport_x
+            w_ref[:, 1] = earth_y + transport_y
+            w_ref[:, 2] = earth_z + transport_z - turn_rate
+            a_ref = np.empty((n, 3), np.longdouble)
+            a_ref[:, 0] = acceleration * sin_mid + vy * turn_rate - (2 * earth_z + transport_z) * vy
+            a_ref[:, 1] = acceleration * cos_mid - vx * turn_rate + (2 * earth_z + transport_z) * vx
+            a_ref[:, 2] = transport_x * vy - (2 * earth_y + transport_y) * vx + precision.GRAVITY_AXELERATION
+
+            records = np.empty((n, 7), np.longdouble)
+            records[:, 0] = t
+            records[:, 1:4] = self._to_body(a_ref, sin_mid, cos_mid, C_level) * dt + accel_bias
+            records[:, 4:] = self._to_body(w_ref, sin_mid, cos_mid, C_level) * dt + gyro_bias
+            if self.errors.accel_noise or self.errors.gyro_noise:
+                # Одна выборка (n, 6) на блок: последовательность шумов не зависит от chunk_size
+                noise = rng.standard_normal((n, 6))
+                records[:, 1:4] += noise[:, :3] * (self.errors.accel_noise * np.sqrt(dt))
+                records[:, 4:] += noise[:, 3:] * (self.errors.gyro_noise * np.sqrt(dt))
+
+            truth = np.empty((n, len(StateHistory.COLUMNS)), np.longdouble)
+            truth[:, 0] = t
+            truth[:, 1] = latitudes
+            truth[:, 2] = longitudes
+            truth[:, 3] = velocity_x_end
+            truth[:, 4] = velocity_y_end
+            truth[:, 5] = 0
+            truth[:, 6] = np.arctan2(sin_end, cos_end)
+            truth[:, 7] = pitch
+            truth[:, 8] = roll
+            yield records, truth
+
+            latitude, longitude = latitudes[-1], longitudes[-1]
+            velocity_x, velocity_y, velocity_x_sec = velocity_x_end, velocity_y_end, velocity_x_sec_end
+
+    @staticmethod
+    def _to_body(x_ref: np.ndarray, sin_heading: np.ndarray, cos_heading: np.ndarray, C_level: np.ndarray) -> np.ndarray:
+        '''Проекции (n, 3) из ref на связанные оси: C_level^T Rz(heading)^T x_ref'''
+        x_level = np.empty_like(x_ref)
+        x_level[:, 0] = cos_heading * x_ref[:, 0] - sin_heading * x_ref[:, 1]
+        x_level[:, 1] = sin_heading * x_ref[:, 0] + cos_heading * x_ref[:, 1]
+        x_level[:, 2] = x_ref[:, 2]
+        return x_level @ C_level
+
+    async def iter_blocks(self, start: int = 0):
+        '''
+        Поток блоков записей (n, 7) размером до chunk_size, начиная с такта start.
+        Блоки до start генерируются и отбрасываются: координаты и шумы зависят от всей предыстории.
+        '''
+        offset = 0
+        for records, _ in self._blocks():
+            offset += len(records)
+            if offset > start:
+                yield records[max(start - offset + len(records), 0):]
+
+    async def iter(self, start: int = 0):
+        async for block in self.iter_blocks(start):
+            for record in block:
+                yield SmallIncrements.view(record)
+
+    def truth(self, step: int = 1) -> np.ndarray:
+        '''
+        Эталонная траектория (N, 9) в столбцах StateHistory на каждом step-м такте.
+        При step = 4 * rate_decrease строки совпадают по времени с состояниями навигации.
+        '''
+        blocks, offset = [], 0
+        for _, truth in self._blocks():
+            blocks.append(truth[(step - 1 - offset) % step::step])
+            offset = (offset + len(truth)) % step
+        return np.concatenate(blocks) if blocks else np.empty((0, len(StateHistory.COLUMNS)), np.longdouble)
@@ -0,0 +1,235 @@
+'''
+Бенчмарк конвейера БИНС: источники тактов, отдельные шаги math_functions и полный цикл навигации.
+
+Источники и шаги каждого случая сетки frequency x ttl_sec x rate_decrease, а также каждый режим
+навигации (navigate, navigate_blocks) прогоняются в отдельных процессах, чтобы пиковая RSS режима
+не включала загрузку журналов и другие режимы. Результаты пишутся в JSON вместе с коммитом
+и версиями, поэтому два прогона можно сравнить между коммитами:
+
+    python benchmarks/bench_pipeline.py --output new.json
+    python benchmarks/bench_pipeline.py --frequency 800 --ttl 60 --output new.json --compare old.json
+'''
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import resource
+import itertools
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BINS_algo import IMU_reader
+from BINS_algo.small_increments import SmallIncrements
+from BINS_algo.profiling import StageTimer
+from BINS_algo.scenarios import Scenario
+from BINS_algo.precision import get_precision
+from BINS_algo import math_functions as MathFunc
+
+
+def peak_rss_mb() -> float:
+    '''Пиковая RSS текущего процесса (ru_maxrss - КБ в Linux, байты в macOS)'''
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == 'darwin' else rss / 2**10
+
+
+async def drain(iterator) -> int:
+    count = 0
+    async for item in iterator:
+        count += len(item) if isinstance(item, np.ndarray) else 1
+    return count
+
+
+def timed(func, *args) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def bench_sources(scenario: Scenario, directory: str) -> dict:
+    '''Источники тактов: эмулятор и чтение журналов (текст, npy) поштучно и блоками'''
+    imu = scenario.navigation_system().imu
+    results = {}
+    for name in ('iter', 'iter_blocks'):
+        elapsed, ticks = timed(asyncio.run, drain(getattr(imu, name)()))
+        results[f'emulator.{name}'] = {'sec': elapsed, 'ticks_per_sec': ticks / elapsed}
+
+    text = os.path.join(directory, 'log.txt')
+    npy = os.path.join(directory, 'log.npy')
+    records = np.concatenate(asyncio.run(collect(imu.iter_blocks())))
+    np.save(npy, records)
+    np.savetxt(text, records, header=' '.join(IMU_reader.COLUMNS), comments='')
+    for format, filepath in (('text', text), ('npy', npy)):
+        reader = IMU_reader(imu.initial_state, filepath, frequency=scenario.frequency)
+        for name in ('iter', 'iter_blocks'):
+            elapsed, ticks = timed(asyncio.run, drain(getattr(reader, name)()))
+            results[f'reader.{format}.{name}'] = {'sec': elapsed, 'ticks_per_sec': ticks / elapsed}
+    return results
+
+
+async def collect(iterator) -> list:
+    return [item async for item in iterator]
+
+
+def bench_steps(scenario: Scenario, repeat: int = 2_000) -> dict:
+    '''Отдельные шаги math_functions на одном наборе данных: среднее время вызова [usec]'''
+    precision = get_precision(scenario.precision)
+    state = scenario.initial_state().astype(precision.dtype)
+    rng = np.random.default_rng(0)
+    increments = [SmallIncrements(0, *rng.standard_normal(6) * 1e-4, dtype=precision.dtype) for _ in range(4)]
+    vector = rng.standard_normal(3).astype(precision.dtype) * 1e-5
+    H1 = precision.dtype(scenario.rate_decrease / scenario.frequency)
+    H4 = 4 * H1
+
+    steps = {
+        '[1]': lambda: MathFunc.integrateAngularRate(increments[0], increments[1]),
+        '[2]': lambda: MathFunc.integrateAxeleration(increments[0], increments[1]),
+        '[5]': lambda: MathFunc.calculateAxeleration(increments, H1, precision),
+        '[6]': lambda: state.C_body_to_ref @ vector,
+        '[7]': lambda: MathFunc.calculateEulerRotationVectorProjection(increments, precision),
+        '[8]': lambda: MathFunc.calculateAngleOfBodyRotation(vector, precision),
+        '[9]': lambda: state.C_inertial_to_body @ state.C_body_to_ref,
+        '[10]': lambda: MathFunc.calculateAngularRateProjection(state.velocity_x_ref, state.velocity_y_ref, state.latitude, precision),
+        '[11]': lambda: MathFunc.calculateAngleOfRefRotation(vector, H4, precision),
+        '[13]': lambda: state.C_inertial_to_ref @ state.C_inertial_to_body.T,
+        '[14]': lambda: MathFunc.normalizeMatrix(state.C_body_to_ref),
+        '[15]': lambda: MathFunc.calculateVelocityInRef(state.velocity_x_ref, state.velocity_y_ref, state.velocity_z_ref, vector, vector, H4, state.latitude, precision),
+    }
+    results = {}
+    for stage, step in steps.items():
+        elapsed, _ = timed(lambda: [step() for _ in range(repeat)])
+        results[stage] = {'usec': elapsed / repeat * 1e6}
+    return results
+
+
+NAVIGATION_MODES = ('navigate', 'navigate_blocks')
+
+
+def bench_navigation(scenario: Scenario, name: str) -> dict:
+    '''
+    Полный цикл в режиме name: navigate (по тактам) или navigate_blocks (пакетно) с профилем по шагам.
+    Выполняется в собственном процессе: base_rss_mb - пик до навигации (интерпретатор, модули, навигатор)
+    '''
+    nav = scenario.navigation_system()
+    nav.timer = StageTimer()
+    base_rss = peak_rss_mb()
+    elapsed, _ = timed(asyncio.run, getattr(nav, name)())
+    ticks = round(scenario.ttl_sec * scenario.frequency)
+    return {
+        'sec': elapsed,
+        'ticks_per_sec': ticks / elapsed,
+        'cycles_per_sec': len(nav.state_vault) / elapsed,
+        'stages': nav.timer.report(),
+        'base_rss_mb': base_rss,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def bench_inputs(scenario: Scenario, steps_repeat: int) -> dict:
+    '''Источники и шаги одного случая; выполняется в собственном процессе'''
+    with tempfile.TemporaryDirectory() as directory:
+        sources = bench_sources(scenario, directory)
+    steps = bench_steps(scenario, steps_repeat)
+    return {'sources': sources, 'steps': steps, 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_case(scenario: Scenario, steps_repeat: int) -> dict:
+    '''Один случай сетки: каждая часть - в новом процессе, пиковая RSS не накапливается между ними'''
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        inputs = executor.submit(bench_inputs, scenario, steps_repeat).result()
+        navigation = {name: executor.submit(bench_navigation, scenario, name).result() for name in NAVIGATION_MODES}
+    return {
+        'frequency': scenario.frequency,
+        'ttl_sec': scenario.ttl_sec,
+        'rate_decrease': scenario.rate_decrease,
+        'precision': scenario.precision,
+        'kernels': scenario.kernels,
+        'sources': inputs['sources'],
+        'steps': inputs['steps'],
+        'navigation': navigation,
+        'sources_peak_rss_mb': inputs['peak_rss_mb'],
+    }
+
+
+def environment() -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def case_key(case: dict) -> tuple:
+    return case['frequency'], case['ttl_sec'], case['rate_decrease'], case['precision'], case['kernels']
+
+
+def compare(new: dict, old: dict) -> None:
+    '''Отношение скоростей нового прогона к старому по совпадающим случаям (>1 - быстрее)'''
+    previous = {case_key(case): case for case in old['cases']}
+    print(f'\ncompare with {old["environment"]["commit"]}')
+    for case in new['cases']:
+        base = previous.get(case_key(case))
+        if base is None:
+            continue
+        print(f'{case_key(case)}')
+        for name, result in case['navigation'].items():
+            print(f'{name:>28}: x{result["ticks_per_sec"] / base["navigation"][name]["ticks_per_sec"]:.2f}')
+        for name, result in case['sources'].items():
+            print(f'{name:>28}: x{result["ticks_per_sec"] / base["sources"][name]["ticks_per_sec"]:.2f}')
+        for name, result in case['navigation'].items():
+            if 'peak_rss_mb' in base['navigation'][name]:
+                print(f'{name + " peak_rss_mb":>28}: {base["navigation"][name]["peak_rss_mb"]:.1f} -> {result["peak_rss_mb"]:.1f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк конвейера БИНС по шагам [1]-[17]')
+    parser.add_argument('--frequency', type=int, nargs='+', default=[400, 800])
+    parser.add_argument('--ttl', type=float, nargs='+', default=[30, 120])
+    parser.add_argument('--rate-decrease', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--precision', default='longdouble', choices=('longdouble', 'float64'))
+    parser.add_argument('--kernels', default='reference')
+    parser.add_argument('--steps-repeat', type=int, default=2_000)
+    parser.add_argument('--output', default=None, help='JSON с результатами')
+    parser.add_argument('--compare', default=None, help='JSON предыдущего прогона для сравнения')
+    args = parser.parse_args()
+
+    scenarios = [
+        Scenario(frequency=frequency, ttl_sec=ttl, rate_decrease=rate_decrease, precision=args.precision, kernels=args.kernels)
+        for frequency, ttl, rate_decrease in itertools.product(args.frequency, args.ttl, args.rate_decrease)
+    ]
+    cases = []
+    for scenario in scenarios:
+        case = run_case(scenario, args.steps_repeat)
+        cases.append(case)
+        navigate, blocks = case['navigation']['navigate'], case['navigation']['navigate_blocks']
+        print(
+            f'{scenario.frequency:>5} Hz {scenario.ttl_sec:>7g} sec /{scenario.rate_decrease}: '
+            f'navigate {navigate["ticks_per_sec"]:10.0f} ticks/sec {navigate["cycles_per_sec"]:8.0f} cycles/sec {navigate["peak_rss_mb"]:7.1f} MB | '
+            f'blocks {blocks["ticks_per_sec"]:10.0f} ticks/sec {blocks["cycles_per_sec"]:8.0f} cycles/sec {blocks["peak_rss_mb"]:7.1f} MB | '
+            f'sources {case["sources_peak_rss_mb"]:7.1f} MB'
+        )
+
+    result = {'environment': environment(), 'cases': cases}
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(result, fp, indent=1)
+    if args.compare:
+        with open(args.compare) as fp:
+            compare(result, json.load(fp))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+'''
+Пропускная способность потоковых приёмников состояний (sinks.py).
+
+    python benchmarks/bench_sinks.py --states 100000 --dtype float64
+'''
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BINS_algo import State, StateHistory
+from BINS_algo.sinks import SINKS
+
+
+def make_states(count: int, dtype: type) -> list[State]:
+    rng = np.random.default_rng(0)
+    rows = rng.standard_normal((count, len(StateHistory.COLUMNS)))
+    rows[:, 0] = np.arange(count) * 0.02
+    return [State(*row, None, None, dtype=dtype) for row in rows]
+
+
+def bench(sink_type: type, filepath: str, states: list[State], dtype: type) -> dict:
+    started = time.perf_counter()
+    with sink_type(filepath, dtype=dtype) as sink:
+        for state in states:
+            sink.write(state)
+    elapsed = time.perf_counter() - started
+
+    if os.path.isdir(filepath):
+        size = sum(os.path.getsize(os.path.join(filepath, name)) for name in os.listdir(filepath))
+    else:
+        size = os.path.getsize(filepath)
+    return {'states_per_sec': len(states) / elapsed, 'mb_per_sec': size / elapsed / 2**20, 'size_mb': size / 2**20}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк приёмников состояний')
+    parser.add_argument('--states', type=int, default=100_000)
+    parser.add_argument('--dtype', default='longdouble', choices=('longdouble', 'float64'))
+    args = parser.parse_args()
+
+    dtype = getattr(np, args.dtype)
+    states = make_states(args.states, dtype)
+    with tempfile.TemporaryDirectory() as directory:
+        for extension, sink_type in SINKS.items():
+            if extension == '.txt':
+                continue
+            try:
+                result = bench(sink_type, os.path.join(directory, 'states' + extension), states, dtype)
+            except ImportError as error:
+                print(f'{sink_type.__name__:>12}: skipped ({str(error).splitlines()[0]})')
+                continue
+            print(f'{sink_type.__name__:>12}: {result["states_per_sec"]:12.0f} states/sec {result["mb_per_sec"]:8.2f} MB/sec {result["size_mb"]:8.2f} MB')
+
+
+if __name__ == '__main__':
+    main()
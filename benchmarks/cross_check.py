@@ -0,0 +1,113 @@
+'''
+Перекрёстная проверка вариантов навигации с эталонными путями на одном манёвре
+(стоянка, разгон, разворот, стоянка - IMU_trajectory):
+
+    batch      - navigate_batch (векторно по массиву записей) против потактовой navigate
+    kernels    - ядра closed_form (и numba, если установлена) против reference
+    quaternion - attitude='quaternion' против матриц МНК (attitude='dcm')
+    multi      - MultiNavigator (рекуррентные шаги над стопками навигаторов) против потактовой navigate
+
+Для каждой проверки печатаются максимальные расхождения координат [m], скоростей [m/sec]
+и углов [rad] по всей истории состояний; код возврата 1, если расхождение превышает допуск.
+
+    python benchmarks/cross_check.py --precision float64
+'''
+import os
+import sys
+import asyncio
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BINS_algo import Navigation_System, IMU_trajectory
+from BINS_algo.trajectory import stationary, accelerate, turn
+from BINS_algo.multi import MultiNavigator
+from BINS_algo.scenarios import Scenario
+from BINS_algo.constants import RADIUS_EARTH
+
+
+# Допуски (координаты [m], скорости [m/sec], углы [rad]) для longdouble / float64
+TOLERANCES = {
+    'batch': {'longdouble': (1e-9, 1e-12, 1e-15), 'float64': (1e-6, 1e-9, 1e-12)},
+    'kernels': {'longdouble': (1e-6, 1e-9, 1e-12), 'float64': (1e-6, 1e-9, 1e-12)},
+    'quaternion': {'longdouble': (1e-6, 1e-9, 1e-12), 'float64': (1e-5, 1e-8, 1e-11)},
+    'multi': {'longdouble': (1e-9, 1e-12, 1e-15), 'float64': (1e-6, 1e-9, 1e-12)},
+}
+
+
+def maneuver(ttl_scale: float = 1.0) -> IMU_trajectory:
+    initial_state = Scenario(heading=30.0, roll=2.0).initial_state()
+    return IMU_trajectory(initial_state, [
+        stationary(20 * ttl_scale),
+        accelerate(20 * ttl_scale, 1.0),
+        turn(30 * ttl_scale, 3.0),
+        stationary(30 * ttl_scale),
+    ])
+
+
+async def collect(iterator) -> np.ndarray:
+    return np.concatenate([block async for block in iterator])
+
+
+def run(imu: IMU_trajectory, mode: str = 'navigate_blocks', records: np.ndarray | None = None, **kwargs) -> np.ndarray:
+    '''История состояний (N, 9) навигации в режиме mode'''
+    nav = Navigation_System(imu, **kwargs)
+    if mode == 'navigate_batch':
+        nav.navigate_batch(records)
+    else:
+        asyncio.run(getattr(nav, mode)())
+    return nav.state_vault.as_array().astype(np.float64)
+
+
+def run_multi(imus: list[IMU_trajectory], **kwargs) -> list[np.ndarray]:
+    '''Истории состояний совместной навигации MultiNavigator'''
+    multi = MultiNavigator([Navigation_System(imu, **kwargs) for imu in imus])
+    asyncio.run(multi.navigate())
+    return [nav.state_vault.as_array().astype(np.float64) for nav in multi.navs]
+
+
+def difference(a: np.ndarray, b: np.ndarray) -> tuple[float, float, float]:
+    '''Максимальные расхождения координат [m], скоростей [m/sec] и углов [rad]'''
+    assert a.shape == b.shape, f'state histories differ in shape: {a.shape} != {b.shape}'
+    delta = np.abs(a - b)
+    north = delta[:, 1] * RADIUS_EARTH
+    east = delta[:, 2] * RADIUS_EARTH * np.cos(a[:, 1])
+    return float(max(north.max(), east.max())), float(delta[:, 3:6].max()), float(delta[:, 6:].max())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Перекрёстная проверка вариантов навигации БИНС')
+    parser.add_argument('--precision', default='longdouble', choices=('longdouble', 'float64'))
+    parser.add_argument('--ttl-scale', type=float, default=1.0, help='Множитель длительности участков манёвра')
+    args = parser.parse_args()
+
+    imu = maneuver(args.ttl_scale)
+    records = asyncio.run(collect(imu.iter_blocks())).astype(np.dtype(args.precision))
+    reference = run(imu, 'navigate', precision=args.precision)
+
+    checks = {'batch': [('navigate_batch', run(imu, 'navigate_batch', records, precision=args.precision))]}
+    checks['kernels'] = [('closed_form', run(imu, kernels='closed_form', precision=args.precision))]
+    try:
+        checks['kernels'].append(('numba', run(imu, kernels='numba', precision=args.precision)))
+    except ImportError as error:
+        print(f'{"kernels numba":>24}: skipped ({error})')
+    checks['quaternion'] = [('quaternion', run(imu, attitude='quaternion', precision=args.precision))]
+    checks['multi'] = [(f'navigator {k}', states) for k, states in enumerate(run_multi([imu, imu], precision=args.precision))]
+
+    failed = False
+    for check, variants in checks.items():
+        tolerance = TOLERANCES[check][args.precision]
+        for name, states in variants:
+            errors = difference(reference, states)
+            passed = all(error <= limit for error, limit in zip(errors, tolerance))
+            failed |= not passed
+            print(
+                f'{check + " " + name:>24}: position {errors[0]:.3g} m, velocity {errors[1]:.3g} m/sec, '
+                f'angles {errors[2]:.3g} rad - {"ok" if passed else "FAILED"}'
+            )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
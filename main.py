@@ -2,20 +2,25 @@ import asyncio
 import numpy as np
 
 from BINS_algo import IMU_emulator, Navigation_System, State
+from BINS_algo.math_functions import calc_body_to_ref
 
 
 if __name__ == '__main__':
-    imu = IMU_emulator(
+    heading, pitch, roll = np.deg2rad([45, 0, 5]).astype(np.longdouble)
+    C_body_to_ref = calc_body_to_ref(heading, pitch, roll)
+    imu = IMU_emulator.stationary(
         initial_state=State(
             t=0,
             latitude=np.deg2rad(56),
             longitude=0,
-            heading=np.deg2rad(45),
-            pitch=np.deg2rad(0),
-            roll=np.deg2rad(5),
+            heading=heading,
+            pitch=pitch,
+            roll=roll,
             velocity_x_ref=0,
             velocity_y_ref=0,
             velocity_z_ref=0,
+            C_body_to_ref=C_body_to_ref,
+            C_inertial_to_body=C_body_to_ref.T,
         ),
         frequency=800,  # 800 Hz
         ttl_sec=5400,  # 90 min